@@ -263,11 +263,15 @@ export interface AddressResponse {
 }
 
 // Product types
+// Resized WebP copies of an image keyed by width, e.g. { '150w': url }; empty until generated
+export type Srcset = Record<string, string>;
+
 export interface Category {
   id: number;
   name: string;
   description: string;
   image: string;
+  image_srcset: Srcset;
   product_count: number;
 }
 
@@ -287,7 +291,9 @@ export interface Product {
     name: string;
   };
   image: string;
+  image_srcset: Srcset;
   images: string[];
+  images_srcset: Srcset[];
   stock: number;
   rating: number;
   review_count: number;
@@ -300,6 +306,12 @@ export interface ProductListResponse {
   has_more: boolean;
 }
 
+export interface ProductBatchResponse {
+  products: Product[];
+  missing: number[];
+  inactive: number[];
+}
+
 export interface WishlistItem {
   id: string;
   product_id: number;
@@ -308,13 +320,22 @@ export interface WishlistItem {
   original_price: number | null;
   discount_percentage: number;
   image: string;
+  image_srcset: Srcset;
   rating: number;
   review_count: number;
   added_at: string;
 }
 
+export interface RemovedItem {
+  id: string;
+  product_id: number;
+}
+
 export interface WishlistResponse {
   wishlist_items: WishlistItem[];
+  version: number;
+  delta: boolean;
+  removed?: RemovedItem[];
 }
 
 export interface CartItem {
@@ -325,6 +346,7 @@ export interface CartItem {
   original_price: number | null;
   discount_percentage: number;
   image: string;
+  image_srcset: Srcset;
   rating: number;
   review_count: number;
   quantity: number;
@@ -336,6 +358,15 @@ export interface CartResponse {
   cart_items: CartItem[];
   total_items: number;
   total_price: number;
+  version: number;
+  delta: boolean;
+  removed?: RemovedItem[];
+}
+
+export interface CartOperation {
+  op: 'add' | 'set' | 'remove';
+  product_id: number;
+  quantity?: number;
 }
 
 // Authentication API functions
@@ -509,6 +540,21 @@ export const productAPI = {
     }
   },
 
+  // Get several products in one request (order is preserved)
+  getProductsBatch: async (productIds: number[]): Promise<ProductBatchResponse> => {
+    try {
+      const response = await api.get<ProductBatchResponse>('/products/batch/', {
+        params: { ids: productIds.join(',') },
+      });
+      return response.data;
+    } catch (error: any) {
+      if (error.response?.data) {
+        throw error.response.data;
+      }
+      throw { error: 'Network error. Please try again.' };
+    }
+  },
+
   // Get all categories
   getCategories: async (): Promise<CategoryListResponse> => {
     try {
@@ -526,9 +572,12 @@ export const productAPI = {
 // Wishlist API functions
 export const wishlistAPI = {
   // Get user's wishlist
-  getWishlist: async (): Promise<WishlistResponse> => {
+  // Pass the last seen version to receive only what changed since (delta: true)
+  getWishlist: async (sinceVersion?: number): Promise<WishlistResponse> => {
     try {
-      const response = await api.get<WishlistResponse>('/accounts/wishlist/');
+      const response = await api.get<WishlistResponse>('/accounts/wishlist/', {
+        params: sinceVersion ? { since_version: sinceVersion } : undefined,
+      });
       return response.data;
     } catch (error: any) {
       if (error.response?.data) {
@@ -578,14 +627,71 @@ export const wishlistAPI = {
       throw { error: 'Network error. Please try again.' };
     }
   },
+
+  // Which of the given products are wishlisted (for heart icons on a grid)
+  getWishlistedIds: async (productIds: number[]): Promise<{ wishlisted: number[] }> => {
+    try {
+      const response = await api.get<{ wishlisted: number[] }>('/accounts/wishlist/contains/', {
+        params: { ids: productIds.join(',') },
+      });
+      return response.data;
+    } catch (error: any) {
+      if (error.response?.data) {
+        throw error.response.data;
+      }
+      throw { error: 'Network error. Please try again.' };
+    }
+  },
+
+  // Add several products to wishlist
+  addManyToWishlist: async (productIds: number[]): Promise<{ added: number[]; missing: number[] }> => {
+    try {
+      const response = await api.post<{ added: number[]; missing: number[] }>('/accounts/wishlist/bulk/add/', { product_ids: productIds });
+      return response.data;
+    } catch (error: any) {
+      if (error.response?.data) {
+        throw error.response.data;
+      }
+      throw { error: 'Network error. Please try again.' };
+    }
+  },
+
+  // Remove several products from wishlist
+  removeManyFromWishlist: async (productIds: number[]): Promise<{ removed: number[] }> => {
+    try {
+      const response = await api.post<{ removed: number[] }>('/accounts/wishlist/bulk/remove/', { product_ids: productIds });
+      return response.data;
+    } catch (error: any) {
+      if (error.response?.data) {
+        throw error.response.data;
+      }
+      throw { error: 'Network error. Please try again.' };
+    }
+  },
+
+  // Move wishlisted products to cart, all or nothing
+  moveWishlistToCart: async (productIds: number[]): Promise<{ moved: number[]; missing: number[] }> => {
+    try {
+      const response = await api.post<{ moved: number[]; missing: number[] }>('/accounts/wishlist/bulk/move-to-cart/', { product_ids: productIds });
+      return response.data;
+    } catch (error: any) {
+      if (error.response?.data) {
+        throw error.response.data;
+      }
+      throw { error: 'Network error. Please try again.' };
+    }
+  },
 };
 
 // Cart API functions
 export const cartAPI = {
   // Get user's cart
-  getCart: async (): Promise<CartResponse> => {
+  // Pass the last seen version to receive only what changed since (delta: true)
+  getCart: async (sinceVersion?: number): Promise<CartResponse> => {
     try {
-      const response = await api.get<CartResponse>('/accounts/cart/');
+      const response = await api.get<CartResponse>('/accounts/cart/', {
+        params: sinceVersion ? { since_version: sinceVersion } : undefined,
+      });
       return response.data;
     } catch (error: any) {
       if (error.response?.data) {
@@ -639,6 +745,19 @@ export const cartAPI = {
     }
   },
 
+  // Apply several cart changes atomically and get the new cart back
+  applyCartBatch: async (operations: CartOperation[]): Promise<CartResponse> => {
+    try {
+      const response = await api.post<CartResponse>('/accounts/cart/batch/', { operations });
+      return response.data;
+    } catch (error: any) {
+      if (error.response?.data) {
+        throw error.response.data;
+      }
+      throw { error: 'Network error. Please try again.' };
+    }
+  },
+
   // Clear cart
   clearCart: async (): Promise<{ message: string }> => {
     try {
@@ -736,6 +855,26 @@ export const orderAPI = {
     }
   },
 
+  // Get one page of orders, newest first (pass next_cursor from the previous page)
+  getOrdersPage: async (params: {
+    cursor?: string;
+    limit?: number;
+    summary?: boolean;
+  } = {}): Promise<{ orders: any[]; next_cursor: string | null; has_more: boolean }> => {
+    try {
+      const response = await api.get<{ orders: any[]; next_cursor: string | null; has_more: boolean }>(
+        '/accounts/orders/',
+        { params: { cursor: params.cursor ?? '', limit: params.limit, summary: params.summary ? 1 : undefined } },
+      );
+      return response.data;
+    } catch (error: any) {
+      if (error.response?.data) {
+        throw error.response.data;
+      }
+      throw { error: 'Network error. Please try again.' };
+    }
+  },
+
   // Create a new order
   createOrder: async (data: {
     delivery_address_id: number;
@@ -791,6 +930,22 @@ export const orderAPI = {
       throw { error: 'Network error. Please try again.' };
     }
   },
+
+  // Long-poll for tracking rows after lastId or a status other than status; resolves when either happens or after ~25s
+  waitForOrderTracking: async (orderId: number, lastId: number, status?: string): Promise<any> => {
+    try {
+      const response = await api.get<any>(`/accounts/orders/${orderId}/tracking/stream/`, {
+        params: { after: lastId, status },
+        timeout: 35000,
+      });
+      return response.data;
+    } catch (error: any) {
+      if (error.response?.data) {
+        throw error.response.data;
+      }
+      throw { error: 'Network error. Please try again.' };
+    }
+  },
 };
 
 export default api;
\ No newline at end of file
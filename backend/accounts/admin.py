@@ -1,7 +1,7 @@
 from django.contrib import admin
 from django.contrib.auth.admin import UserAdmin
 from django.contrib.auth.models import User
-from .models import Address, Cart, CartItem, Wishlist, WishlistItem, Order, OrderItem, OrderTracking
+from .models import Address, Cart, CartItem, Wishlist, WishlistItem, Order, OrderItem, OrderTracking, StockReservation
 
 # Extend the default UserAdmin to show related data
 class CustomUserAdmin(UserAdmin):
@@ -66,7 +66,7 @@ class CartAdmin(admin.ModelAdmin):
     ordering = ['-updated_at']
 
     def get_queryset(self, request):
-        return super().get_queryset(request).select_related('user').prefetch_related('items__product')
+        return super().get_queryset(request).select_related('user')
 
 @admin.register(CartItem)
 class CartItemAdmin(admin.ModelAdmin):
@@ -175,3 +175,14 @@ class OrderTrackingAdmin(admin.ModelAdmin):
 
     def get_queryset(self, request):
         return super().get_queryset(request).select_related('order')
+
+
+@admin.register(StockReservation)
+class StockReservationAdmin(admin.ModelAdmin):
+    list_display = ['order', 'product', 'quantity', 'status', 'expires_at', 'created_at', 'released_at']
+    list_filter = ['status', 'created_at']
+    search_fields = ['order__order_number', 'product__name']
+    readonly_fields = ['created_at', 'released_at']
+
+    def get_queryset(self, request):
+        return super().get_queryset(request).select_related('order', 'product')
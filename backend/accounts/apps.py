@@ -4,3 +4,10 @@ from django.apps import AppConfig
 class AccountsConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'accounts'
+
+    def ready(self):
+        from . import signals  # noqa: F401
+        # Pragmas for every SQLite connection; checkout and carts rely on them under load
+        from backend import sqlite  # noqa: F401
+        # Counts and times the queries of each request (sql_instrumentation_middleware)
+        from backend import sql_instrumentation  # noqa: F401
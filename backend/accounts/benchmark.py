@@ -0,0 +1,355 @@
+"""
+Endpoint benchmarks.
+
+Every named route in accounts.urls and products.urls has a scenario here. A
+scenario picks the request a shopper sends, and first does any setup that
+request needs, untimed; for example, it puts an item in the cart before
+removing it. run_route() drives one scenario through the test client from
+several threads. It reports latency percentiles, queries per request and the
+peak memory allocated per request.
+"""
+import itertools
+import random
+import statistics
+import threading
+import time
+import tracemalloc
+import uuid
+
+from django.db import connection
+from django.urls import get_resolver, reverse
+from rest_framework.test import APIClient
+from rest_framework_simplejwt.tokens import RefreshToken
+
+from accounts import urls as accounts_urls
+from backend.sql_instrumentation import record
+from products import urls as products_urls
+from products.benchmark import percentile
+from products.models import Product
+
+from . import carts, wishlists
+from .models import Cart, CartItem, Order, Wishlist, WishlistItem
+from .seeding import PASSWORD
+
+ROUTES = {}
+
+
+def scenario(name):
+    def register(func):
+        ROUTES[name] = func
+        return func
+    return register
+
+
+def route_templates():
+    """``{name: path template}`` for every named route in accounts.urls and products.urls."""
+    templates = {}
+    for resolver in get_resolver().url_patterns:
+        if getattr(resolver, 'urlconf_module', None) in (accounts_urls, products_urls):
+            for pattern in resolver.url_patterns:
+                if pattern.name:
+                    templates[pattern.name] = f'/{resolver.pattern}{pattern.pattern}'
+    return templates
+
+
+class Shopper:
+    """A seeded user with an authenticated client: JWT for the API views, a session for the rest."""
+
+    def __init__(self, user, product_ids, seed):
+        self.user = user
+        self.product_ids = product_ids
+        self.rng = random.Random(seed)
+        self.client = APIClient(raise_request_exception=False, SERVER_NAME='localhost')
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {RefreshToken.for_user(user).access_token}')
+        self.client.force_login(user)
+
+    def product_id(self):
+        return self.rng.choice(self.product_ids)
+
+    def sample(self, count):
+        return self.rng.sample(self.product_ids, count)
+
+    def cart(self):
+        return Cart.objects.get_or_create(user=self.user)[0]
+
+    def wishlist(self):
+        return Wishlist.objects.get_or_create(user=self.user)[0]
+
+    def cart_item_id(self):
+        product_id = self.product_id()
+        carts.add_item(self.cart(), Product.objects.get(id=product_id), 1)
+        return CartItem.objects.get(cart__user=self.user, product_id=product_id).id
+
+    def order_id(self):
+        return Order.objects.filter(user=self.user).values_list('id', flat=True).first()
+
+
+# Reads
+
+@scenario('address_list_create')
+def address_list_create(shopper):
+    return 'get', reverse('address_list_create'), None
+
+
+@scenario('address_detail')
+def address_detail(shopper):
+    return 'get', reverse('address_detail', args=[shopper.user.addresses.values_list('id', flat=True)[0]]), None
+
+
+@scenario('profile')
+def profile(shopper):
+    return 'get', reverse('profile'), None
+
+
+@scenario('wishlist')
+def wishlist(shopper):
+    return 'get', reverse('wishlist'), None
+
+
+@scenario('wishlist_contains')
+def wishlist_contains(shopper):
+    return 'get', reverse('wishlist_contains') + '?ids=' + ','.join(map(str, shopper.sample(20))), None
+
+
+@scenario('cart')
+def cart(shopper):
+    return 'get', reverse('cart'), None
+
+
+@scenario('order_list')
+def order_list(shopper):
+    return 'get', reverse('order_list'), None
+
+
+@scenario('order_detail')
+def order_detail(shopper):
+    return 'get', reverse('order_detail', args=[shopper.order_id()]), None
+
+
+@scenario('order_tracking')
+def order_tracking(shopper):
+    return 'get', reverse('order_tracking', args=[shopper.order_id()]), None
+
+
+@scenario('order_tracking_stream')
+def order_tracking_stream(shopper):
+    # Long-poll mode; rows after 0 exist, so it answers without waiting
+    return 'get', reverse('order_tracking_stream', args=[shopper.order_id()]) + '?after=0&timeout=0', None
+
+
+@scenario('product_list')
+def product_list(shopper):
+    return 'get', reverse('product_list') + '?limit=20', None
+
+
+@scenario('product_detail')
+def product_detail(shopper):
+    return 'get', reverse('product_detail', args=[shopper.product_id()]), None
+
+
+@scenario('product_batch')
+def product_batch(shopper):
+    return 'get', reverse('product_batch') + '?ids=' + ','.join(map(str, shopper.sample(20))), None
+
+
+@scenario('category_list')
+def category_list(shopper):
+    return 'get', reverse('category_list'), None
+
+
+@scenario('product_list_async')
+def product_list_async(shopper):
+    return 'get', reverse('product_list_async') + '?limit=20', None
+
+
+@scenario('product_detail_async')
+def product_detail_async(shopper):
+    return 'get', reverse('product_detail_async', args=[shopper.product_id()]), None
+
+
+@scenario('category_list_async')
+def category_list_async(shopper):
+    return 'get', reverse('category_list_async'), None
+
+
+# Auth
+
+@scenario('register')
+def register(shopper):
+    return 'post', reverse('register'), {
+        'name': 'Bench Shopper', 'email': f'bench-{uuid.uuid4().hex}@example.com',
+        'mobile': '9876543210', 'password': PASSWORD,
+    }
+
+
+@scenario('login')
+def login(shopper):
+    return 'post', reverse('login'), {'email': shopper.user.email, 'password': PASSWORD}
+
+
+@scenario('forgot_password')
+def forgot_password(shopper):
+    return 'post', reverse('forgot_password'), {'email': shopper.user.email}
+
+
+@scenario('token_refresh')
+def token_refresh(shopper):
+    return 'post', reverse('token_refresh'), {'refresh': str(RefreshToken.for_user(shopper.user))}
+
+
+# Writes
+
+@scenario('add_to_wishlist')
+def add_to_wishlist(shopper):
+    return 'post', reverse('add_to_wishlist'), {'product_id': shopper.product_id()}
+
+
+@scenario('remove_from_wishlist')
+def remove_from_wishlist(shopper):
+    wishlist = shopper.wishlist()
+    product_id = shopper.product_id()
+    wishlists.add_products(wishlist, [product_id])
+    item_id = WishlistItem.objects.get(wishlist=wishlist, product_id=product_id).id
+    return 'delete', reverse('remove_from_wishlist', args=[item_id]), None
+
+
+@scenario('wishlist_bulk_add')
+def wishlist_bulk_add(shopper):
+    return 'post', reverse('wishlist_bulk_add'), {'product_ids': shopper.sample(10)}
+
+
+@scenario('wishlist_bulk_remove')
+def wishlist_bulk_remove(shopper):
+    product_ids = shopper.sample(10)
+    wishlists.add_products(shopper.wishlist(), product_ids)
+    return 'post', reverse('wishlist_bulk_remove'), {'product_ids': product_ids}
+
+
+@scenario('wishlist_move_to_cart')
+def wishlist_move_to_cart(shopper):
+    product_ids = shopper.sample(3)
+    wishlists.add_products(shopper.wishlist(), product_ids)
+    return 'post', reverse('wishlist_move_to_cart'), {'product_ids': product_ids}
+
+
+@scenario('clear_wishlist')
+def clear_wishlist(shopper):
+    wishlists.add_products(shopper.wishlist(), shopper.sample(5))
+    return 'delete', reverse('clear_wishlist'), None
+
+
+@scenario('add_to_cart')
+def add_to_cart(shopper):
+    return 'post', reverse('add_to_cart'), {'product_id': shopper.product_id()}
+
+
+@scenario('update_cart_item')
+def update_cart_item(shopper):
+    return 'put', reverse('update_cart_item', args=[shopper.cart_item_id()]), {'quantity': 1}
+
+
+@scenario('remove_from_cart')
+def remove_from_cart(shopper):
+    return 'delete', reverse('remove_from_cart', args=[shopper.cart_item_id()]), None
+
+
+@scenario('cart_batch')
+def cart_batch(shopper):
+    return 'post', reverse('cart_batch'), {
+        'operations': [{'op': 'add', 'product_id': product_id, 'quantity': 1} for product_id in shopper.sample(3)],
+    }
+
+
+@scenario('clear_cart')
+def clear_cart(shopper):
+    shopper.cart_item_id()
+    return 'delete', reverse('clear_cart'), None
+
+
+@scenario('create_order')
+def create_order(shopper):
+    shopper.cart_item_id()
+    return 'post', reverse('create_order'), {
+        'delivery_address_id': shopper.user.addresses.values_list('id', flat=True)[0],
+        'delivery_slot_date': '2026-10-20',
+        'delivery_slot_time': '10:00 - 12:00',
+        'payment_method': 'cod',
+    }
+
+
+def _send(shopper, method, path, data):
+    with record() as log:
+        started = time.perf_counter()
+        response = getattr(shopper.client, method)(path, data, format='json')
+        elapsed = time.perf_counter() - started
+    return response, elapsed, log
+
+
+def _ok(response):
+    return response.status_code < 400
+
+
+def run_level(name, shoppers, requests):
+    """Send ``requests`` requests of scenario ``name``, one thread per shopper."""
+    func = ROUTES[name]
+    counter = itertools.count()
+    lock = threading.Lock()
+    latencies, queries, errors = [], [], 0
+
+    def worker(shopper):
+        nonlocal errors
+        try:
+            while next(counter) < requests:
+                response, elapsed, log = _send(shopper, *func(shopper))
+                with lock:
+                    latencies.append(elapsed)
+                    queries.append(log.count)
+                    errors += not _ok(response)
+        finally:
+            connection.close()
+
+    threads = [threading.Thread(target=worker, args=(shopper,)) for shopper in shoppers]
+    started = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - started
+
+    return {
+        'requests': len(latencies),
+        'rps': round(len(latencies) / elapsed, 1),
+        'p50_ms': round(percentile(latencies, 0.5) * 1000, 2),
+        'p95_ms': round(percentile(latencies, 0.95) * 1000, 2),
+        'p99_ms': round(percentile(latencies, 0.99) * 1000, 2),
+        'queries': round(statistics.mean(queries), 2),
+        'errors': errors,
+    }
+
+
+def measure_allocations(name, shopper, requests):
+    """Median peak of memory allocated while serving one request of ``name``, in KiB."""
+    func = ROUTES[name]
+    peaks = []
+    tracemalloc.start()
+    try:
+        for _ in range(requests):
+            request = func(shopper)
+            tracemalloc.reset_peak()
+            baseline = tracemalloc.get_traced_memory()[0]
+            _send(shopper, *request)
+            peaks.append(tracemalloc.get_traced_memory()[1] - baseline)
+    finally:
+        tracemalloc.stop()
+    return round(statistics.median(peaks) / 1024, 1)
+
+
+def run_route(name, shoppers, levels, requests, allocation_requests=10):
+    """Benchmark one route at each concurrency in ``levels``."""
+    method, _, _ = ROUTES[name](shoppers[0])
+    return {
+        'method': method.upper(),
+        'path': route_templates()[name],
+        'levels': {str(level): run_level(name, shoppers[:level], requests) for level in levels},
+        'alloc_peak_kib': measure_allocations(name, shoppers[0], allocation_requests),
+    }
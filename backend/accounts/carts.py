@@ -0,0 +1,142 @@
+from django.db import IntegrityError, transaction
+from django.db.models import DecimalField, F, OuterRef, Subquery, Sum, Value
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+
+from backend.sqlite import write_transaction
+
+from .inventory import InsufficientStock
+from .models import Cart, CartItem
+from .sync import record_changes
+
+BATCH_OPERATIONS = ('add', 'set', 'remove')
+
+
+def user_cart(user):
+    """The cart of ``user``, created under the write lock on first use."""
+    try:
+        return Cart.objects.get(user=user)
+    except Cart.DoesNotExist:
+        with write_transaction():
+            return Cart.objects.get_or_create(user=user)[0]
+
+
+def adjust_totals(cart_id, quantity, amount):
+    """Shift a cart's denormalized totals by ``quantity`` items worth ``amount``."""
+    Cart.objects.filter(id=cart_id).update(
+        total_items=F('total_items') + quantity,
+        total_price=F('total_price') + amount,
+        updated_at=timezone.now(),
+    )
+
+
+def reset_totals(cart_id):
+    Cart.objects.filter(id=cart_id).update(total_items=0, total_price=0, updated_at=timezone.now())
+
+
+def drop_product(product_id):
+    """
+    Take ``product_id`` out of the totals of every cart holding it and tombstone its lines.
+
+    Runs from pre_delete, in the transaction whose cascade then deletes the lines.
+    """
+    for item in CartItem.objects.filter(product_id=product_id).select_related('cart', 'product'):
+        adjust_totals(item.cart_id, -item.quantity, -item.subtotal)
+        record_changes(item.cart, removed=[(item.id, product_id)])
+
+
+def recalculate_totals(carts):
+    """Recompute totals for every cart in the ``carts`` queryset with one aggregate UPDATE."""
+    per_cart = CartItem.objects.filter(cart=OuterRef('pk')).order_by().values('cart')
+    decimal = DecimalField(max_digits=12, decimal_places=2)
+    return carts.update(
+        total_items=Coalesce(Subquery(per_cart.annotate(n=Sum('quantity')).values('n')), 0),
+        total_price=Coalesce(
+            Subquery(per_cart.annotate(
+                amount=Sum(F('quantity') * F('product__price'), output_field=decimal),
+            ).values('amount')),
+            Value(0),
+            output_field=decimal,
+        ),
+    )
+
+
+def recalculate_for_product(product_id):
+    """Refresh totals of the carts holding ``product_id`` after its price changed."""
+    return recalculate_totals(Cart.objects.filter(id__in=CartItem.objects.filter(product_id=product_id).values('cart_id')))
+
+
+def _increment(cart, product, quantity):
+    """Add ``quantity`` to the cart line with a single F() update, creating the line if needed."""
+    if CartItem.objects.filter(cart=cart, product=product).update(quantity=F('quantity') + quantity):
+        return
+    try:
+        with transaction.atomic():
+            CartItem.objects.create(cart=cart, product=product, quantity=quantity)
+    except IntegrityError:
+        # Another request created the line first; fall back to incrementing it
+        CartItem.objects.filter(cart=cart, product=product).update(quantity=F('quantity') + quantity)
+
+
+def _check_stock(cart, products):
+    over = CartItem.objects.filter(
+        cart=cart, product__in=products, quantity__gt=F('product__stock'),
+    ).select_related('product')
+    shortfalls = [
+        {
+            'product_id': item.product_id,
+            'name': item.product.name,
+            'requested': item.quantity,
+            'available': item.product.stock,
+        }
+        for item in over
+    ]
+    if shortfalls:
+        raise InsufficientStock(shortfalls)
+
+
+def add_item(cart, product, quantity):
+    """
+    Atomically add ``quantity`` of ``product`` and return the updated line.
+
+    Concurrent adds never lose an increment. Raises InsufficientStock (and
+    changes nothing) if the line would exceed the product's stock.
+    """
+    with write_transaction():
+        _increment(cart, product, quantity)
+        _check_stock(cart, [product])
+        adjust_totals(cart.id, quantity, product.price * quantity)
+        record_changes(cart, changed=[product.id])
+        return CartItem.objects.get(cart=cart, product=product)
+
+
+def apply_operations(cart, operations, products):
+    """
+    Apply a list of validated cart operations in one transaction.
+
+    Each operation is a dict with ``op`` (add, set or remove), ``product_id``
+    and, for add/set, ``quantity``. ``products`` maps ids to Product rows.
+    Adds are F() increments; a set to 0 removes the line. Stock is checked
+    once at the end and totals are recomputed with a single aggregate.
+    """
+    with write_transaction():
+        existing = dict(CartItem.objects.filter(cart=cart, product__in=products).values_list('product_id', 'id'))
+        for operation in operations:
+            product = products[operation['product_id']]
+            if operation['op'] == 'add':
+                _increment(cart, product, operation['quantity'])
+            elif operation['op'] == 'set' and operation['quantity'] > 0:
+                CartItem.objects.update_or_create(
+                    cart=cart, product=product, defaults={'quantity': operation['quantity']},
+                )
+            else:
+                CartItem.objects.filter(cart=cart, product=product).delete()
+
+        _check_stock(cart, list(products.values()))
+        recalculate_totals(Cart.objects.filter(id=cart.id))
+        present = set(CartItem.objects.filter(cart=cart, product__in=products).values_list('product_id', flat=True))
+        record_changes(
+            cart,
+            changed=present,
+            removed=[(item_id, product_id) for product_id, item_id in existing.items() if product_id not in present],
+        )
@@ -0,0 +1,146 @@
+from collections import defaultdict
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Case, F, Q, When
+from django.utils import timezone
+
+from products.cache import PRODUCTS_TAG, invalidate, product_tag
+from products.models import Product
+
+from .models import Order, StockReservation
+
+
+class InsufficientStock(Exception):
+    """Raised when one or more lines cannot be reserved. Nothing is reserved in that case."""
+
+    def __init__(self, shortfalls):
+        super().__init__('Some items are out of stock')
+        self.shortfalls = shortfalls
+
+
+class _ReservationFailed(Exception):
+    pass
+
+
+def reservation_ttl():
+    return timedelta(minutes=getattr(settings, 'STOCK_RESERVATION_MINUTES', 15))
+
+
+def holds_stock(payment_method):
+    """Whether checkouts paid with ``payment_method`` hold stock until payment is confirmed."""
+    return payment_method in getattr(settings, 'STOCK_HOLD_PAYMENT_METHODS', ())
+
+
+def _shift_stock(deltas, condition=None):
+    """
+    Apply ``{product_id: delta}`` to Product.stock in one UPDATE and return the
+    number of rows changed. ``condition`` optionally narrows which rows qualify.
+    """
+    queryset = Product.objects.filter(id__in=deltas)
+    if condition is not None:
+        queryset = queryset.filter(condition)
+    updated = queryset.update(
+        stock=Case(*[When(id=pk, then=F('stock') + delta) for pk, delta in deltas.items()]),
+        updated_at=timezone.now(),
+    )
+    invalidate(PRODUCTS_TAG, *[product_tag(pk) for pk in deltas])
+    return updated
+
+
+def reserve_stock(order, lines):
+    """
+    Atomically take stock for ``lines`` (``(product, quantity)`` pairs) on behalf of ``order``.
+
+    All lines are decremented in a single conditional UPDATE that only matches
+    rows with enough stock, so concurrent checkouts can never drive stock
+    negative. Either every line is reserved or none is and InsufficientStock
+    reports the per-line shortfall. Orders paid on delivery are committed
+    straight away, and so are the others unless STOCK_HOLD_PAYMENT_METHODS
+    lists their payment method: those are held until payment is confirmed or
+    they expire.
+    """
+    requested = defaultdict(int)
+    names = {}
+    for product, quantity in lines:
+        requested[product.id] += quantity
+        names[product.id] = product.name
+
+    condition = Q()
+    for pk, quantity in requested.items():
+        condition |= Q(id=pk, stock__gte=quantity)
+
+    try:
+        with transaction.atomic():
+            updated = _shift_stock({pk: -quantity for pk, quantity in requested.items()}, condition)
+            if updated != len(requested):
+                raise _ReservationFailed
+    except _ReservationFailed:
+        available = dict(Product.objects.filter(id__in=requested).values_list('id', 'stock'))
+        raise InsufficientStock([
+            {
+                'product_id': pk,
+                'name': names[pk],
+                'requested': quantity,
+                'available': available.get(pk, 0),
+            }
+            for pk, quantity in requested.items()
+            if available.get(pk, 0) < quantity
+        ])
+
+    held = holds_stock(order.payment_method)
+    expires_at = timezone.now() + reservation_ttl() if held else None
+    return StockReservation.objects.bulk_create([
+        StockReservation(
+            order=order,
+            product_id=pk,
+            quantity=quantity,
+            status='held' if held else 'committed',
+            expires_at=expires_at,
+        )
+        for pk, quantity in requested.items()
+    ])
+
+
+def confirm_reservations(order):
+    """Keep the stock for good once payment has gone through or the order has moved on."""
+    return order.reservations.filter(status='held').update(status='committed', expires_at=None)
+
+
+def release_reservations(reservations):
+    """
+    Return the stock of ``reservations`` that are still held or committed.
+
+    Each reservation is flipped to released with a conditional update first,
+    so a sweeper and a cancellation racing on the same order restock only once.
+    """
+    now = timezone.now()
+    restock = defaultdict(int)
+    with transaction.atomic():
+        for reservation in reservations.filter(status__in=['held', 'committed']):
+            flipped = StockReservation.objects.filter(id=reservation.id, status=reservation.status).update(
+                status='released', released_at=now,
+            )
+            if flipped:
+                restock[reservation.product_id] += reservation.quantity
+        if restock:
+            _shift_stock(restock)
+    return sum(restock.values())
+
+
+def release_expired_reservations(now=None):
+    """Release held reservations whose payment window has passed and cancel their orders."""
+    now = now or timezone.now()
+    # An order that has moved past placed keeps its stock, whatever its reservations say
+    expired = StockReservation.objects.filter(status='held', expires_at__lt=now, order__status='placed')
+    order_ids = set(expired.values_list('order_id', flat=True))
+    if not order_ids:
+        return 0
+
+    with transaction.atomic():
+        released = release_reservations(expired)
+        Order.objects.filter(id__in=order_ids, status='placed').update(
+            status='cancelled', payment_status='expired', updated_at=now,
+        )
+    return released
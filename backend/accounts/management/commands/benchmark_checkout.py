@@ -0,0 +1,135 @@
+import json
+import logging
+import random
+import threading
+import time
+from unittest import mock
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand
+from django.db import connection, connections
+from django.test.utils import override_settings
+from rest_framework.test import APIClient
+
+from accounts.models import Address
+from products.benchmark import percentile
+from products.models import Category, Product
+
+# What a bare SQLite database behaves like: rollback journal, full fsyncs and
+# deferred transactions
+BASELINE = {
+    'PRAGMAS': {'journal_mode': 'DELETE', 'synchronous': 'FULL', 'busy_timeout': 5000},
+    'IMMEDIATE_WRITES': False,
+}
+
+
+class Command(BaseCommand):
+    help = (
+        'Measure cart and checkout throughput under concurrent writers, with and without '
+        'the SQLite tuning in backend.sqlite, on a scratch copy of the schema'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--threads', type=int, default=16, help='Concurrent shoppers (default 16)')
+        parser.add_argument('--seconds', type=float, default=10, help='Duration of each run (default 10)')
+        parser.add_argument('--checkout-every', type=int, default=4, help='Check out after this many cart adds')
+        parser.add_argument('--json', action='store_true', help='Print results as JSON')
+
+    def handle(self, *args, **options):
+        # The scratch database is the test database; the configured one is never touched
+        old_name = connection.creation.create_test_db(verbosity=0, autoclobber=True, serialize=False)
+        try:
+            users, product_ids = self.seed(options['threads'])
+            results = {}
+            for mode, tuning in (('baseline', BASELINE), ('tuned', None)):
+                results[mode] = self.run(mode, tuning, users, product_ids, options)
+        finally:
+            connections.close_all()
+            connection.creation.destroy_test_db(old_name, verbosity=0)
+
+        if options['json']:
+            self.stdout.write(json.dumps(results, indent=2))
+            return
+        for mode, result in results.items():
+            self.stdout.write(
+                f"{mode:>8}: {result['ops_per_second']:>8} ops/s  p99 {result['p99_ms']:>8} ms  "
+                f"failed {result['failed']} of {result['operations']}"
+            )
+
+    def seed(self, count):
+        category = Category.objects.create(name='Benchmark')
+        product_ids = [
+            Product.objects.create(
+                name=f'Benchmark item {i}', description='Item', price='10.00', stock=10 ** 9, category=category,
+            ).id
+            for i in range(20)
+        ]
+        users = []
+        for i in range(count):
+            user = User.objects.create_user(username=f'shopper{i}@example.com', password='secret123')
+            Address.objects.create(
+                user=user, name='Shopper', phone='9876543210', address_line_1='1 Main Road',
+                city='Pune', state='MH', postal_code='411001', is_default=True,
+            )
+            users.append(user)
+        return users, product_ids
+
+    def run(self, mode, tuning, users, product_ids, options):
+        latencies = []
+        failed = 0
+        lock = threading.Lock()
+        barrier = threading.Barrier(len(users))
+
+        def shopper(user):
+            nonlocal failed
+            client = APIClient(raise_request_exception=False, SERVER_NAME='localhost')
+            client.force_authenticate(user)
+            barrier.wait()
+            deadline = time.monotonic() + options['seconds']
+            n = 0
+            try:
+                while time.monotonic() < deadline:
+                    n += 1
+                    started = time.perf_counter()
+                    if n % (options['checkout_every'] + 1) == 0:
+                        response = client.post('/api/accounts/orders/create/', {
+                            'delivery_address_id': user.addresses.first().id,
+                            'delivery_slot_date': '2026-10-20',
+                            'delivery_slot_time': '10:00 - 12:00',
+                            'payment_method': 'cod',
+                        }, format='json')
+                        ok = response.status_code == 201
+                    else:
+                        response = client.post('/api/accounts/cart/add/', {'product_id': random.choice(product_ids)})
+                        ok = response.status_code == 200
+                    elapsed = time.perf_counter() - started
+                    with lock:
+                        latencies.append(elapsed)
+                        failed += not ok
+            finally:
+                connection.close()
+
+        overrides = {'SQLITE_TUNING': tuning} if tuning is not None else {}
+        with override_settings(**overrides), \
+                mock.patch.object(logging.getLogger('django.request'), 'disabled', True):
+            # New connections pick up this mode's pragmas; journal_mode persists in the file
+            connections.close_all()
+            connection.ensure_connection()
+            connection.close()
+
+            threads = [threading.Thread(target=shopper, args=(user,)) for user in users]
+            started = time.monotonic()
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+            elapsed = time.monotonic() - started
+
+        return {
+            'threads': len(users),
+            'operations': len(latencies),
+            'failed': failed,
+            'ops_per_second': round((len(latencies) - failed) / elapsed, 1),
+            'p50_ms': round(percentile(latencies, 0.5) * 1000, 2),
+            'p99_ms': round(percentile(latencies, 0.99) * 1000, 2),
+        }
@@ -0,0 +1,150 @@
+import json
+import logging
+import platform
+import sqlite3
+import subprocess
+import time
+from unittest import mock
+
+import django
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.cache import caches
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, connections
+from django.test.utils import override_settings
+
+from accounts import seeding
+from accounts.benchmark import ROUTES, Shopper, route_templates, run_route
+from accounts.models import OrderItem
+from products.cache import get_backend
+from products.models import Product
+
+
+class Command(BaseCommand):
+    help = (
+        'Benchmark every accounts and products route against a seeded database and print the '
+        'results as JSON (latency percentiles, queries and allocations per request)'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--scale', type=float, default=1.0,
+                            help='Data set size; 1.0 is 100k products, 10k users and 1M order lines')
+        parser.add_argument('--seed', type=int, default=0, help='Random seed for data and requests (default 0)')
+        parser.add_argument('--concurrency', default='1,4,16', help='Comma-separated thread counts (default 1,4,16)')
+        parser.add_argument('--requests', type=int, default=200, help='Requests per route and level (default 200)')
+        parser.add_argument('--routes', help='Comma-separated route names to run (default: all)')
+        parser.add_argument('--database', default='benchmark.sqlite3',
+                            help='Scratch database file under BASE_DIR (default benchmark.sqlite3)')
+        parser.add_argument('--keepdb', action='store_true',
+                            help='Keep the scratch database, and reuse it if it is already seeded')
+        parser.add_argument('--output', help='Write the JSON here instead of stdout')
+        parser.add_argument('--baseline', help='A previous JSON result to compare p95 latencies against')
+
+    def handle(self, *args, **options):
+        routes = route_templates()
+        missing = sorted(set(routes) - set(ROUTES))
+        if missing:
+            raise CommandError(f'No benchmark scenario for routes: {", ".join(missing)}')
+        names = options['routes'].split(',') if options['routes'] else list(routes)
+        unknown = sorted(set(names) - set(ROUTES))
+        if unknown:
+            raise CommandError(f'Unknown routes: {", ".join(unknown)}')
+        try:
+            levels = sorted({int(level) for level in options['concurrency'].split(',')})
+        except ValueError:
+            raise CommandError('--concurrency must be a comma-separated list of integers')
+
+        # The configured database is never touched; results come from a scratch copy of the schema
+        connection.settings_dict['TEST'] = {
+            **connection.settings_dict.get('TEST', {}), 'NAME': str(settings.BASE_DIR / options['database']),
+        }
+        old_name = connection.creation.create_test_db(
+            verbosity=0, autoclobber=True, serialize=False, keepdb=options['keepdb'],
+        )
+        try:
+            results = self.run(names, levels, options)
+        finally:
+            connections.close_all()
+            if not options['keepdb']:
+                connection.creation.destroy_test_db(old_name, verbosity=0)
+
+        output = json.dumps(results, indent=2)
+        if options['output']:
+            with open(options['output'], 'w') as f:
+                f.write(output + '\n')
+        else:
+            self.stdout.write(output)
+        if options['baseline']:
+            self.compare(options['baseline'], results)
+
+    def log(self, message):
+        self.stderr.write(message)
+
+    def run(self, names, levels, options):
+        if Product.objects.exists():
+            self.log('Reusing the seeded scratch database')
+        else:
+            started = time.monotonic()
+            seeding.seed(scale=options['scale'], seed=options['seed'], log=self.log)
+            self.log(f'Seeded in {time.monotonic() - started:.0f}s')
+
+        product_ids = list(Product.objects.filter(is_active=True, stock__gte=100).values_list('id', flat=True))
+        users = User.objects.filter(orders__isnull=False, addresses__isnull=False).distinct().order_by('id')
+        shoppers = [
+            Shopper(user, product_ids, seed=options['seed'] + i) for i, user in enumerate(users[:max(levels)])
+        ]
+        if len(shoppers) < max(levels):
+            raise CommandError(f'Only {len(shoppers)} seeded users with orders; lower --concurrency or raise --scale')
+
+        routes = {}
+        # Responses are measured as is; errors are counted, not logged
+        with override_settings(SQL_INSTRUMENTATION={'RAISE': False}), \
+                mock.patch.object(logging.getLogger('django.request'), 'disabled', True), \
+                mock.patch.object(logging.getLogger('backend.sql'), 'disabled', True):
+            for name in names:
+                caches['default'].clear()
+                get_backend().clear()
+                routes[name] = run_route(name, shoppers, levels, options['requests'])
+                self.log(f'{name}: ' + '  '.join(
+                    f'x{level} p95 {result["p95_ms"]} ms' for level, result in routes[name]['levels'].items()
+                ))
+
+        return {
+            'meta': {
+                'commit': self.commit(),
+                'created_at': time.strftime('%Y-%m-%dT%H:%M:%SZ', time.gmtime()),
+                'scale': options['scale'],
+                'seed': options['seed'],
+                'requests': options['requests'],
+                'concurrency': levels,
+                'rows': {
+                    'products': Product.objects.count(),
+                    'users': User.objects.count(),
+                    'order_lines': OrderItem.objects.count(),
+                },
+                'python': platform.python_version(),
+                'django': django.get_version(),
+                'sqlite': sqlite3.sqlite_version,
+            },
+            'routes': routes,
+        }
+
+    def commit(self):
+        try:
+            return subprocess.run(
+                ['git', 'rev-parse', 'HEAD'], cwd=settings.BASE_DIR, capture_output=True, text=True, check=True,
+            ).stdout.strip()
+        except (OSError, subprocess.CalledProcessError):
+            return None
+
+    def compare(self, path, results):
+        with open(path) as f:
+            baseline = json.load(f)['routes']
+        for name, route in results['routes'].items():
+            for level, result in route['levels'].items():
+                before = baseline.get(name, {}).get('levels', {}).get(level)
+                if not before:
+                    continue
+                change = (result['p95_ms'] - before['p95_ms']) / before['p95_ms'] * 100 if before['p95_ms'] else 0
+                self.log(f'{name:>24} x{level:<3} p95 {before["p95_ms"]:>9} -> {result["p95_ms"]:>9} ms ({change:+.0f}%)')
@@ -0,0 +1,43 @@
+import time
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+
+from accounts import seeding
+
+
+class Command(BaseCommand):
+    help = (
+        'Generate a large synthetic data set (catalog, shoppers with carts and wishlists, order '
+        'history) for scaling tests'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--scale', type=float, default=1.0,
+                            help='Data set size; 1.0 is 100k products, 10k users and 1M order lines')
+        parser.add_argument('--seed', type=int, default=0, help='Random seed; the same seed gives the same data')
+        parser.add_argument('--chunk-size', type=int, default=5000, help='Rows per bulk insert and transaction')
+        parser.add_argument('--keep-indexes', action='store_true',
+                            help='Insert into indexed tables instead of dropping and rebuilding the indexes')
+
+    def handle(self, *args, **options):
+        if options['scale'] <= 0 or options['chunk_size'] <= 0:
+            raise CommandError('--scale and --chunk-size must be positive')
+        if User.objects.filter(username='shopper0@example.com').exists():
+            raise CommandError('The database already holds seeded data; run `manage.py flush` first.')
+
+        started = time.monotonic()
+
+        def log(message):
+            self.stdout.write(f'[{time.monotonic() - started:7.1f}s] {message}')
+
+        counts = seeding.seed(
+            scale=options['scale'], seed=options['seed'], chunk_size=options['chunk_size'],
+            defer_indexes=not options['keep_indexes'], log=log,
+        )
+        rows = sum(counts.values())
+        elapsed = time.monotonic() - started
+        self.stdout.write(self.style.SUCCESS(
+            f'Seeded {rows} rows in {elapsed:.1f}s ({rows / elapsed:.0f} rows/s): '
+            + ', '.join(f'{count} {name.replace("_", " ")}' for name, count in counts.items())
+        ))
@@ -0,0 +1,43 @@
+# Generated by Django 5.2.18 on 2026-10-16 22:54
+
+from django.db import migrations, models
+from django.db.models import DecimalField, F, OuterRef, Subquery, Sum, Value
+from django.db.models.functions import Coalesce
+
+
+def backfill_cart_totals(apps, schema_editor):
+    Cart = apps.get_model('accounts', 'Cart')
+    CartItem = apps.get_model('accounts', 'CartItem')
+    per_cart = CartItem.objects.filter(cart=OuterRef('pk')).order_by().values('cart')
+    decimal = DecimalField(max_digits=12, decimal_places=2)
+    Cart.objects.update(
+        total_items=Coalesce(Subquery(per_cart.annotate(n=Sum('quantity')).values('n')), 0),
+        total_price=Coalesce(
+            Subquery(per_cart.annotate(
+                amount=Sum(F('quantity') * F('product__price'), output_field=decimal),
+            ).values('amount')),
+            Value(0),
+            output_field=decimal,
+        ),
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0005_stockreservation'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='cart',
+            name='total_items',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='cart',
+            name='total_price',
+            field=models.DecimalField(decimal_places=2, default=0, editable=False, max_digits=12),
+        ),
+        migrations.RunPython(backfill_cart_totals, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,60 @@
+# Generated by Django 5.2.18 on 2026-10-16 22:58
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0006_cart_totals'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='cart',
+            name='version',
+            field=models.PositiveBigIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='cartitem',
+            name='version',
+            field=models.PositiveBigIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='wishlist',
+            name='version',
+            field=models.PositiveBigIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='wishlistitem',
+            name='version',
+            field=models.PositiveBigIntegerField(default=0),
+        ),
+        migrations.CreateModel(
+            name='CartItemTombstone',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('product_id', models.BigIntegerField()),
+                ('item_id', models.BigIntegerField()),
+                ('version', models.PositiveBigIntegerField()),
+                ('cart', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='tombstones', to='accounts.cart')),
+            ],
+            options={
+                'unique_together': {('cart', 'product_id')},
+            },
+        ),
+        migrations.CreateModel(
+            name='WishlistItemTombstone',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('product_id', models.BigIntegerField()),
+                ('item_id', models.BigIntegerField()),
+                ('version', models.PositiveBigIntegerField()),
+                ('wishlist', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='tombstones', to='accounts.wishlist')),
+            ],
+            options={
+                'unique_together': {('wishlist', 'product_id')},
+            },
+        ),
+    ]
@@ -0,0 +1,27 @@
+# Generated by Django 5.2.18 on 2026-10-16 23:18
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0007_sync_versions'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='address',
+            index=models.Index(fields=['user', '-is_default', '-created_at'], name='address_user_ordering_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='order',
+            index=models.Index(fields=['user', '-created_at'], name='order_user_recent_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='ordertracking',
+            index=models.Index(fields=['order', 'timestamp'], name='tracking_order_time_idx'),
+        ),
+    ]
@@ -0,0 +1,30 @@
+from django.db import migrations
+
+
+def set_journal_mode(mode):
+    def operation(apps, schema_editor):
+        connection = schema_editor.connection
+        if connection.vendor == 'sqlite' and not connection.is_in_memory_db():
+            with connection.cursor() as cursor:
+                cursor.execute(f'PRAGMA journal_mode = {mode}')
+    return operation
+
+
+class Migration(migrations.Migration):
+    """
+    Switch the SQLite database to write-ahead logging (see backend.sqlite).
+
+    The journal mode is stored in the database file, so this is done once
+    here rather than on every connection.
+    """
+
+    # SQLite cannot change the journal mode inside a transaction
+    atomic = False
+
+    dependencies = [
+        ('accounts', '0008_hot_path_indexes'),
+    ]
+
+    operations = [
+        migrations.RunPython(set_journal_mode('WAL'), set_journal_mode('DELETE')),
+    ]
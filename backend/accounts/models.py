@@ -2,6 +2,7 @@ from django.db import models
 from decimal import Decimal
 from django.contrib.auth.models import User
 from products.models import Product
+from .order_numbers import next_order_number
 
 class Address(models.Model):
     ADDRESS_TYPES = [
@@ -28,30 +29,40 @@ class Address(models.Model):
         verbose_name = 'Address'
         verbose_name_plural = 'Addresses'
         ordering = ['-is_default', '-created_at']
+        indexes = [
+            # A user's addresses in display order, default first
+            models.Index(fields=['user', '-is_default', '-created_at'], name='address_user_ordering_idx'),
+        ]
 
     def __str__(self):
         return f"{self.name} - {self.type} ({self.city})"
 
 class Cart(models.Model):
     user = models.OneToOneField(User, on_delete=models.CASCADE, related_name='cart')
+    # Denormalized totals, maintained by accounts.carts on every cart mutation
+    total_items = models.PositiveIntegerField(default=0, editable=False)
+    total_price = models.DecimalField(max_digits=12, decimal_places=2, default=0, editable=False)
+    version = models.PositiveBigIntegerField(default=0, editable=False)  # Bumped by accounts.sync on every change
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
     def __str__(self):
         return f"Cart of {self.user.username}"
 
-    @property
-    def total_items(self):
-        return sum(item.quantity for item in self.items.all())
-
-    @property
-    def total_price(self):
-        return sum(item.subtotal for item in self.items.all())
+    def save(self, *args, **kwargs):
+        # Totals are only ever changed with F() updates; never write back a stale copy
+        if not self._state.adding and kwargs.get('update_fields') is None:
+            kwargs['update_fields'] = [
+                f.name for f in self._meta.concrete_fields
+                if not f.primary_key and f.name not in ('total_items', 'total_price', 'version')
+            ]
+        super().save(*args, **kwargs)
 
 class CartItem(models.Model):
     cart = models.ForeignKey(Cart, on_delete=models.CASCADE, related_name='items')
     product = models.ForeignKey(Product, on_delete=models.CASCADE)
     quantity = models.PositiveIntegerField(default=1)
+    version = models.PositiveBigIntegerField(default=0)  # Cart.version of the last change to this line
     added_at = models.DateTimeField(auto_now_add=True)
 
     class Meta:
@@ -66,6 +77,7 @@ class CartItem(models.Model):
 
 class Wishlist(models.Model):
     user = models.OneToOneField(User, on_delete=models.CASCADE, related_name='wishlist')
+    version = models.PositiveBigIntegerField(default=0, editable=False)  # Bumped by accounts.sync on every change
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
@@ -75,6 +87,7 @@ class Wishlist(models.Model):
 class WishlistItem(models.Model):
     wishlist = models.ForeignKey(Wishlist, on_delete=models.CASCADE, related_name='items')
     product = models.ForeignKey(Product, on_delete=models.CASCADE)
+    version = models.PositiveBigIntegerField(default=0)  # Wishlist.version of the last change to this item
     added_at = models.DateTimeField(auto_now_add=True)
 
     class Meta:
@@ -84,6 +97,28 @@ class WishlistItem(models.Model):
         return f"{self.product.name} in {self.wishlist.user.username}'s wishlist"
 
 
+class CartItemTombstone(models.Model):
+    """Records a removed cart line so delta syncs can tell clients to drop it."""
+    cart = models.ForeignKey(Cart, on_delete=models.CASCADE, related_name='tombstones')
+    product_id = models.BigIntegerField()
+    item_id = models.BigIntegerField()
+    version = models.PositiveBigIntegerField()
+
+    class Meta:
+        unique_together = ['cart', 'product_id']
+
+
+class WishlistItemTombstone(models.Model):
+    """Records a removed wishlist item so delta syncs can tell clients to drop it."""
+    wishlist = models.ForeignKey(Wishlist, on_delete=models.CASCADE, related_name='tombstones')
+    product_id = models.BigIntegerField()
+    item_id = models.BigIntegerField()
+    version = models.PositiveBigIntegerField()
+
+    class Meta:
+        unique_together = ['wishlist', 'product_id']
+
+
 class Profile(models.Model):
     user = models.OneToOneField(User, on_delete=models.CASCADE)
     phone = models.CharField(max_length=15, blank=True)
@@ -135,18 +170,18 @@ class Order(models.Model):
 
     class Meta:
         ordering = ['-created_at']
+        indexes = [
+            # Order history, newest first
+            models.Index(fields=['user', '-created_at'], name='order_user_recent_idx'),
+        ]
 
     def __str__(self):
         return f"Order {self.order_number} by {self.user.username}"
 
     def save(self, *args, **kwargs):
         if not self.order_number:
-            # Generate order number: ORD + timestamp + random 4 digits
-            import random
-            import time
-            timestamp = str(int(time.time()))
-            random_digits = str(random.randint(1000, 9999))
-            self.order_number = f"ORD{timestamp}{random_digits}"
+            # Generate order number: ORD + time-ordered snowflake id (see order_numbers)
+            self.order_number = next_order_number()
         super().save(*args, **kwargs)
 
 
@@ -183,6 +218,34 @@ class OrderTracking(models.Model):
 
     class Meta:
         ordering = ['timestamp']
+        indexes = [
+            # An order's history in either direction, and its latest status
+            models.Index(fields=['order', 'timestamp'], name='tracking_order_time_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.order.order_number} - {self.status} at {self.timestamp}"
+
+class StockReservation(models.Model):
+    STATUS_CHOICES = [
+        ('held', 'Held'),
+        ('committed', 'Committed'),
+        ('released', 'Released'),
+    ]
+
+    order = models.ForeignKey(Order, on_delete=models.CASCADE, related_name='reservations')
+    product = models.ForeignKey(Product, on_delete=models.CASCADE, related_name='reservations')
+    quantity = models.PositiveIntegerField()
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default='held')
+    expires_at = models.DateTimeField(null=True, blank=True)  # Only set while payment is pending
+    created_at = models.DateTimeField(auto_now_add=True)
+    released_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['status', 'expires_at']),
+        ]
 
     def __str__(self):
-        return f"{self.order.order_number} - {self.status} at {self.timestamp}"
\ No newline at end of file
+        return f"{self.quantity} x {self.product.name} for Order {self.order.order_number} ({self.status})"
@@ -0,0 +1,265 @@
+"""
+Reproducible synthetic data for load tests and benchmarks.
+
+seed() fills an empty database with a catalog, shoppers with carts and
+wishlists, and an order history. Rows are generated from a seeded
+random.Random, so the same ``scale`` and ``seed`` always produce the same
+data. At scale 1 that is 100k products, 10k users and 1M order lines.
+
+Rows are written in chunks, one transaction per chunk, into tables whose
+secondary indexes are dropped for the duration and built once at the end
+(see deferred_indexes). Parent rows go through bulk_create, which returns
+their ids. The high-volume child tables (cart and wishlist items, order
+lines, tracking rows) are written with a single executemany of plain
+tuples. Per row, most of bulk_create's time goes into building the model
+instance and compiling SQL, not into the insert itself. Neither path runs
+save() or signals, so the derived data those would maintain (category
+counts, cart totals, the search index) is rebuilt once at the end.
+"""
+import random
+from contextlib import contextmanager, nullcontext
+from datetime import date, timedelta
+from decimal import Decimal
+
+from django.contrib.auth.hashers import make_password
+from django.contrib.auth.models import User
+from django.db import connection, transaction
+from django.utils import timezone
+
+from products import search
+from products.counters import reconcile_product_counts
+from products.models import Category, Product
+
+from .carts import recalculate_totals
+from .models import Address, Cart, CartItem, Order, OrderItem, OrderTracking, Profile, Wishlist, WishlistItem
+from .order_numbers import PREFIX, to_base36
+
+# Row counts at scale 1; the per-user and per-order counts do not scale
+SIZES = {
+    'categories': 40,
+    'products': 100_000,
+    'users': 10_000,
+    'orders': 100_000,
+    'lines_per_order': 10,
+    'cart_items': 4,
+    'wishlist_items': 6,
+}
+
+PASSWORD = 'secret123'
+
+CATEGORY_NAMES = [
+    'Phones', 'Laptops', 'Tablets', 'Headphones', 'Speakers', 'Cameras', 'Watches', 'Televisions',
+    'Kitchen', 'Furniture', 'Books', 'Toys', 'Groceries', 'Beauty', 'Sports', 'Footwear',
+]
+BRANDS = ['Acme', 'Nimbus', 'Orion', 'Vertex', 'Zenith', 'Lumen', 'Aurora', 'Kestrel', 'Pioneer', 'Summit']
+ADJECTIVES = ['Pro', 'Lite', 'Max', 'Mini', 'Plus', 'Ultra', 'Air', 'Neo', 'Prime', 'Classic']
+CITIES = [
+    ('Mumbai', 'MH', '400001'), ('Pune', 'MH', '411001'), ('Bengaluru', 'KA', '560001'),
+    ('Chennai', 'TN', '600001'), ('Delhi', 'DL', '110001'), ('Kolkata', 'WB', '700001'),
+    ('Hyderabad', 'TS', '500001'), ('Jaipur', 'RJ', '302001'),
+]
+ORDER_STATUSES = ['placed', 'confirmed', 'packed', 'out_for_delivery', 'delivered', 'delivered', 'cancelled']
+# Tracking rows an order in each status has been through
+TRACKING_STEPS = [
+    ('placed', 'Order placed successfully'),
+    ('confirmed', 'Order confirmed by the store'),
+    ('packed', 'Order packed and ready to ship'),
+    ('out_for_delivery', 'Order is out for delivery'),
+    ('delivered', 'Order delivered'),
+]
+TRACKING_HISTORY = {status: TRACKING_STEPS[:n + 1] for n, (status, _) in enumerate(TRACKING_STEPS)}
+TRACKING_HISTORY['cancelled'] = TRACKING_STEPS[:1]
+SEEDED_MODELS = [
+    Category, Product, User, Address, Profile, Cart, CartItem, Wishlist, WishlistItem, Order, OrderItem, OrderTracking,
+]
+SLOTS = ['08:00 - 10:00', '10:00 - 12:00', '14:00 - 16:00', '18:00 - 20:00']
+# Delivery dates are spread around this day rather than today, so reruns match
+BASE_DATE = date(2026, 1, 1)
+
+
+def sizes_for(scale):
+    """Row counts for ``scale`` (1.0 is the full data set)."""
+    sizes = dict(SIZES)
+    for key in ('categories', 'products', 'users', 'orders'):
+        sizes[key] = max(1, round(SIZES[key] * scale))
+    return sizes
+
+
+def _category_name(i):
+    rounds, n = divmod(i, len(CATEGORY_NAMES))
+    return CATEGORY_NAMES[n] + (f' {rounds + 1}' if rounds else '')
+
+
+def _chunks(count, size):
+    for start in range(0, count, size):
+        yield range(start, min(start + size, count))
+
+
+@contextmanager
+def deferred_indexes(models):
+    """
+    Drop the secondary indexes of ``models``' tables for the block, then rebuild them.
+
+    Building an index once over the loaded rows is much cheaper than updating
+    it on every insert. Unique indexes stay, so constraints are still
+    enforced. Only SQLite is handled; on other databases this does nothing.
+    """
+    if connection.vendor != 'sqlite':
+        yield
+        return
+    tables = [model._meta.db_table for model in models]
+    with connection.cursor() as cursor:
+        cursor.execute(
+            "SELECT name, sql FROM sqlite_master WHERE type = 'index' AND sql IS NOT NULL "
+            f"AND tbl_name IN ({', '.join(['%s'] * len(tables))})",
+            tables,
+        )
+        # Automatic indexes (sql IS NULL) back PRIMARY KEY and UNIQUE and cannot be dropped
+        indexes = [(name, sql) for name, sql in cursor.fetchall() if not sql.upper().startswith('CREATE UNIQUE')]
+        for name, _ in indexes:
+            cursor.execute(f'DROP INDEX "{name}"')
+    try:
+        yield
+    finally:
+        with connection.cursor() as cursor:
+            for _, sql in indexes:
+                cursor.execute(sql)
+
+
+def _insert(model, fields, rows):
+    """INSERT ``rows``, tuples of database-ready values for ``fields``, with one executemany."""
+    quote = connection.ops.quote_name
+    columns = ', '.join(quote(model._meta.get_field(name).column) for name in fields)
+    placeholders = ', '.join(['%s'] * len(fields))
+    with connection.cursor() as cursor:
+        cursor.executemany(f'INSERT INTO {quote(model._meta.db_table)} ({columns}) VALUES ({placeholders})', rows)
+    return len(rows)
+
+
+def seed(scale=1.0, seed=0, chunk_size=5000, defer_indexes=True, log=lambda message: None):
+    """
+    Fill the database with the synthetic data set and return the row counts.
+
+    The seeded rows must not exist yet; ``log`` receives progress messages.
+    """
+    with deferred_indexes(SEEDED_MODELS) if defer_indexes else nullcontext():
+        counts = _load(sizes_for(scale), random.Random(seed), chunk_size, log)
+    if defer_indexes:
+        log('Indexes rebuilt')
+
+    # These are correlated per-row aggregates, so they wait for the indexes
+    with transaction.atomic():
+        recalculate_totals(Cart.objects.all())
+        reconcile_product_counts()
+        search.rebuild_index()
+    log('Cart totals, category counts and search index rebuilt')
+    return counts
+
+
+def _load(sizes, rng, chunk_size, log):
+    counts = {}
+    now = timezone.now()
+    stamp = connection.ops.adapt_datetimefield_value
+
+    categories = Category.objects.bulk_create([
+        Category(name=_category_name(i), description='Synthetic category') for i in range(sizes['categories'])
+    ])
+    counts['categories'] = len(categories)
+
+    product_ids, prices = [], []
+    for chunk in _chunks(sizes['products'], chunk_size):
+        rows = []
+        for i in chunk:
+            price = Decimal(rng.randrange(99, 200_000)) / 100
+            rows.append(Product(
+                name=f'{rng.choice(BRANDS)} {rng.choice(ADJECTIVES)} {i}',
+                description=f'Synthetic product {i}, generated for load testing.',
+                price=price,
+                original_price=(price * Decimal('1.2')).quantize(Decimal('0.01')) if rng.random() < 0.3 else None,
+                category=rng.choice(categories),
+                images=[f'products/seed/{i}-{n}.webp' for n in range(rng.randint(0, 3))],
+                stock=rng.randint(0, 500),
+                is_active=rng.random() < 0.95,
+                rating=Decimal(rng.randint(0, 50)) / 10,
+                review_count=rng.randint(0, 2000),
+            ))
+        with transaction.atomic():
+            created = Product.objects.bulk_create(rows)
+        product_ids.extend(product.id for product in created)
+        prices.extend(product.price for product in created)
+    counts['products'] = len(product_ids)
+    log(f'{len(product_ids)} products')
+
+    password = make_password(PASSWORD)
+    users, addresses = [], []
+    for chunk in _chunks(sizes['users'], chunk_size):
+        with transaction.atomic():
+            created = User.objects.bulk_create([
+                User(username=f'shopper{i}@example.com', email=f'shopper{i}@example.com', password=password,
+                     first_name='Shopper', last_name=str(i))
+                for i in chunk
+            ])
+            rows = []
+            for user in created:
+                city, state, postal_code = rng.choice(CITIES)
+                rows.append(Address(
+                    user=user, name=user.get_full_name(), phone=f'9{rng.randrange(10 ** 9):09d}',
+                    address_line_1=f'{rng.randint(1, 999)} Main Road', city=city, state=state,
+                    postal_code=postal_code, is_default=True,
+                ))
+            addresses.extend(Address.objects.bulk_create(rows))
+            Profile.objects.bulk_create([Profile(user=user, phone=address.phone) for user, address in zip(created, rows)])
+
+            added_at = stamp(now)
+            carts = Cart.objects.bulk_create([Cart(user=user) for user in created])
+            _insert(CartItem, ['cart', 'product', 'quantity', 'version', 'added_at'], [
+                (cart.id, product_id, rng.randint(1, 3), 0, added_at)
+                for cart in carts for product_id in rng.sample(product_ids, sizes['cart_items'])
+            ])
+            wishlists = Wishlist.objects.bulk_create([Wishlist(user=user) for user in created])
+            _insert(WishlistItem, ['wishlist', 'product', 'version', 'added_at'], [
+                (wishlist.id, product_id, 0, added_at)
+                for wishlist in wishlists for product_id in rng.sample(product_ids, sizes['wishlist_items'])
+            ])
+        users.extend(created)
+    # One address, profile, cart and wishlist each
+    for name in ('users', 'addresses', 'profiles', 'carts', 'wishlists'):
+        counts[name] = len(users)
+    counts['cart_items'] = len(users) * sizes['cart_items']
+    counts['wishlist_items'] = len(users) * sizes['wishlist_items']
+    log(f'{len(users)} users with addresses, profiles, carts and wishlists')
+
+    # Tracking steps an hour apart, ending now
+    step_times = [stamp(now - timedelta(hours=len(TRACKING_STEPS) - 1 - n)) for n in range(len(TRACKING_STEPS))]
+    lines = tracking = 0
+    for chunk in _chunks(sizes['orders'], max(1, chunk_size // sizes['lines_per_order'])):
+        orders, order_lines = [], []
+        for i in chunk:
+            n = rng.randrange(len(users))
+            picks = [rng.randrange(len(product_ids)) for _ in range(sizes['lines_per_order'])]
+            quantities = [rng.randint(1, 3) for _ in picks]
+            subtotal = sum(prices[p] * q for p, q in zip(picks, quantities))
+            status = rng.choice(ORDER_STATUSES)
+            orders.append(Order(
+                user=users[n], order_number=PREFIX + to_base36(i + 1), status=status,
+                payment_method=rng.choice(Order.PAYMENT_METHODS)[0],
+                payment_status='paid' if status in ('delivered', 'out_for_delivery') else 'pending',
+                delivery_address=addresses[n], delivery_slot_date=BASE_DATE + timedelta(days=rng.randint(-365, 7)),
+                delivery_slot_time=rng.choice(SLOTS), subtotal=subtotal, total=subtotal,
+            ))
+            order_lines.append(list(zip(picks, quantities)))
+        with transaction.atomic():
+            orders = Order.objects.bulk_create(orders)
+            lines += _insert(OrderItem, ['order', 'product', 'quantity', 'price', 'subtotal'], [
+                (order.id, product_ids[p], q, prices[p], prices[p] * q)
+                for order, picked in zip(orders, order_lines) for p, q in picked
+            ])
+            tracking += _insert(OrderTracking, ['order', 'status', 'message', 'timestamp'], [
+                (order.id, status, message, step_times[n])
+                for order in orders for n, (status, message) in enumerate(TRACKING_HISTORY[order.status])
+            ])
+    counts['orders'] = sizes['orders']
+    counts['order_lines'] = lines
+    counts['tracking_rows'] = tracking
+    log(f'{sizes["orders"]} orders with {lines} lines and {tracking} tracking rows')
+    return counts
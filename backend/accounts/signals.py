@@ -0,0 +1,42 @@
+from django.db import transaction
+from django.db.models.signals import post_save, pre_delete
+from django.dispatch import receiver
+
+from products.models import Product
+
+from . import carts, inventory, sync, tracking, wishlists
+from .models import Order, OrderTracking
+
+
+@receiver(post_save, sender=Order)
+def order_saved(sender, instance, created, **kwargs):
+    if created:
+        return
+    if instance.status == 'cancelled':
+        inventory.release_reservations(instance.reservations.all())
+    elif instance.payment_status == 'paid' or instance.status != 'placed':
+        inventory.confirm_reservations(instance)
+
+
+@receiver(post_save, sender=Product)
+def product_price_changed(sender, instance, created, **kwargs):
+    if created:
+        return
+    if getattr(instance, '_loaded_price', None) != instance.price:
+        carts.recalculate_for_product(instance.id)
+        sync.record_product_change(instance.id)
+        instance._loaded_price = instance.price
+
+
+@receiver(pre_delete, sender=Product)
+def product_deleting(sender, instance, **kwargs):
+    # The cascade deletes the lines without signals, so settle totals and sync state first
+    carts.drop_product(instance.id)
+    wishlists.drop_product(instance.id)
+
+
+@receiver(post_save, sender=Order)
+@receiver(post_save, sender=OrderTracking)
+def tracking_changed(sender, instance, created, **kwargs):
+    order_id = instance.order_id if sender is OrderTracking else instance.id
+    transaction.on_commit(lambda: tracking.broker.publish(order_id))
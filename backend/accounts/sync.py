@@ -0,0 +1,90 @@
+from django.db import transaction
+from django.db.models import F, OuterRef, Subquery
+
+from .models import Cart, CartItem, CartItemTombstone, Wishlist, WishlistItem, WishlistItemTombstone
+
+# Every change to a cart or wishlist takes the container's next version and
+# stamps it on the lines it touched; removed lines leave a tombstone carrying
+# that version. A client that last synced at version N then only needs the
+# lines and tombstones with a version above N. Tombstones are keyed by product,
+# so there is at most one per product a container ever held.
+_CONTAINERS = {
+    Cart: (CartItem, CartItemTombstone, 'cart'),
+    Wishlist: (WishlistItem, WishlistItemTombstone, 'wishlist'),
+}
+
+
+def _bump(container):
+    model = type(container)
+    model.objects.filter(pk=container.pk).update(version=F('version') + 1)
+    container.version = model.objects.values_list('version', flat=True).get(pk=container.pk)
+    return container.version
+
+
+def record_changes(container, changed=(), removed=()):
+    """
+    Give ``container`` (a Cart or Wishlist) a new version and return it.
+
+    ``changed`` holds the product ids of lines that were added or updated and
+    ``removed`` ``(item_id, product_id)`` pairs of deleted lines. Call it inside
+    the transaction that made the changes so versions commit in order.
+    """
+    item_model, tombstone_model, field = _CONTAINERS[type(container)]
+    with transaction.atomic():
+        version = _bump(container)
+        changed = list(changed)
+        if changed:
+            item_model.objects.filter(**{field: container}, product_id__in=changed).update(version=version)
+            tombstone_model.objects.filter(**{field: container}, product_id__in=changed).delete()
+        if removed:
+            tombstone_model.objects.bulk_create(
+                [
+                    tombstone_model(**{field: container}, item_id=item_id, product_id=product_id, version=version)
+                    for item_id, product_id in removed
+                ],
+                update_conflicts=True,
+                unique_fields=[field, 'product_id'],
+                update_fields=['item_id', 'version'],
+            )
+    return version
+
+
+def record_product_change(product_id):
+    """Mark the lines showing ``product_id`` as changed in every cart and wishlist holding it."""
+    with transaction.atomic():
+        for model, (item_model, _, field) in _CONTAINERS.items():
+            lines = item_model.objects.filter(product_id=product_id)
+            model.objects.filter(id__in=lines.values(f'{field}_id')).update(version=F('version') + 1)
+            lines.update(version=Subquery(model.objects.filter(id=OuterRef(f'{field}_id')).values('version')[:1]))
+
+
+def parse_since_version(value):
+    """Return the ``since_version`` query value as an int, or None if absent. Raises ValueError if invalid."""
+    if value in (None, ''):
+        return None
+    version = int(value)
+    if version < 0:
+        raise ValueError('since_version must not be negative')
+    return version
+
+
+def changes_since(container, since_version):
+    """
+    Return ``(items, removed)`` changed after ``since_version``, or None when a full resync is needed.
+
+    ``items`` is a queryset of the lines added or updated since then and
+    ``removed`` a list of ``{'id', 'product_id'}`` dicts for deleted lines.
+    Version 0 predates change tracking and a version ahead of the container's
+    comes from a stale or foreign client; both get the full list instead.
+    """
+    if since_version is None or since_version < 1 or since_version > container.version:
+        return None
+    item_model, tombstone_model, field = _CONTAINERS[type(container)]
+    items = item_model.objects.filter(**{field: container}, version__gt=since_version)
+    removed = [
+        {'id': str(item_id), 'product_id': product_id}
+        for item_id, product_id in tombstone_model.objects.filter(
+            **{field: container}, version__gt=since_version,
+        ).values_list('item_id', 'product_id')
+    ]
+    return items, removed
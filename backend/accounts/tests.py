@@ -1,3 +1,1114 @@
-from django.test import TestCase
+import asyncio
+import itertools
+import json
+import logging
+import multiprocessing
+import os
+import random
+import sqlite3
+import tempfile
+import threading
+import time
+from datetime import date, timedelta
+from decimal import Decimal
+from io import StringIO
+from unittest import mock, skipUnless
 
-# Create your tests here.
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.cache import caches
+from django.core.management import CommandError, call_command
+from django.db import OperationalError, connection, connections, transaction
+from asgiref.sync import sync_to_async
+from django.test import SimpleTestCase, TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from rest_framework.test import APIClient, APITestCase
+from rest_framework_simplejwt.tokens import RefreshToken
+
+from backend.query_plans import explain, full_scans
+from backend.routers import PIN_COOKIE, use_primary
+from backend.sql_instrumentation import RepeatedQueries, record
+from backend.sqlite import LOCKED_STATUS, write_transaction
+from products.cache import get_backend
+from products.models import Category, Product
+
+from . import benchmark, order_numbers, seeding
+from .carts import recalculate_totals
+from .inventory import InsufficientStock, release_expired_reservations, reserve_stock
+from .order_numbers import SnowflakeGenerator, claim_node_id
+from .models import (
+    Address, Cart, CartItem, Order, OrderItem, OrderTracking, Profile, StockReservation, Wishlist, WishlistItem,
+)
+
+
+def _generate_order_numbers(node_id):
+    generator = SnowflakeGenerator(node_id=node_id)
+    return [generator.next_order_number() for _ in range(25000)]
+
+
+# Any request that runs one query shape more than REPEAT_THRESHOLD times fails the test
+@override_settings(SQL_INSTRUMENTATION={'RAISE': True})
+class AccountsTestCase(APITestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username='asha@example.com', email='asha@example.com', password='secret123')
+        cls.address = Address.objects.create(
+            user=cls.user, name='Asha', phone='9876543210', address_line_1='12 MG Road',
+            city='Pune', state='MH', postal_code='411001', is_default=True,
+        )
+        cls.category = Category.objects.create(name='Phones')
+        cls.product = Product.objects.create(
+            name='Pixel 8', description='Phone', price='599.00', stock=10, category=cls.category,
+        )
+
+    def setUp(self):
+        caches['default'].clear()
+        self.client.force_authenticate(self.user)
+
+    def make_products(self, count):
+        return [
+            Product.objects.create(name=f'Item {i}', description='Item', price='10.00', stock=10, category=self.category)
+            for i in range(count)
+        ]
+
+    def fill_cart(self, products, quantity=1):
+        cart, _ = Cart.objects.get_or_create(user=self.user)
+        for product in products:
+            CartItem.objects.create(cart=cart, product=product, quantity=quantity)
+        recalculate_totals(Cart.objects.filter(id=cart.id))
+        return cart
+
+    def checkout(self):
+        return self.client.post('/api/accounts/orders/create/', {
+            'delivery_address_id': self.address.id,
+            'delivery_slot_date': '2026-10-20',
+            'delivery_slot_time': '10:00 - 12:00',
+            'payment_method': 'upi',
+        }, format='json')
+
+    def create_order(self, user=None, quantity=1):
+        order = Order.objects.create(
+            user=user or self.user, delivery_address=self.address, delivery_slot_date=date.today(),
+            delivery_slot_time='10:00 - 12:00', subtotal='599.00', total='746.82',
+        )
+        OrderItem.objects.create(order=order, product=self.product, quantity=quantity, price=self.product.price)
+        OrderTracking.objects.create(order=order, status='placed', message='Order placed successfully')
+        return order
+
+
+class RepeatedQueryTests(AccountsTestCase):
+    """The account views stay N+1 free with more rows than REPEAT_THRESHOLD."""
+
+    def setUp(self):
+        super().setUp()
+        products = self.make_products(8)
+        self.fill_cart(products)
+        for product in products:
+            self.client.post('/api/accounts/wishlist/add/', {'product_id': product.id}, format='json')
+        self.orders = [self.create_order() for _ in range(8)]
+        for order in self.orders:
+            OrderItem.objects.create(order=order, product=products[0], quantity=1, price=products[0].price)
+            OrderTracking.objects.create(order=order, status='confirmed', message='Order confirmed')
+
+    def test_views(self):
+        for url in (
+            '/api/accounts/cart/',
+            '/api/accounts/wishlist/',
+            '/api/accounts/orders/',
+            f'/api/accounts/orders/{self.orders[0].id}/',
+            f'/api/accounts/orders/{self.orders[0].id}/tracking/',
+        ):
+            response = self.client.get(url)
+            self.assertEqual(response.status_code, 200, url)
+            self.assertIn('db;dur=', response.headers['Server-Timing'])
+
+    def test_n_plus_one_is_reported(self):
+        with record() as log:
+            for order in Order.objects.filter(user=self.user):
+                order.items.count()
+        self.assertEqual(log.count, 9)
+        with self.assertRaises(RepeatedQueries):
+            log.check(5)
+
+        # Every shape repeats more than 0 times, so any request trips the check
+        with override_settings(SQL_INSTRUMENTATION={'RAISE': True, 'REPEAT_THRESHOLD': 0}):
+            with self.assertRaisesMessage(RepeatedQueries, 'limit 0'):
+                self.client.get('/api/accounts/orders/')
+        with override_settings(SQL_INSTRUMENTATION={'REPEAT_THRESHOLD': 0}), \
+                self.assertLogs('backend.sql', 'WARNING') as logs:
+            self.assertEqual(self.client.get('/api/accounts/orders/').status_code, 200)
+        self.assertIn('Possible N+1 in GET /api/accounts/orders/', logs.output[0])
+
+
+class SeedingTests(TestCase):
+    def test_seed_builds_consistent_data_set(self):
+        counts = seeding.seed(scale=0.001, chunk_size=40)
+        for model, name in (
+            (Product, 'products'), (User, 'users'), (Profile, 'profiles'), (CartItem, 'cart_items'),
+            (WishlistItem, 'wishlist_items'), (Order, 'orders'), (OrderItem, 'order_lines'),
+            (OrderTracking, 'tracking_rows'),
+        ):
+            self.assertEqual(model.objects.count(), counts[name], name)
+        self.assertEqual(counts['order_lines'], 1000)
+        # Histories run from 'placed' up to the order's status
+        for order in Order.objects.exclude(status='cancelled')[:20]:
+            self.assertEqual(list(order.tracking_history.values_list('status', flat=True))[-1], order.status)
+        self.assertEqual(
+            Category.objects.get().product_count, Product.objects.filter(is_active=True).count(),
+        )
+        cart = Cart.objects.first()
+        self.assertEqual(cart.total_items, sum(cart.items.values_list('quantity', flat=True)))
+        self.assertEqual(WishlistItem.objects.count(), 10 * seeding.SIZES['wishlist_items'])
+        # deferred_indexes put every index back
+        with connection.cursor() as cursor:
+            self.assertIn('order_user_recent_idx', connection.introspection.get_constraints(cursor, 'accounts_order'))
+        user = User.objects.first()
+        self.assertTrue(user.check_password(seeding.PASSWORD))
+        self.assertTrue(user.addresses.get().is_default)
+
+    def test_seed_load_command(self):
+        out = StringIO()
+        call_command('seed_load', scale=0.001, stdout=out)
+        self.assertIn('1000 order lines', out.getvalue())
+        with self.assertRaisesMessage(CommandError, 'already holds seeded data'):
+            call_command('seed_load', scale=0.001, stdout=StringIO())
+
+    def test_every_route_has_a_benchmark_scenario(self):
+        self.assertEqual(set(benchmark.route_templates()), set(benchmark.ROUTES))
+
+
+class QueryPlanTests(AccountsTestCase):
+    """Every query behind the account views must use an index, not scan a table."""
+
+    def setUp(self):
+        super().setUp()
+        # The address views are plain Django views and use the session
+        self.client.force_login(self.user)
+        # Other shoppers' rows, so a missing user or cart filter would show up
+        other = User.objects.create_user(username='ravi@example.com', password='secret123')
+        Address.objects.create(
+            user=other, name='Ravi', phone='9876543210', address_line_1='3 Park Street',
+            city='Kolkata', state='WB', postal_code='700016',
+        )
+        self.create_order(user=other)
+        products = self.make_products(5)
+        # Enough of a catalogue and other shoppers' rows that the statistics favour the indexes
+        catalogue = self.make_products(40)
+        shoppers = User.objects.bulk_create([User(username=f'shopper{i}@example.com') for i in range(20)])
+        for i, shopper in enumerate(shoppers):
+            picks = catalogue[i:i + 5]
+            cart = Cart.objects.create(user=shopper)
+            CartItem.objects.bulk_create([CartItem(cart=cart, product=product) for product in picks])
+            wishlist = Wishlist.objects.create(user=shopper)
+            WishlistItem.objects.bulk_create([WishlistItem(wishlist=wishlist, product=product) for product in picks])
+            self.create_order(user=shopper)
+        self.fill_cart(products)
+        self.order = self.create_order()
+        self.client.post('/api/accounts/wishlist/add/', {'product_id': self.product.id}, format='json')
+        # Plans depend on table statistics; without them SQLite guesses
+        with connection.cursor() as cursor:
+            cursor.execute('ANALYZE')
+
+    def assertNoFullScans(self, method, url, data=None):
+        with CaptureQueriesContext(connection) as queries:
+            response = getattr(self.client, method)(url, data, format='json')
+        self.assertLess(response.status_code, 400, url)
+        self.assertEqual(full_scans(connection, queries.captured_queries), [], url)
+
+    def assertSortedByIndex(self, queryset, index):
+        plan = explain(connection, *queryset.query.sql_with_params())
+        self.assertTrue(any(step.startswith('SEARCH') and index in step for step in plan), plan)
+        self.assertNotIn('USE TEMP B-TREE FOR ORDER BY', plan)
+
+    def test_lists_are_read_in_index_order(self):
+        self.assertSortedByIndex(Address.objects.filter(user=self.user), 'address_user_ordering_idx')
+        self.assertSortedByIndex(Order.objects.filter(user=self.user), 'order_user_recent_idx')
+        self.assertSortedByIndex(OrderTracking.objects.filter(order=self.order), 'tracking_order_time_idx')
+        self.assertSortedByIndex(
+            OrderTracking.objects.filter(order=self.order).order_by('-timestamp', '-id'), 'tracking_order_time_idx',
+        )
+        # The cart_id index holds the rowid too, so it already serves (cart, id)
+        cart = Cart.objects.get(user=self.user)
+        self.assertSortedByIndex(cart.items.order_by('id'), 'accounts_cartitem_cart_id')
+
+    def test_index_walks_count_unless_limited(self):
+        walk = 'SELECT "user_id" FROM "accounts_order"'
+        self.assertIn('USING COVERING INDEX', explain(connection, walk)[0])
+        self.assertEqual(len(full_scans(connection, [{'sql': walk}])), 1)
+        self.assertEqual(full_scans(connection, [{'sql': f'{walk} LIMIT 5'}]), [])
+        self.assertEqual(full_scans(connection, [{'sql': walk}], allow={'accounts_order'}), [])
+
+    def test_read_views(self):
+        for url in (
+            '/api/accounts/addresses/',
+            '/api/accounts/profile/',
+            '/api/accounts/cart/',
+            '/api/accounts/cart/?since_version=1',
+            '/api/accounts/wishlist/',
+            f'/api/accounts/wishlist/contains/?ids={self.product.id}',
+            '/api/accounts/orders/',
+            f'/api/accounts/orders/{self.order.id}/',
+            f'/api/accounts/orders/{self.order.id}/tracking/',
+        ):
+            self.assertNoFullScans('get', url)
+
+    def test_cart_writes_and_checkout(self):
+        self.assertNoFullScans('post', '/api/accounts/cart/add/', {'product_id': self.product.id})
+        item = CartItem.objects.filter(cart__user=self.user).first()
+        self.assertNoFullScans('put', f'/api/accounts/cart/update/{item.id}/', {'quantity': 2})
+        self.assertNoFullScans('delete', f'/api/accounts/cart/remove/{item.id}/')
+        self.assertNoFullScans('post', '/api/accounts/orders/create/', {
+            'delivery_address_id': self.address.id,
+            'delivery_slot_date': '2026-10-20',
+            'delivery_slot_time': '10:00 - 12:00',
+            'payment_method': 'cod',
+        })
+
+
+class OrderConditionalGetTests(AccountsTestCase):
+    def test_order_detail_and_tracking_answer_304(self):
+        order = self.create_order()
+        for url in (f'/api/accounts/orders/{order.id}/', f'/api/accounts/orders/{order.id}/tracking/'):
+            first = self.client.get(url)
+            self.assertEqual(first.status_code, 200)
+            response = self.client.get(url, HTTP_IF_NONE_MATCH=first['ETag'])
+            self.assertEqual(response.status_code, 304)
+
+    def test_new_tracking_row_changes_etag(self):
+        order = self.create_order()
+        url = f'/api/accounts/orders/{order.id}/tracking/'
+        etag = self.client.get(url)['ETag']
+        OrderTracking.objects.create(order=order, status='confirmed', message='Order confirmed')
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.data['tracking_history']), 2)
+
+    def test_status_change_changes_etag(self):
+        order = self.create_order()
+        url = f'/api/accounts/orders/{order.id}/'
+        etag = self.client.get(url)['ETag']
+        order.status = 'packed'
+        order.save()
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 200)
+
+    def test_other_users_order_is_not_found(self):
+        other = User.objects.create_user(username='ravi@example.com', password='secret123')
+        order = self.create_order(user=other)
+        self.assertEqual(self.client.get(f'/api/accounts/orders/{order.id}/').status_code, 404)
+
+
+class OrderTrackingStreamTests(AccountsTestCase):
+    def setUp(self):
+        super().setUp()
+        self.order = self.create_order()
+        self.url = f'/api/accounts/orders/{self.order.id}/tracking/stream/'
+        self.token = RefreshToken.for_user(self.user).access_token
+
+    def stream(self, params=None, token=None, **headers):
+        return self.async_client.get(self.url, params, headers={'authorization': f'Bearer {token or self.token}', **headers})
+
+    def add_tracking(self, status, publish=True):
+        if not publish:
+            return OrderTracking.objects.create(order=self.order, status=status, message=status)
+        with self.captureOnCommitCallbacks(execute=True):
+            return OrderTracking.objects.create(order=self.order, status=status, message=status)
+
+    async def test_long_poll_returns_pending_rows_at_once(self):
+        response = await self.stream({'after': 0})
+        data = json.loads(response.content)
+        self.assertEqual([row['status'] for row in data['tracking_history']], ['placed'])
+        self.assertEqual(data['last_id'], data['tracking_history'][0]['id'])
+
+    async def test_long_poll_wakes_on_new_row(self):
+        last_id = await OrderTracking.objects.filter(order=self.order).values_list('id', flat=True).afirst()
+        request = asyncio.ensure_future(self.stream({'after': last_id, 'timeout': 5}))
+        await asyncio.sleep(0.1)
+        started = time.monotonic()
+        await sync_to_async(self.add_tracking)('packed')
+        data = json.loads((await request).content)
+        self.assertLess(time.monotonic() - started, 1)
+        self.assertEqual([row['status'] for row in data['tracking_history']], ['packed'])
+
+    @override_settings(ORDER_TRACKING_STREAM={'POLL_INTERVAL': 0.05})
+    async def test_long_poll_sees_changes_from_other_processes(self):
+        last_id = await OrderTracking.objects.filter(order=self.order).values_list('id', flat=True).afirst()
+        request = asyncio.ensure_future(self.stream({'after': last_id, 'status': 'placed', 'timeout': 5}))
+        await asyncio.sleep(0.1)
+        await Order.objects.filter(id=self.order.id).aupdate(status='confirmed', updated_at=timezone.now())
+        data = json.loads((await request).content)
+        self.assertEqual(data['current_status'], 'confirmed')
+
+    async def test_long_poll_times_out_empty(self):
+        last_id = await OrderTracking.objects.filter(order=self.order).values_list('id', flat=True).afirst()
+        response = await self.stream({'after': last_id, 'timeout': 0.1})
+        data = json.loads(response.content)
+        self.assertEqual((data['tracking_history'], data['last_id']), ([], last_id))
+
+    async def test_timeout_must_be_finite_and_not_negative(self):
+        last_id = await OrderTracking.objects.filter(order=self.order).values_list('id', flat=True).afirst()
+        for timeout in ('nan', 'inf', '-inf', '-1', 'soon'):
+            with self.subTest(timeout):
+                response = await asyncio.wait_for(self.stream({'after': last_id, 'timeout': timeout}), 5)
+                self.assertEqual(response.status_code, 400)
+
+    async def test_event_stream(self):
+        response = await self.stream(accept='text/event-stream')
+        self.assertEqual(response['Content-Type'], 'text/event-stream')
+        events = aiter(response.streaming_content)
+        self.assertTrue((await anext(events)).startswith(b'retry:'))
+        self.assertIn(b'"status": "placed"', await anext(events))
+
+        await sync_to_async(self.add_tracking)('delivered')
+        await Order.objects.filter(id=self.order.id).aupdate(status='delivered')
+        event = (await asyncio.wait_for(anext(events), 5)).decode()
+        self.assertIn('"status": "delivered"', event)
+        # The order is final, so the stream ends
+        with self.assertRaises(StopAsyncIteration):
+            while True:
+                await asyncio.wait_for(anext(events), 5)
+
+    async def test_requires_owner(self):
+        self.assertEqual((await self.async_client.get(self.url)).status_code, 401)
+        other = await sync_to_async(User.objects.create_user)(username='other@example.com', password='secret123')
+        token = await sync_to_async(lambda: RefreshToken.for_user(other).access_token)()
+        self.assertEqual((await self.stream(token=token)).status_code, 404)
+
+
+class OrderListTests(AccountsTestCase):
+    def test_query_count_does_not_depend_on_history_size(self):
+        for params in ({}, {'cursor': ''}, {'cursor': '', 'summary': '1'}):
+            counts = []
+            for _ in range(2):
+                for _ in range(3):
+                    order = self.create_order(quantity=2)
+                    OrderTracking.objects.create(order=order, status='confirmed', message='Order confirmed')
+                with CaptureQueriesContext(connection) as queries:
+                    self.assertEqual(self.client.get('/api/accounts/orders/', params).status_code, 200)
+                counts.append(len(queries))
+            self.assertEqual(counts[0], counts[1], params)
+
+    def test_legacy_list_shape(self):
+        order = self.create_order()
+        OrderTracking.objects.create(order=order, status='confirmed', message='Order confirmed')
+        data = self.client.get('/api/accounts/orders/').data
+        self.assertEqual(len(data), 1)
+        self.assertEqual(data[0]['items'][0]['name'], 'Pixel 8')
+        self.assertEqual(data[0]['tracking']['status'], 'confirmed')
+
+    def test_cursor_pages_newest_first(self):
+        orders = [self.create_order() for _ in range(5)]
+        Order.objects.update(created_at=timezone.now())  # Force the id tiebreaker
+        seen, cursor = [], ''
+        while cursor is not None:
+            data = self.client.get('/api/accounts/orders/', {'cursor': cursor, 'limit': 2}).data
+            seen.extend(order['id'] for order in data['orders'])
+            cursor = data['next_cursor']
+        self.assertEqual(seen, [order.id for order in reversed(orders)])
+
+    def test_limit_is_bounded(self):
+        for limit in (0, -1, 101, 'x'):
+            response = self.client.get('/api/accounts/orders/', {'cursor': '', 'limit': limit})
+            self.assertEqual(response.status_code, 400, limit)
+
+    def test_summary_mode(self):
+        order = self.create_order()
+        OrderItem.objects.create(order=order, product=self.product, quantity=1, price=self.product.price)
+        OrderTracking.objects.create(order=order, status='packed', message='Order packed')
+        data = self.client.get('/api/accounts/orders/', {'cursor': '', 'summary': '1'}).data
+        self.assertEqual(data['orders'][0]['item_count'], 2)
+        self.assertEqual(data['orders'][0]['tracking_status'], 'packed')
+        self.assertNotIn('items', data['orders'][0])
+
+
+class CartTotalsTests(AccountsTestCase):
+    def totals(self):
+        cart = Cart.objects.get(user=self.user)
+        return cart.total_items, cart.total_price
+
+    def test_totals_follow_every_mutation(self):
+        phone, case = self.product, self.make_products(1)[0]
+        item_id = self.client.post('/api/accounts/cart/add/', {'product_id': phone.id, 'quantity': 2}).data['cart_item_id']
+        self.client.post('/api/accounts/cart/add/', {'product_id': phone.id, 'quantity': 1})
+        case_id = self.client.post('/api/accounts/cart/add/', {'product_id': case.id}).data['cart_item_id']
+        self.assertEqual(self.totals(), (4, Decimal('1807.00')))
+
+        self.client.put(f'/api/accounts/cart/update/{item_id}/', {'quantity': 1})
+        self.assertEqual(self.totals(), (2, Decimal('609.00')))
+
+        self.client.delete(f'/api/accounts/cart/remove/{case_id}/')
+        self.assertEqual(self.totals(), (1, Decimal('599.00')))
+
+        self.client.delete('/api/accounts/cart/clear/')
+        self.assertEqual(self.totals(), (0, Decimal('0.00')))
+
+    def test_checkout_empties_totals(self):
+        self.fill_cart(self.make_products(2), quantity=2)
+        self.assertEqual(self.totals(), (4, Decimal('40.00')))
+        self.checkout()
+        self.assertEqual(self.totals(), (0, Decimal('0.00')))
+
+    def test_cart_view_reads_totals_without_recomputing(self):
+        self.fill_cart(self.make_products(5))
+        with self.assertNumQueries(2):
+            data = self.client.get('/api/accounts/cart/').data
+        self.assertEqual((data['total_items'], data['total_price']), (5, Decimal('50.00')))
+
+    def test_price_change_recalculates_carts(self):
+        product, = self.make_products(1)
+        self.fill_cart([product], quantity=3)
+        product = Product.objects.get(id=product.id)
+        product.price = Decimal('12.50')
+        product.save()
+        self.assertEqual(self.totals(), (3, Decimal('37.50')))
+
+
+class CartBatchTests(AccountsTestCase):
+    def batch(self, *operations):
+        return self.client.post('/api/accounts/cart/batch/', {'operations': list(operations)}, format='json')
+
+    def test_applies_operations_and_returns_cart(self):
+        a, b, c = self.make_products(3)
+        self.fill_cart([c])
+        response = self.batch(
+            {'op': 'add', 'product_id': a.id, 'quantity': 2},
+            {'op': 'add', 'product_id': a.id},
+            {'op': 'set', 'product_id': b.id, 'quantity': 4},
+            {'op': 'remove', 'product_id': c.id},
+        )
+        self.assertEqual(response.status_code, 200)
+        quantities = {item['product_id']: item['quantity'] for item in response.data['cart_items']}
+        self.assertEqual(quantities, {a.id: 3, b.id: 4})
+        self.assertEqual((response.data['total_items'], response.data['total_price']), (7, Decimal('70.00')))
+
+    def test_set_to_zero_removes_line(self):
+        a, = self.make_products(1)
+        self.fill_cart([a])
+        response = self.batch({'op': 'set', 'product_id': a.id, 'quantity': 0})
+        self.assertEqual(response.data['cart_items'], [])
+
+    def test_all_or_nothing(self):
+        a, b = self.make_products(2)
+        response = self.batch(
+            {'op': 'add', 'product_id': a.id, 'quantity': 2},
+            {'op': 'add', 'product_id': b.id, 'quantity': 11},
+        )
+        self.assertEqual(response.status_code, 409)
+        self.assertEqual(response.data['shortfalls'][0]['product_id'], b.id)
+        self.assertFalse(CartItem.objects.exists())
+
+    def test_validation(self):
+        self.assertEqual(self.batch().status_code, 400)
+        self.assertEqual(self.batch({'op': 'explode', 'product_id': self.product.id}).status_code, 400)
+        self.assertEqual(self.batch({'op': 'add', 'product_id': self.product.id, 'quantity': 0}).status_code, 400)
+        self.assertEqual(self.batch({'op': 'add', 'product_id': 999999}).status_code, 404)
+
+
+class DeltaSyncTests(AccountsTestCase):
+    def sync(self, url, since_version):
+        response = self.client.get(url, {'since_version': since_version})
+        self.assertEqual(response.status_code, 200)
+        return response.data
+
+    def test_cart_delta_returns_only_changes(self):
+        first, second, third = self.make_products(3)
+        self.client.post('/api/accounts/cart/add/', {'product_id': first.id, 'quantity': 1}, format='json')
+        self.client.post('/api/accounts/cart/add/', {'product_id': second.id, 'quantity': 1}, format='json')
+        version = self.client.get('/api/accounts/cart/').data['version']
+
+        self.client.post('/api/accounts/cart/add/', {'product_id': third.id, 'quantity': 2}, format='json')
+        item = CartItem.objects.get(product=first)
+        self.client.delete(f'/api/accounts/cart/remove/{item.id}/')
+
+        data = self.sync('/api/accounts/cart/', version)
+        self.assertTrue(data['delta'])
+        self.assertEqual([line['product_id'] for line in data['cart_items']], [third.id])
+        self.assertEqual(data['removed'], [{'id': str(item.id), 'product_id': first.id}])
+        self.assertEqual(data['total_items'], 3)
+        self.assertEqual(data['version'], version + 2)
+
+        caught_up = self.sync('/api/accounts/cart/', data['version'])
+        self.assertEqual((caught_up['cart_items'], caught_up['removed']), ([], []))
+
+    def test_re_adding_clears_tombstone(self):
+        self.client.post('/api/accounts/cart/add/', {'product_id': self.product.id}, format='json')
+        version = self.client.get('/api/accounts/cart/').data['version']
+        self.client.delete('/api/accounts/cart/clear/')
+        self.client.post('/api/accounts/cart/add/', {'product_id': self.product.id}, format='json')
+
+        data = self.sync('/api/accounts/cart/', version)
+        self.assertEqual([line['product_id'] for line in data['cart_items']], [self.product.id])
+        self.assertEqual(data['removed'], [])
+
+    def test_checkout_and_price_change_are_tracked(self):
+        products = self.make_products(2)
+        self.fill_cart(products)
+        self.client.post('/api/accounts/cart/add/', {'product_id': self.product.id}, format='json')
+        version = self.client.get('/api/accounts/cart/').data['version']
+
+        products[0].price = Decimal('12.00')
+        products[0].save()
+        data = self.sync('/api/accounts/cart/', version)
+        self.assertEqual([line['product_id'] for line in data['cart_items']], [products[0].id])
+
+        self.checkout()
+        data = self.sync('/api/accounts/cart/', data['version'])
+        self.assertEqual(len(data['removed']), 3)
+        self.assertEqual(data['total_items'], 0)
+
+    def test_full_list_for_unknown_versions(self):
+        self.fill_cart([self.product])
+        for since_version in (0, 99):
+            data = self.sync('/api/accounts/cart/', since_version)
+            self.assertFalse(data['delta'])
+            self.assertEqual(len(data['cart_items']), 1)
+        self.assertEqual(self.client.get('/api/accounts/cart/', {'since_version': 'x'}).status_code, 400)
+
+    def test_wishlist_delta(self):
+        first, second = self.make_products(2)
+        self.client.post('/api/accounts/wishlist/add/', {'product_id': first.id}, format='json')
+        version = self.client.get('/api/accounts/wishlist/').data['version']
+        self.client.post('/api/accounts/wishlist/add/', {'product_id': second.id}, format='json')
+        item_id = self.client.get('/api/accounts/wishlist/').data['wishlist_items'][0]['id']
+        self.client.delete(f'/api/accounts/wishlist/remove/{item_id}/')
+
+        data = self.sync('/api/accounts/wishlist/', version)
+        self.assertEqual([item['product_id'] for item in data['wishlist_items']], [second.id])
+        self.assertEqual(data['removed'], [{'id': item_id, 'product_id': first.id}])
+
+    def test_deleting_product_settles_carts_and_wishlists(self):
+        kept, doomed = self.make_products(2)
+        for product in (kept, doomed):
+            self.client.post('/api/accounts/cart/add/', {'product_id': product.id, 'quantity': 2}, format='json')
+        self.client.post('/api/accounts/wishlist/add/', {'product_id': doomed.id}, format='json')
+        cart_item = CartItem.objects.get(product=doomed)
+        cart_version = self.client.get('/api/accounts/cart/').data['version']
+        wishlist = self.client.get('/api/accounts/wishlist/').data
+
+        doomed_id = doomed.id
+        doomed.delete()
+        data = self.sync('/api/accounts/cart/', cart_version)
+        self.assertEqual(data['removed'], [{'id': str(cart_item.id), 'product_id': doomed_id}])
+        self.assertEqual((data['total_items'], data['total_price']), (2, Decimal('20.00')))
+        data = self.sync('/api/accounts/wishlist/', wishlist['version'])
+        self.assertEqual(data['removed'], [{'id': wishlist['wishlist_items'][0]['id'], 'product_id': doomed_id}])
+
+
+class WishlistBulkTests(AccountsTestCase):
+    def setUp(self):
+        super().setUp()
+        # A file based cache stands in for one that several worker processes share
+        location = self.enterContext(tempfile.TemporaryDirectory())
+        self.enterContext(override_settings(
+            CACHES={
+                'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'},
+                'shared': {'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache', 'LOCATION': location},
+            },
+            WISHLIST_IDS_CACHE={'ALIAS': 'shared'},
+        ))
+
+    def post(self, action, product_ids):
+        return self.client.post(f'/api/accounts/wishlist/bulk/{action}/', {'product_ids': product_ids}, format='json')
+
+    def contains(self, products):
+        return self.client.get('/api/accounts/wishlist/contains/', {'ids': ','.join(str(p.id) for p in products)})
+
+    def test_contains_is_served_from_cache(self):
+        products = self.make_products(3)
+        self.post('add', [products[0].id, products[2].id])
+        self.assertEqual(self.contains(products).data['wishlisted'], [products[0].id, products[2].id])
+        with self.assertNumQueries(0):
+            self.assertEqual(self.contains(products).data['wishlisted'], [products[0].id, products[2].id])
+
+    def test_local_memory_cache_is_not_used(self):
+        products = self.make_products(1)
+        self.post('add', [products[0].id])
+        with override_settings(WISHLIST_IDS_CACHE={'ALIAS': 'default'}):
+            for _ in range(2):
+                with self.assertNumQueries(1):
+                    self.assertEqual(self.contains(products).data['wishlisted'], [products[0].id])
+
+    def test_changes_invalidate_cached_ids(self):
+        products = self.make_products(2)
+        self.contains(products)
+        self.client.post('/api/accounts/wishlist/add/', {'product_id': products[1].id}, format='json')
+        self.assertEqual(self.contains(products).data['wishlisted'], [products[1].id])
+        self.post('remove', [products[1].id])
+        self.assertEqual(self.contains(products).data['wishlisted'], [])
+
+    def test_bulk_add_skips_duplicates_and_reports_missing(self):
+        products = self.make_products(3)
+        self.post('add', [products[0].id])
+        response = self.post('add', [p.id for p in products] + [999999])
+        self.assertEqual(response.data, {'added': [products[1].id, products[2].id], 'missing': [999999]})
+        self.assertEqual(WishlistItem.objects.filter(wishlist__user=self.user).count(), 3)
+
+    def test_move_to_cart(self):
+        products = self.make_products(2)
+        self.post('add', [p.id for p in products])
+        response = self.post('move-to-cart', [products[0].id, self.product.id])
+        self.assertEqual(response.data, {'moved': [products[0].id], 'missing': [self.product.id]})
+        cart = Cart.objects.get(user=self.user)
+        self.assertEqual(list(cart.items.values_list('product_id', 'quantity')), [(products[0].id, 1)])
+        self.assertEqual(cart.total_items, 1)
+        self.assertEqual(self.contains(products).data['wishlisted'], [products[1].id])
+
+    def test_move_to_cart_is_all_or_nothing(self):
+        products = self.make_products(2)
+        Product.objects.filter(id=products[1].id).update(stock=0)
+        self.post('add', [p.id for p in products])
+        self.assertEqual(self.post('move-to-cart', [p.id for p in products]).status_code, 409)
+        self.assertFalse(CartItem.objects.exists())
+        self.assertEqual(WishlistItem.objects.count(), 2)
+
+    def test_validation(self):
+        self.assertEqual(self.post('add', []).status_code, 400)
+        self.assertEqual(self.post('add', ['x']).status_code, 400)
+        self.assertEqual(self.post('remove', list(range(1, 202))).status_code, 400)
+        self.assertEqual(self.client.get('/api/accounts/wishlist/contains/').status_code, 400)
+
+
+class CreateOrderTests(AccountsTestCase):
+    def test_creates_order_and_empties_cart(self):
+        self.fill_cart(self.make_products(2), quantity=3)
+        response = self.checkout()
+        self.assertEqual(response.status_code, 201)
+
+        order = Order.objects.get(id=response.data['order_id'])
+        self.assertEqual(order.subtotal, 60)
+        self.assertEqual(order.items.count(), 2)
+        self.assertEqual(order.tracking_history.get().status, 'placed')
+        self.assertFalse(CartItem.objects.exists())
+
+    def test_query_count_does_not_depend_on_cart_size(self):
+        counts = []
+        for size in (1, 8):
+            self.fill_cart(self.make_products(size))
+            with CaptureQueriesContext(connection) as queries:
+                self.assertEqual(self.checkout().status_code, 201)
+            counts.append(len(queries))
+        self.assertEqual(counts[0], counts[1])
+
+    def test_empty_cart(self):
+        self.assertEqual(self.checkout().status_code, 400)
+
+    def test_failure_leaves_no_partial_order(self):
+        self.fill_cart(self.make_products(2))
+        with mock.patch.object(OrderTracking.objects, 'create', side_effect=RuntimeError('boom')):
+            response = self.checkout()
+        self.assertEqual(response.status_code, 500)
+        self.assertFalse(Order.objects.exists())
+        self.assertFalse(OrderItem.objects.exists())
+        self.assertEqual(CartItem.objects.count(), 2)
+
+
+class InventoryTests(AccountsTestCase):
+    def test_checkout_reserves_stock(self):
+        product, = self.make_products(1)
+        self.fill_cart([product], quantity=4)
+        response = self.checkout()
+        self.assertEqual(response.status_code, 201)
+        product.refresh_from_db()
+        self.assertEqual(product.stock, 6)
+        reservation = StockReservation.objects.get()
+        self.assertEqual((reservation.quantity, reservation.status), (4, 'committed'))
+        self.assertIsNone(reservation.expires_at)
+
+    @override_settings(STOCK_HOLD_PAYMENT_METHODS=['upi'])
+    def test_checkout_holds_stock_for_listed_payment_methods(self):
+        product, = self.make_products(1)
+        self.fill_cart([product], quantity=4)
+        self.assertEqual(self.checkout().status_code, 201)
+        reservation = StockReservation.objects.get()
+        self.assertEqual((reservation.quantity, reservation.status), (4, 'held'))
+        self.assertIsNotNone(reservation.expires_at)
+
+    def test_unlisted_payment_methods_never_expire(self):
+        product, = self.make_products(1)
+        self.fill_cart([product], quantity=3)
+        order_id = self.checkout().data['order_id']
+
+        released = release_expired_reservations(now=timezone.now() + timedelta(days=1))
+        self.assertEqual(released, 0)
+        self.assertEqual(Product.objects.get(id=product.id).stock, 7)
+        self.assertEqual(Order.objects.get(id=order_id).status, 'placed')
+
+    def test_checkout_reports_shortfalls_and_reserves_nothing(self):
+        plenty, scarce = self.make_products(2)
+        Product.objects.filter(id=scarce.id).update(stock=1)
+        self.fill_cart([plenty, scarce], quantity=2)
+
+        response = self.checkout()
+        self.assertEqual(response.status_code, 409)
+        self.assertEqual(response.data['shortfalls'], [
+            {'product_id': scarce.id, 'name': scarce.name, 'requested': 2, 'available': 1},
+        ])
+        self.assertEqual(Product.objects.get(id=plenty.id).stock, 10)
+        self.assertFalse(Order.objects.exists())
+        self.assertEqual(CartItem.objects.count(), 2)
+
+    def test_add_to_cart_checks_stock(self):
+        response = self.client.post('/api/accounts/cart/add/', {'product_id': self.product.id, 'quantity': 11})
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.data['available'], 10)
+
+    @override_settings(STOCK_HOLD_PAYMENT_METHODS=['upi'])
+    def test_cancel_releases_and_paid_confirms(self):
+        product, other = self.make_products(2)
+        self.fill_cart([product])
+        order = Order.objects.get(id=self.checkout().data['order_id'])
+
+        order.payment_status = 'paid'
+        order.save()
+        self.assertEqual(order.reservations.get().status, 'committed')
+
+        order.status = 'cancelled'
+        order.save()
+        order.save()  # releasing twice must not restock twice
+        self.assertEqual(order.reservations.get().status, 'released')
+        self.assertEqual(Product.objects.get(id=product.id).stock, 10)
+
+    @override_settings(STOCK_HOLD_PAYMENT_METHODS=['upi'])
+    def test_sweeper_releases_expired_holds(self):
+        product, = self.make_products(1)
+        self.fill_cart([product], quantity=3)
+        order_id = self.checkout().data['order_id']
+        StockReservation.objects.update(expires_at=timezone.now() - timedelta(minutes=1))
+
+        out = StringIO()
+        call_command('release_expired_reservations', stdout=out)
+        self.assertIn('Released 3', out.getvalue())
+        self.assertEqual(Product.objects.get(id=product.id).stock, 10)
+        self.assertEqual(Order.objects.get(id=order_id).status, 'cancelled')
+
+    @override_settings(STOCK_HOLD_PAYMENT_METHODS=['upi'])
+    def test_confirming_an_order_commits_its_hold(self):
+        product, = self.make_products(1)
+        self.fill_cart([product], quantity=3)
+        order = Order.objects.get(id=self.checkout().data['order_id'])
+
+        order.status = 'confirmed'
+        order.save()
+        reservation = StockReservation.objects.get()
+        self.assertEqual((reservation.status, reservation.expires_at), ('committed', None))
+
+    @override_settings(STOCK_HOLD_PAYMENT_METHODS=['upi'])
+    def test_sweeper_skips_orders_past_placed(self):
+        product, = self.make_products(1)
+        self.fill_cart([product], quantity=3)
+        order_id = self.checkout().data['order_id']
+        # Moved on without going through save(), e.g. by a bulk update
+        Order.objects.filter(id=order_id).update(status='confirmed')
+        StockReservation.objects.update(expires_at=timezone.now() - timedelta(minutes=1))
+
+        self.assertEqual(release_expired_reservations(), 0)
+        self.assertEqual(Product.objects.get(id=product.id).stock, 7)
+        self.assertEqual(Order.objects.get(id=order_id).status, 'confirmed')
+        self.assertEqual(StockReservation.objects.get().status, 'held')
+
+
+class ConcurrentReservationTests(TransactionTestCase):
+    CHECKOUTS = 200
+    STOCK = 5
+
+    def test_parallel_checkouts_never_oversell(self):
+        user = User.objects.create_user(username='load@example.com', password='secret123')
+        category = Category.objects.create(name='Phones')
+        product = Product.objects.create(
+            name='Last units', description='Item', price='10.00', stock=self.STOCK, category=category,
+        )
+        orders = Order.objects.bulk_create([
+            Order(user=user, order_number=f'ORDLOAD{i:05d}', delivery_slot_date=date.today(),
+                  delivery_slot_time='10:00 - 12:00', subtotal='10.00', total='10.00')
+            for i in range(self.CHECKOUTS)
+        ])
+
+        results = []
+        barrier = threading.Barrier(self.CHECKOUTS)
+
+        def checkout(order):
+            barrier.wait()
+            try:
+                for attempt in itertools.count():
+                    try:
+                        with transaction.atomic():
+                            reserve_stock(order, [(product, 1)])
+                        results.append(True)
+                        return
+                    except InsufficientStock:
+                        results.append(False)
+                        return
+                    except OperationalError:
+                        # Database locked by another writer; back off exponentially and retry
+                        time.sleep(random.uniform(0, 0.001 * 2 ** min(attempt, 10)))
+            finally:
+                connection.close()
+
+        threads = [threading.Thread(target=checkout, args=(order,)) for order in orders]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        product.refresh_from_db()
+        self.assertEqual(len(results), self.CHECKOUTS)
+        self.assertEqual(results.count(True), self.STOCK)
+        self.assertEqual(product.stock, 0)
+        self.assertEqual(StockReservation.objects.count(), self.STOCK)
+
+
+class SQLiteTuningTests(TransactionTestCase):
+    def test_pragmas_applied_to_new_connections(self):
+        connection.close()
+        with connection.cursor() as cursor:
+            # Set once by migration, and kept in the file
+            cursor.execute('PRAGMA journal_mode')
+            self.assertEqual(cursor.fetchone()[0], 'wal')
+            cursor.execute('PRAGMA busy_timeout')
+            self.assertEqual(cursor.fetchone()[0], 5000)
+
+    def test_opening_a_database_leaves_its_journal_mode(self):
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'plain.sqlite3')
+            sqlite3.connect(path).close()
+            settings_dict = {**connection.settings_dict, 'NAME': path}
+            other = type(connections['default'])(settings_dict, alias='plain')
+            try:
+                with other.cursor() as cursor:
+                    cursor.execute('PRAGMA journal_mode')
+                    self.assertEqual(cursor.fetchone()[0], 'delete')
+            finally:
+                other.close()
+            self.assertFalse(os.path.exists(path + '-wal'))
+
+    def test_write_transaction_begins_immediate(self):
+        with CaptureQueriesContext(connection) as queries:
+            with write_transaction():
+                with write_transaction():
+                    Category.objects.create(name='Phones')
+        statements = [query['sql'] for query in queries]
+        self.assertEqual(statements[0], 'BEGIN IMMEDIATE')
+        self.assertNotIn('BEGIN IMMEDIATE', statements[1:])
+        self.assertIsNone(connection.transaction_mode)
+
+    def test_lock_timeout_answers_503(self):
+        user = User.objects.create_user(username='busy@example.com', password='secret123')
+        product = Product.objects.create(
+            name='Popular', description='Item', price='10.00', stock=5, category=Category.objects.create(name='Phones'),
+        )
+        client = APIClient()
+        client.force_authenticate(user)
+        with mock.patch('accounts.carts.add_item', side_effect=OperationalError('database is locked')):
+            response = client.post('/api/accounts/cart/add/', {'product_id': product.id})
+        self.assertEqual(response.status_code, LOCKED_STATUS)
+        self.assertEqual(response.headers['Retry-After'], '1')
+
+    def test_read_then_write_transactions_wait_instead_of_failing(self):
+        category = Category.objects.create(name='Phones')
+        barrier = threading.Barrier(2)
+        errors = []
+
+        def rename(suffix):
+            barrier.wait()
+            try:
+                with write_transaction():
+                    name = Category.objects.get(id=category.id).name
+                    time.sleep(0.2)
+                    Category.objects.filter(id=category.id).update(name=name + suffix)
+            except OperationalError as e:
+                errors.append(e)
+            finally:
+                connection.close()
+
+        threads = [threading.Thread(target=rename, args=(suffix,)) for suffix in ('a', 'b')]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(errors, [])
+        category.refresh_from_db()
+        self.assertEqual(sorted(category.name), sorted('Phonesab'))
+
+
+class OrderNumberTests(SimpleTestCase):
+    def test_format_and_ordering(self):
+        generator = SnowflakeGenerator(node_id=3)
+        numbers = [generator.next_order_number() for _ in range(20000)]
+        self.assertEqual(len(set(numbers)), len(numbers))
+        self.assertEqual(numbers, sorted(numbers))
+        self.assertTrue(all(n.startswith('ORD') and len(n) <= 20 for n in numbers))
+
+    def test_clock_going_backwards_stays_monotonic(self):
+        ticks = iter([100.0, 100.0, 99.0, 99.5, 101.0])
+        generator = SnowflakeGenerator(node_id=1, clock=lambda: next(ticks))
+        ids = [generator.next_id() for _ in range(5)]
+        self.assertEqual(ids, sorted(set(ids)))
+
+    def test_sequence_overflow_moves_to_next_millisecond(self):
+        generator = SnowflakeGenerator(node_id=1, clock=lambda: 100.0)
+        ids = [generator.next_id() for _ in range(10000)]
+        self.assertEqual(ids, sorted(set(ids)))
+
+    def test_unique_across_processes(self):
+        context = multiprocessing.get_context('fork')
+        with context.Pool(8) as pool:
+            results = pool.map(_generate_order_numbers, range(8))
+
+        numbers = [number for batch in results for number in batch]
+        self.assertEqual(len(set(numbers)), len(numbers))
+        for batch in results:
+            self.assertEqual(batch, sorted(batch))
+
+    def test_claimed_node_ids_are_distinct(self):
+        with tempfile.TemporaryDirectory() as directory, mock.patch.object(order_numbers, '_claimed', []) as claimed:
+            first, second = claim_node_id(directory), claim_node_id(directory)
+            self.assertNotEqual(first, second)
+            # Closing the lock file, as exiting does, frees the id
+            claimed.pop().close()
+            self.assertEqual(claim_node_id(directory), second)
+            for f in claimed:
+                f.close()
+
+    def test_clock_before_epoch_raises(self):
+        generator = SnowflakeGenerator(node_id=1, clock=lambda: 0.0)
+        with self.assertRaises(ValueError):
+            generator.next_order_number()
+
+
+class ConcurrentCartTests(TransactionTestCase):
+    THREADS = 40
+    ATTEMPTS = 3
+
+    def test_parallel_adds_lose_no_increments(self):
+        user = User.objects.create_user(username='tapper@example.com', password='secret123')
+        category = Category.objects.create(name='Phones')
+        product = Product.objects.create(
+            name='Popular', description='Item', price='10.00', stock=1000, category=category,
+        )
+        barrier = threading.Barrier(self.THREADS)
+        statuses = []
+
+        def tap(use_batch):
+            # The test client re-raises exceptions via a process-wide signal, so
+            # under threads it could blame another request; rely on our own status
+            client = APIClient(raise_request_exception=False)
+            client.force_authenticate(user)
+            barrier.wait()
+            try:
+                for attempt in range(self.ATTEMPTS):
+                    if use_batch:
+                        response = client.post('/api/accounts/cart/batch/', {
+                            'operations': [{'op': 'add', 'product_id': product.id, 'quantity': 1}],
+                        }, format='json')
+                    else:
+                        response = client.post('/api/accounts/cart/add/', {'product_id': product.id})
+                    if response.status_code != LOCKED_STATUS:
+                        statuses.append(response.status_code)
+                        return
+                    # Timed out waiting for another writer; back off and retry
+                    time.sleep(random.uniform(0, 0.01 * 2 ** attempt))
+                statuses.append(LOCKED_STATUS)
+            finally:
+                connection.close()
+
+        threads = [threading.Thread(target=tap, args=(i % 2 == 0,)) for i in range(self.THREADS)]
+        with mock.patch.object(logging.getLogger('django.request'), 'disabled', True):
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+
+        cart = Cart.objects.get(user=user)
+        self.assertEqual(statuses, [200] * self.THREADS)
+        self.assertEqual(cart.items.get().quantity, self.THREADS)
+        self.assertEqual(cart.total_items, self.THREADS)
+
+
+@skipUnless('replica' in settings.DATABASES, "needs a 'replica' alias, see backend/test_settings.py")
+@override_settings(DATABASE_REPLICAS=['replica'])
+class ReplicaRoutingTests(TransactionTestCase):
+    # TestCase wraps each test in a transaction, which pins every read to the primary.
+    # The runner sets up these aliases even when the class is skipped, so only ask for configured ones
+    databases = {'default', 'replica'} & settings.DATABASES.keys()
+
+    def setUp(self):
+        caches['default'].clear()
+        self.user = User.objects.create_user(username='asha@example.com', password='secret123')
+        category = Category.objects.create(name='Phones')
+        self.product = Product.objects.create(
+            name='Pixel 8', description='Phone', price='599.00', stock=10, category=category,
+        )
+        # The replica lags behind: same rows, but an old name and no stock
+        Category.objects.using('replica').bulk_create([Category(id=category.id, name='Phones')])
+        Product.objects.using('replica').bulk_create([Product(
+            id=self.product.id, name='Pixel 8 (stale)', description='Phone', price='599.00', stock=0,
+            category_id=category.id,
+        )])
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def product_name(self):
+        get_backend().clear()
+        return self.client.get(f'/api/products/products/{self.product.id}/').json()['product']['name']
+
+    def test_catalog_reads_go_to_replica(self):
+        self.assertEqual(self.product_name(), 'Pixel 8 (stale)')
+        self.assertEqual(Product.objects.get(id=self.product.id).name, 'Pixel 8 (stale)')
+        self.assertEqual(Product.objects.using('default').get(id=self.product.id).name, 'Pixel 8')
+
+    def test_other_models_and_transactions_use_primary(self):
+        self.assertEqual(User.objects.get(id=self.user.id).username, 'asha@example.com')
+        with transaction.atomic():
+            self.assertEqual(Product.objects.get(id=self.product.id).stock, 10)
+
+    def test_use_primary(self):
+        with use_primary():
+            self.assertEqual(Product.objects.get(id=self.product.id).name, 'Pixel 8')
+
+    def test_write_pins_request_and_client_to_primary(self):
+        # Adding checks stock, which the replica has none of
+        response = self.client.post('/api/accounts/cart/add/', {'product_id': self.product.id}, format='json')
+        self.assertEqual(response.status_code, 200)
+        self.assertIn(PIN_COOKIE, response.cookies)
+        self.assertEqual(self.product_name(), 'Pixel 8')
+
+        del self.client.cookies[PIN_COOKIE]
+        self.assertEqual(self.product_name(), 'Pixel 8 (stale)')
+
+    def test_reads_set_no_pin_cookie(self):
+        response = self.client.get('/api/accounts/orders/')
+        self.assertEqual(response.status_code, 200)
+        self.assertNotIn(PIN_COOKIE, response.cookies)
+
+    def place_order(self):
+        address = Address.objects.create(
+            user=self.user, name='Asha', phone='9876543210', address_line_1='12 MG Road',
+            city='Pune', state='MH', postal_code='411001',
+        )
+        order = Order.objects.create(
+            user=self.user, delivery_address=address, delivery_slot_date=date.today(),
+            delivery_slot_time='10:00 - 12:00', subtotal='599.00', total='746.82', status='delivered',
+        )
+        OrderTracking.objects.create(order=order, status='delivered', message='Delivered')
+        return order, str(RefreshToken.for_user(self.user).access_token)
+
+    async def test_tracking_streams_read_the_primary(self):
+        # Neither the order nor its tracking has reached the replica
+        order, token = await sync_to_async(self.place_order)()
+        url = f'/api/accounts/orders/{order.id}/tracking/stream/'
+        headers = {'authorization': f'Bearer {token}'}
+
+        response = await self.async_client.get(url, {'timeout': 0}, headers=headers)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([row['status'] for row in json.loads(response.content)['tracking_history']], ['delivered'])
+
+        response = await self.async_client.get(url, headers={**headers, 'accept': 'text/event-stream'})
+        events = [event async for event in response.streaming_content]
+        self.assertIn(b'"status": "delivered"', events[1])
+
+    @override_settings(DATABASE_REPLICAS=[])
+    def test_no_replicas_configured(self):
+        self.assertEqual(self.product_name(), 'Pixel 8')
+        response = self.client.post('/api/accounts/cart/add/', {'product_id': self.product.id}, format='json')
+        self.assertNotIn(PIN_COOKIE, response.cookies)
@@ -0,0 +1,146 @@
+import asyncio
+import threading
+from collections import defaultdict
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS
+from django.db.models import Max
+from django.utils import timezone
+
+from .models import Order, OrderTracking
+
+DEFAULTS = {
+    'POLL_INTERVAL': 1.0,        # Seconds between checks for changes made by other processes
+    'HEARTBEAT': 15,             # Seconds between SSE keep-alive comments
+    'LONG_POLL_TIMEOUT': 25,     # Default (and, doubled, maximum) long-poll wait in seconds
+    'MAX_STREAM_SECONDS': 600,   # SSE streams end after this long; clients reconnect with Last-Event-ID
+}
+
+# Orders in these states get no further tracking updates, so streams close
+FINAL_STATUSES = ('delivered', 'cancelled')
+
+# Streams read the primary explicitly: SSE bodies run after the replica pinning
+# middleware has returned, and a lagging replica would hide the change that woke them
+primary_orders = Order.objects.db_manager(DEFAULT_DB_ALIAS)
+primary_tracking = OrderTracking.objects.db_manager(DEFAULT_DB_ALIAS)
+
+
+def stream_options():
+    return {**DEFAULTS, **getattr(settings, 'ORDER_TRACKING_STREAM', {})}
+
+
+def tracking_row(tracking):
+    return {
+        'id': tracking.id,
+        'status': tracking.status,
+        'message': tracking.message,
+        'timestamp': tracking.timestamp,
+        'estimated_delivery': tracking.estimated_delivery,
+    }
+
+
+class TrackingBroker:
+    """
+    Wakes the requests waiting on an order when its tracking changes.
+
+    Saves in this process publish straight away (see accounts.signals). For
+    saves made by other processes one shared poller per event loop checks, at
+    most every POLL_INTERVAL, for new tracking rows and order updates of the
+    watched orders only: two small queries per interval however many clients
+    are connected, instead of a full history read per client poll.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._waiters = defaultdict(set)
+        self._poller = None
+        self._ready = None
+
+    async def subscribe(self, order_id):
+        """
+        Register interest in ``order_id`` from the running event loop and return the waiter.
+
+        Read the order's state only after this returns: the poller's starting
+        point is fixed by then, so nothing committed afterwards can be missed.
+        """
+        loop = asyncio.get_running_loop()
+        waiter = (loop, asyncio.Event())
+        with self._lock:
+            self._waiters[order_id].add(waiter)
+            if self._poller is None or self._poller.done() or self._poller.get_loop() is not loop:
+                self._ready = asyncio.Event()
+                self._poller = loop.create_task(self._poll(self._ready))
+            ready = self._ready
+        await ready.wait()
+        return waiter
+
+    def unsubscribe(self, order_id, waiter):
+        with self._lock:
+            waiters = self._waiters.get(order_id)
+            if waiters is not None:
+                waiters.discard(waiter)
+                if not waiters:
+                    del self._waiters[order_id]
+
+    def publish(self, order_id):
+        """Wake every waiter of ``order_id``. Safe to call from any thread."""
+        with self._lock:
+            waiters = list(self._waiters.get(order_id, ()))
+        for loop, event in waiters:
+            try:
+                loop.call_soon_threadsafe(event.set)
+            except RuntimeError:
+                pass  # The waiter's loop has already closed
+
+    async def _poll(self, ready):
+        interval = stream_options()['POLL_INTERVAL']
+        try:
+            cursor = (await primary_tracking.aaggregate(last=Max('id')))['last'] or 0
+            since = timezone.now()
+        finally:
+            ready.set()
+        while True:
+            await asyncio.sleep(interval)
+            with self._lock:
+                order_ids = list(self._waiters)
+                if not order_ids:
+                    self._poller = None
+                    return
+            started = timezone.now()
+            changed = set()
+            async for tracking_id, order_id in primary_tracking.filter(id__gt=cursor).values_list('id', 'order_id'):
+                cursor = max(cursor, tracking_id)
+                changed.add(order_id)
+            # Overlap the window a little so a save that committed late is still seen
+            async for order_id in primary_orders.filter(
+                id__in=order_ids, updated_at__gte=since - timedelta(seconds=interval),
+            ).values_list('id', flat=True):
+                changed.add(order_id)
+            since = started
+            for order_id in changed:
+                self.publish(order_id)
+
+
+broker = TrackingBroker()
+
+
+async def wait_for_change(waiter, timeout):
+    """Wait up to ``timeout`` seconds for ``waiter`` to be woken; return whether it was."""
+    _, event = waiter
+    try:
+        await asyncio.wait_for(event.wait(), timeout)
+    except asyncio.TimeoutError:
+        return False
+    event.clear()
+    return True
+
+
+async def read_changes(order_id, after_id):
+    """Return ``(status, rows)``: the order's current status and tracking rows after ``after_id``."""
+    status = await primary_orders.filter(id=order_id).values_list('status', flat=True).afirst()
+    rows = [
+        tracking_row(tracking)
+        async for tracking in primary_tracking.filter(order_id=order_id, id__gt=after_id).order_by('id')
+    ]
+    return status, rows
@@ -1,6 +1,6 @@
 from django.urls import path
 from . import views
-from .views import profile_view, wishlist_view, add_to_wishlist_view, remove_from_wishlist_view, clear_wishlist_view, cart_view, add_to_cart_view, update_cart_item_view, remove_from_cart_view, clear_cart_view, create_order_view, order_list_view, order_detail_view, order_tracking_view
+from .views import profile_view, wishlist_view, add_to_wishlist_view, remove_from_wishlist_view, clear_wishlist_view, wishlist_contains_view, wishlist_bulk_add_view, wishlist_bulk_remove_view, wishlist_move_to_cart_view, cart_view, add_to_cart_view, update_cart_item_view, remove_from_cart_view, clear_cart_view, cart_batch_view, create_order_view, order_list_view, order_detail_view, order_tracking_view, order_tracking_stream_view
 from rest_framework_simplejwt.views import TokenRefreshView
 
 urlpatterns = [
@@ -15,13 +15,19 @@ urlpatterns = [
     path('wishlist/add/', add_to_wishlist_view, name='add_to_wishlist'),
     path('wishlist/remove/<int:item_id>/', remove_from_wishlist_view, name='remove_from_wishlist'),
     path('wishlist/clear/', clear_wishlist_view, name='clear_wishlist'),
+    path('wishlist/contains/', wishlist_contains_view, name='wishlist_contains'),
+    path('wishlist/bulk/add/', wishlist_bulk_add_view, name='wishlist_bulk_add'),
+    path('wishlist/bulk/remove/', wishlist_bulk_remove_view, name='wishlist_bulk_remove'),
+    path('wishlist/bulk/move-to-cart/', wishlist_move_to_cart_view, name='wishlist_move_to_cart'),
     path('cart/', cart_view, name='cart'),
     path('cart/add/', add_to_cart_view, name='add_to_cart'),
     path('cart/update/<int:item_id>/', update_cart_item_view, name='update_cart_item'),
     path('cart/remove/<int:item_id>/', remove_from_cart_view, name='remove_from_cart'),
     path('cart/clear/', clear_cart_view, name='clear_cart'),
+    path('cart/batch/', cart_batch_view, name='cart_batch'),
     path('orders/', order_list_view, name='order_list'),
     path('orders/create/', create_order_view, name='create_order'),
     path('orders/<int:order_id>/', order_detail_view, name='order_detail'),
     path('orders/<int:order_id>/tracking/', order_tracking_view, name='order_tracking'),
+    path('orders/<int:order_id>/tracking/stream/', order_tracking_stream_view, name='order_tracking_stream'),
 ]
\ No newline at end of file
@@ -1,17 +1,41 @@
 from django.contrib.auth import authenticate, login
 from django.contrib.auth.models import User
-from django.http import JsonResponse
+from django.db.models import Count, Max, OuterRef, Prefetch, Subquery
+from django.core.serializers.json import DjangoJSONEncoder
+from django.http import JsonResponse, StreamingHttpResponse
 from django.views.decorators.csrf import csrf_exempt
 from django.views.decorators.http import require_http_methods
+import asyncio
 import json
+import math
+from asgiref.sync import sync_to_async
 from decimal import Decimal
 from rest_framework.decorators import api_view, permission_classes
 from rest_framework.permissions import AllowAny, IsAuthenticated
 from rest_framework.response import Response
 from rest_framework import status
+from rest_framework.exceptions import AuthenticationFailed
+from rest_framework_simplejwt.authentication import JWTAuthentication # type: ignore
 from rest_framework_simplejwt.tokens import RefreshToken # type: ignore
+from backend.sqlite import write_transaction
 from .models import Address, Wishlist, WishlistItem, Cart, CartItem, Order, OrderItem, OrderTracking
 from products.models import Product
+from products.conditional import conditional_view
+from products.images import srcset
+from products.pagination import paginate_by_cursor, parse_limit
+from . import carts, sync, wishlists
+from .inventory import InsufficientStock, reserve_stock
+from .tracking import (
+    FINAL_STATUSES, broker, primary_orders, read_changes, stream_options, tracking_row, wait_for_change,
+)
+
+
+MAX_CART_BATCH_OPERATIONS = 100
+MAX_WISHLIST_BATCH_SIZE = 200
+
+
+class CheckoutConflict(Exception):
+    pass
 
 
 @csrf_exempt
@@ -350,27 +374,47 @@ def profile_view(request):
 @api_view(['GET'])
 @permission_classes([IsAuthenticated])
 def wishlist_view(request):
-    """Get user's wishlist items."""
-    wishlist, created = Wishlist.objects.get_or_create(user=request.user)
-    items = wishlist.items.all().select_related('product')
-
-    wishlist_data = []
-    for item in items:
-        product = item.product
-        wishlist_data.append({
-            'id': str(item.id),
-            'product_id': product.id,
-            'name': product.name,
-            'price': product.price,
-            'original_price': product.original_price,
-            'discount_percentage': product.discount_percentage,
-            'image': request.build_absolute_uri(product.image.url) if product.image else None,
-            'rating': product.rating,
-            'review_count': product.review_count,
-            'added_at': item.added_at.isoformat(),
-        })
+    """
+    Get user's wishlist items.
 
-    return Response({'wishlist_items': wishlist_data})
+    With ``?since_version=N`` only the items added or removed after version N
+    are returned (``delta: true``); the full list comes back instead when N is
+    0 or unknown. Either way ``version`` is the one to send next time.
+    """
+    try:
+        since_version = sync.parse_since_version(request.GET.get('since_version'))
+    except ValueError:
+        return Response({'error': 'Invalid since_version'}, status=400)
+
+    wishlist = wishlists.user_wishlist(request.user)
+    delta = sync.changes_since(wishlist, since_version)
+    items = delta[0] if delta else wishlist.items.all()
+
+    data = {
+        'wishlist_items': [_wishlist_item_data(request, item) for item in items.select_related('product')],
+        'version': wishlist.version,
+        'delta': delta is not None,
+    }
+    if delta:
+        data['removed'] = delta[1]
+    return Response(data)
+
+
+def _wishlist_item_data(request, item):
+    product = item.product
+    return {
+        'id': str(item.id),
+        'product_id': product.id,
+        'name': product.name,
+        'price': product.price,
+        'original_price': product.original_price,
+        'discount_percentage': product.discount_percentage,
+        'image': request.build_absolute_uri(product.image.url) if product.image else None,
+        'image_srcset': srcset(request, product, product.image.name) if product.image else {},
+        'rating': product.rating,
+        'review_count': product.review_count,
+        'added_at': item.added_at.isoformat(),
+    }
 
 
 @api_view(['POST'])
@@ -386,13 +430,10 @@ def add_to_wishlist_view(request):
     except Product.DoesNotExist:
         return Response({'error': 'Product not found'}, status=404)
 
-    wishlist, created = Wishlist.objects.get_or_create(user=request.user)
+    wishlist = wishlists.user_wishlist(request.user)
 
-    # Check if item already exists
-    if WishlistItem.objects.filter(wishlist=wishlist, product=product).exists():
+    if not wishlists.add_products(wishlist, [product.id]):
         return Response({'message': 'Product already in wishlist'})
-
-    WishlistItem.objects.create(wishlist=wishlist, product=product)
     return Response({'message': 'Product added to wishlist'})
 
 
@@ -403,7 +444,7 @@ def remove_from_wishlist_view(request, item_id):
     try:
         wishlist = Wishlist.objects.get(user=request.user)
         item = WishlistItem.objects.get(id=item_id, wishlist=wishlist)
-        item.delete()
+        wishlists.remove_products(wishlist, [item.product_id])
         return Response({'message': 'Item removed from wishlist'})
     except Wishlist.DoesNotExist:
         return Response({'error': 'Wishlist not found'}, status=404)
@@ -417,21 +458,127 @@ def clear_wishlist_view(request):
     """Clear all items from user's wishlist."""
     try:
         wishlist = Wishlist.objects.get(user=request.user)
-        wishlist.items.all().delete()
+        wishlists.remove_products(wishlist)
         return Response({'message': 'Wishlist cleared'})
     except Wishlist.DoesNotExist:
         return Response({'error': 'Wishlist not found'}, status=404)
 
 
+def _parse_product_ids(values):
+    """Return ``(ids, None)`` for a list of product ids, or ``(None, error_response)``."""
+    if isinstance(values, str):
+        values = [part for part in values.split(',') if part.strip()]
+    if not isinstance(values, list) or not values:
+        return None, Response({'error': 'A non-empty list of product ids is required'}, status=400)
+    try:
+        ids = list(dict.fromkeys(int(value) for value in values))
+    except (ValueError, TypeError):
+        return None, Response({'error': 'Product ids must be integers'}, status=400)
+    if len(ids) > MAX_WISHLIST_BATCH_SIZE:
+        return None, Response({'error': f'At most {MAX_WISHLIST_BATCH_SIZE} ids per request'}, status=400)
+    return ids, None
+
+
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+def wishlist_contains_view(request):
+    """
+    Tell which of ``?ids=`` (comma-separated product ids) are in the user's wishlist.
+
+    Answered from the user's cached id set when WISHLIST_IDS_CACHE names a
+    shared cache, so drawing the hearts on a product grid costs no query once
+    the set is warm.
+    """
+    ids, error = _parse_product_ids(request.GET.get('ids', ''))
+    if error:
+        return error
+
+    wishlisted = wishlists.wishlisted_ids(request.user.id)
+    return Response({'wishlisted': [product_id for product_id in ids if product_id in wishlisted]})
+
+
+@api_view(['POST'])
+@permission_classes([IsAuthenticated])
+def wishlist_bulk_add_view(request):
+    """Add every product in ``product_ids`` to the wishlist; unknown ids are listed under ``missing``."""
+    ids, error = _parse_product_ids(request.data.get('product_ids'))
+    if error:
+        return error
+
+    found = set(Product.objects.filter(id__in=ids).values_list('id', flat=True))
+    wishlist = wishlists.user_wishlist(request.user)
+    added = wishlists.add_products(wishlist, [product_id for product_id in ids if product_id in found])
+    return Response({
+        'added': added,
+        'missing': [product_id for product_id in ids if product_id not in found],
+    })
+
+
+@api_view(['POST'])
+@permission_classes([IsAuthenticated])
+def wishlist_bulk_remove_view(request):
+    """Remove every product in ``product_ids`` from the wishlist."""
+    ids, error = _parse_product_ids(request.data.get('product_ids'))
+    if error:
+        return error
+
+    wishlist = wishlists.user_wishlist(request.user)
+    return Response({'removed': wishlists.remove_products(wishlist, ids)})
+
+
+@api_view(['POST'])
+@permission_classes([IsAuthenticated])
+def wishlist_move_to_cart_view(request):
+    """
+    Move the products in ``product_ids`` from the wishlist to the cart, one of each.
+
+    Ids that are not in the wishlist are listed under ``missing``. Either every
+    product moves or, when one is out of stock, nothing does.
+    """
+    ids, error = _parse_product_ids(request.data.get('product_ids'))
+    if error:
+        return error
+
+    wishlist = wishlists.user_wishlist(request.user)
+    products = Product.objects.filter(
+        id__in=ids, wishlistitem__wishlist=wishlist,
+    ).in_bulk()
+    missing = [product_id for product_id in ids if product_id not in products]
+    if not products:
+        return Response({'moved': [], 'missing': missing})
+
+    cart = carts.user_cart(request.user)
+    try:
+        moved = wishlists.move_to_cart(wishlist, cart, products)
+    except InsufficientStock as e:
+        return Response({'error': str(e), 'shortfalls': e.shortfalls}, status=409)
+
+    return Response({'moved': moved, 'missing': missing})
+
+
 @api_view(['GET'])
 @permission_classes([IsAuthenticated])
 def cart_view(request):
-    """Get user's cart items."""
-    cart, created = Cart.objects.get_or_create(user=request.user)
-    items = cart.items.all().select_related('product')
+    """
+    Get user's cart items.
+
+    Accepts ``?since_version=N`` like wishlist_view; totals are always current.
+    """
+    try:
+        since_version = sync.parse_since_version(request.GET.get('since_version'))
+    except ValueError:
+        return Response({'error': 'Invalid since_version'}, status=400)
+
+    cart = carts.user_cart(request.user)
+    return Response(_cart_data(request, cart, since_version))
+
+
+def _cart_data(request, cart, since_version=None):
+    delta = sync.changes_since(cart, since_version)
+    items = delta[0] if delta else cart.items.all()
 
     cart_data = []
-    for item in items:
+    for item in items.select_related('product'):
         product = item.product
         cart_data.append({
             'id': str(item.id),
@@ -441,6 +588,7 @@ def cart_view(request):
             'original_price': product.original_price,
             'discount_percentage': product.discount_percentage,
             'image': request.build_absolute_uri(product.image.url) if product.image else None,
+            'image_srcset': srcset(request, product, product.image.name) if product.image else {},
             'rating': product.rating,
             'review_count': product.review_count,
             'quantity': item.quantity,
@@ -448,11 +596,16 @@ def cart_view(request):
             'added_at': item.added_at.isoformat(),
         })
 
-    return Response({
+    data = {
         'cart_items': cart_data,
         'total_items': cart.total_items,
-        'total_price': cart.total_price
-    })
+        'total_price': cart.total_price,
+        'version': cart.version,
+        'delta': delta is not None,
+    }
+    if delta:
+        data['removed'] = delta[1]
+    return data
 
 
 @api_view(['POST'])
@@ -477,19 +630,15 @@ def add_to_cart_view(request):
     except Product.DoesNotExist:
         return Response({'error': 'Product not found'}, status=404)
 
-    cart, created = Cart.objects.get_or_create(user=request.user)
+    if quantity > product.stock:
+        return Response({'error': f'Only {product.stock} left in stock', 'available': product.stock}, status=400)
 
-    # Check if item already exists in cart
-    cart_item, created = CartItem.objects.get_or_create(
-        cart=cart,
-        product=product,
-        defaults={'quantity': quantity}
-    )
+    cart = carts.user_cart(request.user)
 
-    if not created:
-        # Item already exists, update quantity
-        cart_item.quantity += quantity
-        cart_item.save()
+    try:
+        cart_item = carts.add_item(cart, product, quantity)
+    except InsufficientStock:
+        return Response({'error': f'Only {product.stock} left in stock', 'available': product.stock}, status=400)
 
     return Response({
         'message': 'Product added to cart',
@@ -516,9 +665,19 @@ def update_cart_item_view(request, item_id):
 
     try:
         cart = Cart.objects.get(user=request.user)
-        item = CartItem.objects.get(id=item_id, cart=cart)
-        item.quantity = quantity
-        item.save()
+        # Read the line under the write lock so the delta matches what is stored
+        with write_transaction():
+            item = CartItem.objects.select_related('product').get(id=item_id, cart=cart)
+            if quantity > item.product.stock:
+                return Response({
+                    'error': f'Only {item.product.stock} left in stock',
+                    'available': item.product.stock,
+                }, status=400)
+            delta = quantity - item.quantity
+            item.quantity = quantity
+            item.save(update_fields=['quantity'])
+            carts.adjust_totals(cart.id, delta, item.product.price * delta)
+            sync.record_changes(cart, changed=[item.product_id])
         return Response({
             'message': 'Cart item updated',
             'quantity': item.quantity,
@@ -536,8 +695,13 @@ def remove_from_cart_view(request, item_id):
     """Remove item from user's cart."""
     try:
         cart = Cart.objects.get(user=request.user)
-        item = CartItem.objects.get(id=item_id, cart=cart)
-        item.delete()
+        with write_transaction():
+            item = CartItem.objects.select_related('product').get(id=item_id, cart=cart)
+            deleted, _ = CartItem.objects.filter(id=item.id).delete()
+            if not deleted:
+                raise CartItem.DoesNotExist
+            carts.adjust_totals(cart.id, -item.quantity, -item.subtotal)
+            sync.record_changes(cart, removed=[(item_id, item.product_id)])
         return Response({'message': 'Item removed from cart'})
     except Cart.DoesNotExist:
         return Response({'error': 'Cart not found'}, status=404)
@@ -551,7 +715,11 @@ def clear_cart_view(request):
     """Clear all items from user's cart."""
     try:
         cart = Cart.objects.get(user=request.user)
-        cart.items.all().delete()
+        with write_transaction():
+            removed = list(cart.items.values_list('id', 'product_id'))
+            cart.items.all().delete()
+            carts.reset_totals(cart.id)
+            sync.record_changes(cart, removed=removed)
         return Response({'message': 'Cart cleared'})
     except Cart.DoesNotExist:
         return Response({'error': 'Cart not found'}, status=404)
@@ -559,49 +727,95 @@ def clear_cart_view(request):
 
 @api_view(['POST'])
 @permission_classes([IsAuthenticated])
-def create_order_view(request):
-    """Create a new order from user's cart."""
+def cart_batch_view(request):
+    """
+    Apply several cart changes atomically and return the new cart.
+
+    Body: ``{"operations": [{"op": "add" | "set" | "remove", "product_id": 1, "quantity": 2}, ...]}``.
+    ``add`` increments, ``set`` replaces the quantity (0 removes the line) and
+    ``remove`` deletes the line. Either every operation applies or none does.
+    """
+    operations = request.data.get('operations')
+    if not isinstance(operations, list) or not operations:
+        return Response({'error': 'operations must be a non-empty list'}, status=400)
+    if len(operations) > MAX_CART_BATCH_OPERATIONS:
+        return Response({'error': f'At most {MAX_CART_BATCH_OPERATIONS} operations per request'}, status=400)
+
+    cleaned = []
+    for index, operation in enumerate(operations):
+        if not isinstance(operation, dict) or operation.get('op') not in carts.BATCH_OPERATIONS:
+            return Response({'error': f'Operation {index}: op must be one of add, set, remove'}, status=400)
+        try:
+            product_id = int(operation.get('product_id'))
+            quantity = int(operation.get('quantity', 1 if operation['op'] == 'add' else 0))
+        except (ValueError, TypeError):
+            return Response({'error': f'Operation {index}: invalid product_id or quantity'}, status=400)
+        if quantity < (1 if operation['op'] == 'add' else 0):
+            return Response({'error': f'Operation {index}: invalid quantity'}, status=400)
+        cleaned.append({'op': operation['op'], 'product_id': product_id, 'quantity': quantity})
+
+    products = Product.objects.in_bulk({operation['product_id'] for operation in cleaned})
+    missing = sorted({operation['product_id'] for operation in cleaned} - set(products))
+    if missing:
+        return Response({'error': 'Product not found', 'missing': missing}, status=404)
+
+    cart = carts.user_cart(request.user)
     try:
-        # Get user's cart
-        cart = Cart.objects.get(user=request.user)
-        cart_items = cart.items.all()
-
-        if not cart_items.exists():
-            return Response({'error': 'Cart is empty'}, status=400)
-
-        print(f"Cart has {cart_items.count()} items")
+        carts.apply_operations(cart, cleaned, products)
+    except InsufficientStock as e:
+        return Response({'error': str(e), 'shortfalls': e.shortfalls}, status=409)
 
-        # Get delivery details from request
-        delivery_address_id = request.data.get('delivery_address_id')
-        delivery_slot_date = request.data.get('delivery_slot_date')
-        delivery_slot_time = request.data.get('delivery_slot_time')
-        payment_method = request.data.get('payment_method', 'upi')
+    cart.refresh_from_db(fields=['total_items', 'total_price', 'version'])
+    return Response(_cart_data(request, cart))
 
-        print(f"Creating order for user {request.user.id} with delivery_address_id: {delivery_address_id}")
 
-        if not all([delivery_address_id, delivery_slot_date, delivery_slot_time]):
-            return Response({'error': 'Delivery address and slot are required'}, status=400)
+@api_view(['POST'])
+@permission_classes([IsAuthenticated])
+def create_order_view(request):
+    """
+    Create a new order from user's cart.
+
+    The whole checkout is one transaction with a fixed number of queries:
+    the cart is read once with its products, stock is reserved for every line
+    in one conditional update, order items are bulk inserted and the cart is
+    emptied in a single delete.
+    """
+    # Get delivery details from request
+    delivery_address_id = request.data.get('delivery_address_id')
+    delivery_slot_date = request.data.get('delivery_slot_date')
+    delivery_slot_time = request.data.get('delivery_slot_time')
+    payment_method = request.data.get('payment_method', 'upi')
+
+    if not all([delivery_address_id, delivery_slot_date, delivery_slot_time]):
+        return Response({'error': 'Delivery address and slot are required'}, status=400)
 
-        # Get delivery address
-        try:
-            delivery_address = Address.objects.get(id=delivery_address_id, user=request.user)
-        except Address.DoesNotExist:
-            # Try to find any address for this user as fallback
-            user_addresses = Address.objects.filter(user=request.user)
-            if user_addresses.exists():
-                delivery_address = user_addresses.first()
-            else:
+    try:
+        with write_transaction():
+            # Lock the cart so concurrent checkouts of the same cart run one at a time
+            try:
+                cart = Cart.objects.select_for_update().get(user=request.user)
+            except Cart.DoesNotExist:
+                return Response({'error': 'Cart is empty'}, status=400)
+
+            cart_items = list(cart.items.select_related('product'))
+            if not cart_items:
+                return Response({'error': 'Cart is empty'}, status=400)
+
+            # Get delivery address, falling back to the user's preferred one
+            delivery_address = (
+                Address.objects.filter(id=delivery_address_id, user=request.user).first()
+                or Address.objects.filter(user=request.user).first()
+            )
+            if delivery_address is None:
                 return Response({'error': 'No delivery addresses found. Please add an address.'}, status=404)
 
-        # Calculate totals
-        subtotal = sum(item.subtotal for item in cart_items)
-        delivery_fee = Decimal('40.00')  # Fixed delivery fee
-        discount = Decimal('0.00')  # TODO: Implement coupon system
-        tax = subtotal * Decimal('0.18')  # 18% GST
-        total = subtotal + delivery_fee - discount + tax
+            # Calculate totals
+            subtotal = sum((item.subtotal for item in cart_items), Decimal('0.00'))
+            delivery_fee = Decimal('40.00')  # Fixed delivery fee
+            discount = Decimal('0.00')  # TODO: Implement coupon system
+            tax = subtotal * Decimal('0.18')  # 18% GST
+            total = subtotal + delivery_fee - discount + tax
 
-        # Create order
-        try:
             order = Order.objects.create(
                 user=request.user,
                 payment_method=payment_method,
@@ -614,27 +828,21 @@ def create_order_view(request):
                 tax=tax,
                 total=total,
             )
-        except Exception as e:
-            return Response({'error': f'Failed to create order: {str(e)}'}, status=500)
 
-        # Create order items from cart items
-        order_items = []
-        for cart_item in cart_items:
-            try:
-                subtotal = cart_item.product.price * cart_item.quantity
-                order_item = OrderItem.objects.create(
+            reserve_stock(order, [(item.product, item.quantity) for item in cart_items])
+
+            OrderItem.objects.bulk_create([
+                OrderItem(
                     order=order,
                     product=cart_item.product,
                     quantity=cart_item.quantity,
                     price=cart_item.product.price,
-                    subtotal=subtotal,
+                    subtotal=cart_item.subtotal,
                 )
-                order_items.append(order_item)
-            except Exception as e:
-                return Response({'error': f'Failed to create order item: {str(e)}'}, status=500)
+                for cart_item in cart_items
+            ])
 
-        # Create initial tracking entry
-        try:
+            # Create initial tracking entry
             estimated_delivery = order.created_at.replace(hour=14, minute=0, second=0, microsecond=0)
             OrderTracking.objects.create(
                 order=order,
@@ -642,78 +850,169 @@ def create_order_view(request):
                 message='Order placed successfully',
                 estimated_delivery=estimated_delivery,
             )
-        except Exception as e:
-            return Response({'error': f'Failed to create order tracking: {str(e)}'}, status=500)
 
-        # Clear the cart
-        cart_items.delete()
+            # Clear the cart; if another checkout already consumed these rows, roll back
+            deleted, _ = CartItem.objects.filter(id__in=[item.id for item in cart_items]).delete()
+            if deleted != len(cart_items):
+                raise CheckoutConflict('Cart changed during checkout. Please try again.')
+            carts.adjust_totals(cart.id, -sum(item.quantity for item in cart_items), -subtotal)
+            sync.record_changes(cart, removed=[(item.id, item.product_id) for item in cart_items])
+
+    except InsufficientStock as e:
+        return Response({'error': str(e), 'shortfalls': e.shortfalls}, status=409)
+    except CheckoutConflict as e:
+        return Response({'error': str(e)}, status=409)
+    except Exception as e:
+        return Response({'error': f'Failed to create order: {str(e)}'}, status=500)
 
-        return Response({
-            'message': 'Order created successfully',
-            'order_id': order.id,
-            'order_number': order.order_number,
-            'total': str(order.total),
-            'estimated_delivery': order.created_at.isoformat(),
-        }, status=201)
+    return Response({
+        'message': 'Order created successfully',
+        'order_id': order.id,
+        'order_number': order.order_number,
+        'total': str(order.total),
+        'estimated_delivery': order.created_at.isoformat(),
+    }, status=201)
 
-    except Exception as e:
-        return Response({'error': str(e)}, status=500)
+
+def _order_list_data(order):
+    tracking = order.latest_tracking[0] if order.latest_tracking else None
+    return {
+        'id': order.id,
+        'order_number': order.order_number,
+        'status': order.status,
+        'total': str(order.total),
+        'created_at': order.created_at,
+        'delivery_slot_date': order.delivery_slot_date,
+        'delivery_slot_time': order.delivery_slot_time,
+        'pricing': {
+            'subtotal': str(order.subtotal),
+            'delivery_fee': str(order.delivery_fee),
+            'discount': str(order.discount),
+            'tax': str(order.tax),
+        },
+        'delivery_address': {
+            'id': order.delivery_address.id,
+            'name': order.delivery_address.name,
+            'phone': order.delivery_address.phone,
+            'address_line_1': order.delivery_address.address_line_1,
+            'city': order.delivery_address.city,
+            'state': order.delivery_address.state,
+            'postal_code': order.delivery_address.postal_code,
+        } if order.delivery_address else None,
+        'items': [{
+            'id': item.id,
+            'product_id': item.product.id,
+            'name': item.product.name,
+            'quantity': item.quantity,
+            'price': str(item.price),
+            'image': item.product.image.url if item.product.image else None,
+        } for item in order.items.all()],
+        'tracking': {
+            'status': tracking.status,
+            'message': tracking.message,
+            'timestamp': tracking.timestamp,
+        } if tracking else None,
+    }
+
+
+def _order_summary_data(order):
+    return {
+        'id': order.id,
+        'order_number': order.order_number,
+        'status': order.status,
+        'total': str(order.total),
+        'created_at': order.created_at,
+        'item_count': order.item_count,
+        'tracking_status': order.tracking_status,
+    }
 
 
 @api_view(['GET'])
 @permission_classes([IsAuthenticated])
 def order_list_view(request):
-    """Get user's order history."""
-    orders = Order.objects.filter(user=request.user).select_related('delivery_address')
-
-    order_data = []
-    for order in orders:
-        order_items = OrderItem.objects.filter(order=order).select_related('product')
-        tracking = OrderTracking.objects.filter(order=order).order_by('-timestamp').first()
-
-        order_data.append({
-            'id': order.id,
-            'order_number': order.order_number,
-            'status': order.status,
-            'total': str(order.total),
-            'created_at': order.created_at,
-            'delivery_slot_date': order.delivery_slot_date,
-            'delivery_slot_time': order.delivery_slot_time,
-            'pricing': {
-                'subtotal': str(order.subtotal),
-                'delivery_fee': str(order.delivery_fee),
-                'discount': str(order.discount),
-                'tax': str(order.tax),
-            },
-            'delivery_address': {
-                'id': order.delivery_address.id,
-                'name': order.delivery_address.name,
-                'phone': order.delivery_address.phone,
-                'address_line_1': order.delivery_address.address_line_1,
-                'city': order.delivery_address.city,
-                'state': order.delivery_address.state,
-                'postal_code': order.delivery_address.postal_code,
-            } if order.delivery_address else None,
-            'items': [{
-                'id': item.id,
-                'product_id': item.product.id,
-                'name': item.product.name,
-                'quantity': item.quantity,
-                'price': str(item.price),
-                'image': item.product.image.url if item.product.image else None,
-            } for item in order_items],
-            'tracking': {
-                'status': tracking.status if tracking else 'placed',
-                'message': tracking.message if tracking else 'Order placed',
-                'timestamp': tracking.timestamp if tracking else order.created_at,
-            } if tracking else None,
-        })
+    """
+    Get user's order history.
+
+    Pass ``cursor`` (empty for the first page) and optionally ``limit`` to page
+    through orders newest first; the response then carries ``next_cursor``.
+    ``summary=1`` returns only the fields the list screen needs. Without a
+    cursor the full history is returned as a plain list for older app builds.
+    Either way the number of queries does not depend on the number of orders.
+    """
+    cursor = request.query_params.get('cursor')
+    summary = request.query_params.get('summary') in ('1', 'true')
+    try:
+        limit = parse_limit(request.query_params.get('limit'))
+    except ValueError as e:
+        return Response({'error': str(e)}, status=400)
+
+    orders = Order.objects.filter(user=request.user)
+    if summary:
+        latest_status = (
+            OrderTracking.objects.filter(order=OuterRef('pk')).order_by('-timestamp', '-id').values('status')[:1]
+        )
+        orders = orders.annotate(item_count=Count('items'), tracking_status=Subquery(latest_status))
+        serialize = _order_summary_data
+    else:
+        orders = orders.select_related('delivery_address').prefetch_related(
+            Prefetch('items', queryset=OrderItem.objects.select_related('product')),
+            Prefetch(
+                'tracking_history',
+                queryset=OrderTracking.objects.order_by('-timestamp', '-id')[:1],
+                to_attr='latest_tracking',
+            ),
+        )
+        serialize = _order_list_data
 
-    return Response(order_data)
+    if cursor is None:
+        return Response([serialize(order) for order in orders])
+
+    try:
+        page, next_cursor = paginate_by_cursor(orders, cursor, limit)
+    except ValueError:
+        return Response({'error': 'Invalid cursor'}, status=400)
+
+    return Response({
+        'orders': [serialize(order) for order in page],
+        'next_cursor': next_cursor,
+        'has_more': next_cursor is not None,
+    })
+
+
+def _order_detail_validators(request, order_id):
+    row = (
+        Order.objects.filter(id=order_id, user=request.user)
+        .annotate(
+            tracking_last=Max('tracking_history__timestamp'),
+            tracking_count=Count('tracking_history', distinct=True),
+            products_last=Max('items__product__updated_at'),
+        )
+        .values('updated_at', 'tracking_last', 'tracking_count', 'products_last', 'delivery_address__updated_at')
+        .first()
+    )
+    if row is None:
+        return None
+    parts = tuple(row.values())
+    return parts, max(ts for ts in (row['updated_at'], row['tracking_last'], row['products_last'],
+                                    row['delivery_address__updated_at']) if ts is not None)
+
+
+def _order_tracking_validators(request, order_id):
+    row = (
+        Order.objects.filter(id=order_id, user=request.user)
+        .annotate(tracking_last=Max('tracking_history__timestamp'), tracking_count=Count('tracking_history'))
+        .values('updated_at', 'tracking_last', 'tracking_count')
+        .first()
+    )
+    if row is None:
+        return None
+    parts = tuple(row.values())
+    return parts, max(row['updated_at'], row['tracking_last'] or row['updated_at'])
 
 
 @api_view(['GET'])
 @permission_classes([IsAuthenticated])
+@conditional_view(_order_detail_validators)
 def order_detail_view(request, order_id):
     """Get detailed information about a specific order."""
     try:
@@ -774,6 +1073,7 @@ def order_detail_view(request, order_id):
 
 @api_view(['GET'])
 @permission_classes([IsAuthenticated])
+@conditional_view(_order_tracking_validators)
 def order_tracking_view(request, order_id):
     """Get tracking information for a specific order."""
     try:
@@ -787,13 +1087,115 @@ def order_tracking_view(request, order_id):
         'order_id': order.id,
         'order_number': order.order_number,
         'current_status': order.status,
-        'tracking_history': [{
-            'status': tracking.status,
-            'message': tracking.message,
-            'timestamp': tracking.timestamp,
-            'estimated_delivery': tracking.estimated_delivery,
-        } for tracking in tracking_history],
+        'tracking_history': [tracking_row(row) for row in tracking_history],
     }
 
     return Response(tracking_data)
 
+
+async def _authenticate(request):
+    try:
+        result = await sync_to_async(JWTAuthentication().authenticate)(request)
+    except AuthenticationFailed:
+        return None
+    return result[0] if result else None
+
+
+def _sse_event(event_id, data):
+    return f'id: {event_id}\nevent: tracking\ndata: {json.dumps(data, cls=DjangoJSONEncoder)}\n\n'
+
+
+async def _tracking_events(order, after_id):
+    options = stream_options()
+    loop = asyncio.get_running_loop()
+    deadline = loop.time() + options['MAX_STREAM_SECONDS']
+    waiter = await broker.subscribe(order['id'])
+    try:
+        yield 'retry: 3000\n\n'
+        last_status = None
+        changed = True
+        while True:
+            if changed:
+                status, rows = await read_changes(order['id'], after_id)
+                if rows or status != last_status:
+                    after_id = rows[-1]['id'] if rows else after_id
+                    last_status = status
+                    yield _sse_event(after_id, {
+                        'order_id': order['id'],
+                        'order_number': order['order_number'],
+                        'current_status': status,
+                        'tracking_history': rows,
+                    })
+                if status in FINAL_STATUSES:
+                    return
+            remaining = deadline - loop.time()
+            if remaining <= 0:
+                return
+            changed = await wait_for_change(waiter, min(options['HEARTBEAT'], remaining))
+            if not changed:
+                yield ': keep-alive\n\n'
+    finally:
+        broker.unsubscribe(order['id'], waiter)
+
+
+@require_http_methods(["GET"])
+async def order_tracking_stream_view(request, order_id):
+    """
+    Push tracking updates for an order instead of having the app poll.
+
+    With ``Accept: text/event-stream`` this is a Server-Sent Events stream:
+    every event carries the current status and the tracking rows added since
+    the previous one, and its id is the last tracking row id, so a reconnect
+    with ``Last-Event-ID`` resumes where it left off. Otherwise it long-polls:
+    the response waits up to ``timeout`` seconds until there are rows after
+    ``after`` or the status differs from ``status``. Needs an ASGI server
+    (see backend/asgi.py) so waiting connections do not hold a thread each.
+    """
+    user = await _authenticate(request)
+    if user is None:
+        return JsonResponse({'detail': 'Authentication credentials were not provided.'}, status=401)
+
+    order = await primary_orders.filter(id=order_id, user=user).values('id', 'order_number', 'status').afirst()
+    if order is None:
+        return JsonResponse({'error': 'Order not found'}, status=404)
+
+    options = stream_options()
+    try:
+        after_id = int(request.headers.get('Last-Event-ID') or request.GET.get('after') or 0)
+        timeout = float(request.GET.get('timeout', options['LONG_POLL_TIMEOUT']))
+    except ValueError:
+        return JsonResponse({'error': 'after and timeout must be numbers'}, status=400)
+    # Comparisons with NaN are all false, so min() alone would let it through unbounded
+    if not (math.isfinite(timeout) and timeout >= 0):
+        return JsonResponse({'error': 'timeout must be a finite number of seconds, at least 0'}, status=400)
+    timeout = min(timeout, 2 * options['LONG_POLL_TIMEOUT'])
+
+    if 'text/event-stream' in request.headers.get('Accept', ''):
+        return StreamingHttpResponse(
+            _tracking_events(order, after_id),
+            content_type='text/event-stream',
+            headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'},
+        )
+
+    known_status = request.GET.get('status')
+    loop = asyncio.get_running_loop()
+    deadline = loop.time() + timeout
+    waiter = await broker.subscribe(order_id)
+    try:
+        while True:
+            status, rows = await read_changes(order_id, after_id)
+            remaining = deadline - loop.time()
+            if rows or (known_status and status != known_status) or remaining <= 0:
+                break
+            await wait_for_change(waiter, remaining)
+    finally:
+        broker.unsubscribe(order_id, waiter)
+
+    return JsonResponse({
+        'order_id': order_id,
+        'order_number': order['order_number'],
+        'current_status': status,
+        'tracking_history': rows,
+        'last_id': rows[-1]['id'] if rows else after_id,
+    })
+
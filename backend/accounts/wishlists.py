@@ -0,0 +1,126 @@
+from django.conf import settings
+from django.core.cache import caches
+from django.core.cache.backends.dummy import DummyCache
+from django.core.cache.backends.locmem import LocMemCache
+from django.db import transaction
+
+from backend.sqlite import write_transaction
+
+from . import carts
+from .models import Wishlist, WishlistItem
+from .sync import record_changes
+
+DEFAULTS = {
+    'ALIAS': None,          # CACHES alias shared by every worker process; None reads the ids from the database
+    'TIMEOUT': 300,
+}
+
+
+def _options():
+    return {**DEFAULTS, **getattr(settings, 'WISHLIST_IDS_CACHE', {})}
+
+
+def _cache():
+    """The cache for the id sets, or None when no shared cache is configured."""
+    alias = _options()['ALIAS']
+    if alias is None:
+        return None
+    cache = caches[alias]
+    # A per-process cache would keep serving ids that another worker's change has made stale
+    if isinstance(cache, (LocMemCache, DummyCache)):
+        return None
+    return cache
+
+
+def _key(user_id):
+    return f'wishlist-ids:{user_id}'
+
+
+def user_wishlist(user):
+    """The wishlist of ``user``, created under the write lock on first use."""
+    try:
+        return Wishlist.objects.get(user=user)
+    except Wishlist.DoesNotExist:
+        with write_transaction():
+            return Wishlist.objects.get_or_create(user=user)[0]
+
+
+def wishlisted_ids(user_id):
+    """Return the frozenset of product ids in the user's wishlist, cached per user when a shared cache is set."""
+    cache = _cache()
+    ids = cache.get(_key(user_id)) if cache is not None else None
+    if ids is None:
+        ids = frozenset(WishlistItem.objects.filter(wishlist__user_id=user_id).values_list('product_id', flat=True))
+        if cache is not None:
+            cache.set(_key(user_id), ids, _options()['TIMEOUT'])
+    return ids
+
+
+def forget_ids(user_id):
+    """
+    Drop the cached id set of ``user_id``.
+
+    Like products.cache.invalidate, this happens now and again on commit so a
+    read that re-caches the old set in between does not survive.
+    """
+    cache = _cache()
+    if cache is None:
+        return
+    cache.delete(_key(user_id))
+    if not transaction.get_autocommit():
+        transaction.on_commit(lambda: cache.delete(_key(user_id)))
+
+
+def add_products(wishlist, product_ids):
+    """Add ``product_ids`` (existing products) to ``wishlist`` and return the ids that were new."""
+    with write_transaction():
+        existing = set(
+            WishlistItem.objects.filter(wishlist=wishlist, product_id__in=product_ids).values_list('product_id', flat=True)
+        )
+        added = [product_id for product_id in product_ids if product_id not in existing]
+        if added:
+            # A concurrent add of the same product is simply skipped
+            WishlistItem.objects.bulk_create(
+                [WishlistItem(wishlist=wishlist, product_id=product_id) for product_id in added],
+                ignore_conflicts=True,
+            )
+            record_changes(wishlist, changed=added)
+            forget_ids(wishlist.user_id)
+    return added
+
+
+def remove_products(wishlist, product_ids=None):
+    """Remove ``product_ids`` (every item when None) from ``wishlist`` and return the ids removed."""
+    with write_transaction():
+        items = wishlist.items.all()
+        if product_ids is not None:
+            items = items.filter(product_id__in=product_ids)
+        removed = list(items.values_list('id', 'product_id'))
+        if removed:
+            WishlistItem.objects.filter(id__in=[item_id for item_id, _ in removed]).delete()
+            record_changes(wishlist, removed=removed)
+            forget_ids(wishlist.user_id)
+    return [product_id for _, product_id in removed]
+
+
+def drop_product(product_id):
+    """Tombstone the wishlist items of ``product_id`` from pre_delete, before the cascade deletes them."""
+    for item in WishlistItem.objects.filter(product_id=product_id).select_related('wishlist'):
+        record_changes(item.wishlist, removed=[(item.id, product_id)])
+        forget_ids(item.wishlist.user_id)
+
+
+def move_to_cart(wishlist, cart, products):
+    """
+    Move the wishlisted ``products`` (a ``{id: Product}`` dict) into ``cart``, one of each.
+
+    Runs in one transaction: if any line would exceed stock, InsufficientStock
+    propagates and neither the cart nor the wishlist changes.
+    """
+    with write_transaction():
+        carts.apply_operations(
+            cart,
+            [{'op': 'add', 'product_id': product_id, 'quantity': 1} for product_id in products],
+            products,
+        )
+        return remove_products(wishlist, list(products))
@@ -3,6 +3,11 @@ ASGI config for backend project.
 
 It exposes the ASGI callable as a module-level variable named ``application``.
 
+Serve the project through this entry point (e.g. ``uvicorn backend.asgi:application``)
+in production: the order tracking stream (accounts.views.order_tracking_stream_view)
+holds connections open while it waits for updates, which only scales when each
+waiting request is a coroutine rather than a worker thread.
+
 For more information on this file, see
 https://docs.djangoproject.com/en/5.2/howto/deployment/asgi/
 """
@@ -0,0 +1,187 @@
+"""
+Serving uploaded media.
+
+serve_media answers GET and HEAD for files under MEDIA_ROOT, in production
+as well as in development:
+
+- ``ETag`` and ``Last-Modified``, so a revalidation costs a 304 and no body;
+- ``Cache-Control: public, max-age=<one year>, immutable`` for content-addressed
+  names (products.storage.is_immutable), which never change; other files get
+  MEDIA_SERVING['MAX_AGE'];
+- single HTTP ``Range`` requests (206, or 416 when unsatisfiable), honouring
+  ``If-Range``. Multi-range requests get the whole file;
+- with MEDIA_SERVING['SENDFILE'] set to 'x-accel-redirect' (nginx) or
+  'x-sendfile' (Apache mod_xsendfile, lighttpd), the front-end server sends
+  the bytes and handles ranges itself. Otherwise the file goes out as a
+  FileResponse, which the WSGI server can hand to sendfile() via
+  wsgi.file_wrapper.
+"""
+import mimetypes
+import os
+import posixpath
+import re
+from stat import S_ISREG
+from urllib.parse import quote
+
+from django.conf import settings
+from django.core.exceptions import SuspiciousFileOperation
+from django.http import FileResponse, Http404, HttpResponse
+from django.utils._os import safe_join
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date, parse_http_date_safe, quote_etag
+from django.views.decorators.http import require_http_methods
+
+from products.storage import is_immutable
+
+DEFAULTS = {
+    'SENDFILE': None,                                   # None, 'x-accel-redirect' or 'x-sendfile'
+    'ACCEL_REDIRECT_PREFIX': '/protected-media/',       # nginx `internal` location aliased to MEDIA_ROOT
+    'MAX_AGE': 3600,                                    # For names that can change
+}
+
+IMMUTABLE_MAX_AGE = 365 * 24 * 60 * 60
+
+_RANGE = re.compile(r'^bytes=(\d*)-(\d*)$')
+
+
+def serving_options():
+    return {**DEFAULTS, **getattr(settings, 'MEDIA_SERVING', {})}
+
+
+class RangeNotSatisfiable(Exception):
+    pass
+
+
+def parse_range(header, size):
+    """
+    Return the inclusive ``(first, last)`` byte positions that a Range header selects.
+
+    Returns None when the whole file should be sent: no header, a malformed
+    header, or several ranges. Raises RangeNotSatisfiable if the range lies
+    past the end of the file.
+    """
+    match = _RANGE.match(header.replace(' ', '')) if header else None
+    if match is None or match.groups() == ('', ''):
+        return None
+    first, last = match.groups()
+    if not first:
+        # A suffix range: the final ``last`` bytes
+        if int(last) == 0 or size == 0:
+            raise RangeNotSatisfiable
+        return max(0, size - int(last)), size - 1
+    first = int(first)
+    last = min(int(last), size - 1) if last else size - 1
+    if first > last:
+        if first >= size:
+            raise RangeNotSatisfiable
+        return None
+    return first, last
+
+
+class FileRange:
+    """A file object that reads only ``length`` bytes from ``offset``."""
+
+    def __init__(self, file, offset, length):
+        self.file = file
+        self.remaining = length
+        file.seek(offset)
+
+    def read(self, size=-1):
+        if size < 0 or size > self.remaining:
+            size = self.remaining
+        data = self.file.read(size)
+        self.remaining -= len(data)
+        return data
+
+    def close(self):
+        self.file.close()
+
+
+def _validators(name, stat):
+    # A content-addressed name already identifies the bytes, on every server alike
+    if is_immutable(name):
+        return quote_etag(posixpath.basename(name)), True
+    return quote_etag(f'{stat.st_size:x}-{stat.st_mtime_ns:x}'), False
+
+
+def _set_caching_headers(response, etag, last_modified, immutable, options):
+    response.headers['ETag'] = etag
+    response.headers['Last-Modified'] = http_date(last_modified)
+    response.headers['Cache-Control'] = (
+        f'public, max-age={IMMUTABLE_MAX_AGE}, immutable' if immutable else f'public, max-age={options["MAX_AGE"]}'
+    )
+
+
+def _if_range_matches(request, etag, last_modified):
+    if_range = request.headers.get('If-Range')
+    if not if_range:
+        return True
+    if if_range.startswith(('"', 'W/')):
+        # Only a strong validator can approve a partial response
+        return if_range == etag
+    return parse_http_date_safe(if_range) == last_modified
+
+
+@require_http_methods(['GET', 'HEAD'])
+def serve_media(request, path):
+    """Serve the file at ``path`` under MEDIA_ROOT."""
+    # Dot files are temporary uploads in progress (see products.storage)
+    if any(part.startswith('.') for part in path.split('/')):
+        raise Http404
+    try:
+        full_path = safe_join(settings.MEDIA_ROOT, path)
+    except SuspiciousFileOperation:
+        raise Http404
+    try:
+        stat = os.stat(full_path)
+    except (FileNotFoundError, NotADirectoryError):
+        raise Http404
+    if not S_ISREG(stat.st_mode):
+        raise Http404
+
+    options = serving_options()
+    etag, immutable = _validators(path, stat)
+    last_modified = int(stat.st_mtime)
+    not_modified = get_conditional_response(request, etag=etag, last_modified=last_modified)
+    if not_modified is not None:
+        _set_caching_headers(not_modified, etag, last_modified, immutable, options)
+        return not_modified
+
+    content_type = mimetypes.guess_type(full_path)[0] or 'application/octet-stream'
+    size = stat.st_size
+    if options['SENDFILE']:
+        # The front-end server sends the body and serves Range requests itself
+        response = HttpResponse(content_type=content_type)
+        if options['SENDFILE'] == 'x-accel-redirect':
+            response.headers['X-Accel-Redirect'] = options['ACCEL_REDIRECT_PREFIX'] + quote(path)
+        else:
+            response.headers['X-Sendfile'] = full_path
+        _set_caching_headers(response, etag, last_modified, immutable, options)
+        return response
+
+    try:
+        byte_range = parse_range(request.headers.get('Range'), size)
+    except RangeNotSatisfiable:
+        response = HttpResponse(status=416)
+        response.headers['Content-Range'] = f'bytes */{size}'
+        return response
+    if byte_range is not None and not _if_range_matches(request, etag, last_modified):
+        byte_range = None
+
+    if byte_range is None:
+        length = size
+    else:
+        length = byte_range[1] - byte_range[0] + 1
+    if request.method == 'HEAD':
+        response = HttpResponse(content_type=content_type)
+    elif byte_range is None:
+        response = FileResponse(open(full_path, 'rb'), content_type=content_type)
+    else:
+        response = FileResponse(FileRange(open(full_path, 'rb'), byte_range[0], length), content_type=content_type)
+    if byte_range is not None:
+        response.status_code = 206
+        response.headers['Content-Range'] = f'bytes {byte_range[0]}-{byte_range[1]}/{size}'
+    response.headers['Content-Length'] = str(length)
+    response.headers['Accept-Ranges'] = 'bytes'
+    _set_caching_headers(response, etag, last_modified, immutable, options)
+    return response
@@ -0,0 +1,55 @@
+"""
+Query plan checks for SQLite.
+
+full_scans() runs EXPLAIN QUERY PLAN on captured queries (for example from
+django.test.utils.CaptureQueriesContext) and reports every step that reads a
+whole table or a whole index instead of searching one. Tests use it to catch
+a hot query path that has lost its index. Run ANALYZE on the test data first,
+so the planner sees realistic statistics.
+"""
+import re
+
+EXPLAINED = ('SELECT', 'UPDATE', 'DELETE')
+
+# "SCAN products_product", or "SCAN TABLE products_product" before SQLite 3.36,
+# optionally "USING [COVERING] INDEX i": walking a whole index reads every row
+# too. Virtual tables (full-text MATCH) and constant rows are not scans.
+_FULL_SCAN = re.compile(r'^SCAN (?:TABLE )?(\w+)(?: AS \w+)?(?: USING (?:COVERING )?INDEX \w+)?$')
+# An index walk that stops after LIMIT rows reads a page, not the table
+_INDEX_WALK = re.compile(r' USING (?:COVERING )?INDEX ')
+_LIMIT = re.compile(r'\bLIMIT\b', re.IGNORECASE)
+
+
+def explain(connection, sql, params=None):
+    """Return the detail column of each step of ``sql``'s query plan."""
+    with connection.cursor() as cursor:
+        cursor.execute(f'EXPLAIN QUERY PLAN {sql}', params)
+        return [row[-1] for row in cursor.fetchall()]
+
+
+def full_scans(connection, queries, allow=()):
+    """
+    Return ``(sql, step)`` for each full table scan in ``queries``.
+
+    ``queries`` are dicts with a ``sql`` key, as captured by Django; their
+    parameters are already interpolated. Index walks in a query with a LIMIT
+    are allowed, as are scans of tables in ``allow`` (ones that are meant to
+    be read whole).
+    """
+    scans = []
+    for query in queries:
+        sql = query['sql']
+        if not sql.lstrip().upper().startswith(EXPLAINED):
+            continue
+        steps = explain(connection, sql)
+        # Subqueries in FROM show up as "SCAN <name>" after being built; they are not tables
+        derived = {step.split()[-1] for step in steps if step.startswith(('CO-ROUTINE ', 'MATERIALIZE '))}
+        limited = _LIMIT.search(sql) is not None
+        for step in steps:
+            match = _FULL_SCAN.match(step)
+            if not match or match.group(1) in allow or match.group(1) in derived:
+                continue
+            if limited and _INDEX_WALK.search(step):
+                continue
+            scans.append((sql, step))
+    return scans
@@ -0,0 +1,118 @@
+"""
+Read-replica routing.
+
+ReplicaRouter sends reads of the catalog and order history models to one of
+the aliases in DATABASE_REPLICAS, and everything else to ``default``.
+replica_pinning_middleware keeps a request on the primary when it needs to
+read its own writes:
+
+- requests with unsafe methods (POST, PUT, ...) never touch a replica;
+- once a request writes, its remaining reads go to the primary;
+- a request that wrote sets a short-lived cookie, so the same client's next
+  requests (e.g. the GET after a redirect) also read from the primary for
+  REPLICA_PIN_SECONDS, covering replication lag.
+"""
+import random
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from asgiref.sync import iscoroutinefunction
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, connections
+from django.utils.decorators import sync_and_async_middleware
+
+REPLICATED_MODELS = frozenset({
+    'products.product',
+    'products.category',
+    'accounts.order',
+    'accounts.orderitem',
+    'accounts.ordertracking',
+})
+
+PIN_COOKIE = 'db_pin'
+SAFE_METHODS = ('GET', 'HEAD', 'OPTIONS')
+
+
+class _Routing:
+    __slots__ = ('pinned', 'wrote')
+
+    def __init__(self, pinned=False):
+        self.pinned = pinned
+        self.wrote = False
+
+
+_routing = ContextVar('replica_routing', default=None)
+
+
+def replica_aliases():
+    return list(getattr(settings, 'DATABASE_REPLICAS', []))
+
+
+@contextmanager
+def use_primary():
+    """Send every read in the block to the primary."""
+    token = _routing.set(_Routing(pinned=True))
+    try:
+        yield
+    finally:
+        _routing.reset(token)
+
+
+class ReplicaRouter:
+    def db_for_read(self, model, **hints):
+        if model._meta.label_lower not in REPLICATED_MODELS:
+            return None
+        replicas = replica_aliases()
+        if not replicas:
+            return None
+        routing = _routing.get()
+        if routing is not None and routing.pinned:
+            return DEFAULT_DB_ALIAS
+        # Reads inside a transaction must see its writes
+        if connections[DEFAULT_DB_ALIAS].in_atomic_block:
+            return DEFAULT_DB_ALIAS
+        # Related lookups follow the object they start from
+        instance = hints.get('instance')
+        if instance is not None and instance._state.db in (DEFAULT_DB_ALIAS, *replicas):
+            return instance._state.db
+        return random.choice(replicas)
+
+    def db_for_write(self, model, **hints):
+        routing = _routing.get()
+        if routing is not None:
+            routing.pinned = routing.wrote = True
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        pool = {DEFAULT_DB_ALIAS, *replica_aliases()}
+        if obj1._state.db in pool and obj2._state.db in pool:
+            return True
+        return None
+
+
+def _start(request):
+    pinned = request.method not in SAFE_METHODS or PIN_COOKIE in request.COOKIES
+    return _routing.set(_Routing(pinned=pinned))
+
+
+def _finish(token, response):
+    routing = _routing.get()
+    _routing.reset(token)
+    if routing.wrote and replica_aliases():
+        response.set_cookie(
+            PIN_COOKIE, '1', max_age=getattr(settings, 'REPLICA_PIN_SECONDS', 5), httponly=True, samesite='Lax',
+        )
+    return response
+
+
+@sync_and_async_middleware
+def replica_pinning_middleware(get_response):
+    if iscoroutinefunction(get_response):
+        async def middleware(request):
+            token = _start(request)
+            return _finish(token, await get_response(request))
+    else:
+        def middleware(request):
+            token = _start(request)
+            return _finish(token, get_response(request))
+    return middleware
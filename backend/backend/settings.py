@@ -10,6 +10,7 @@ For the full list of settings and their values, see
 https://docs.djangoproject.com/en/5.2/ref/settings/
 """
 
+import os
 from pathlib import Path
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
@@ -56,7 +57,10 @@ INSTALLED_APPS = [
 
 
 MIDDLEWARE = [
+    # First, so it sees the queries of every other middleware too
+    'backend.sql_instrumentation.sql_instrumentation_middleware',
     'corsheaders.middleware.CorsMiddleware',
+    'backend.routers.replica_pinning_middleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -104,9 +108,29 @@ DATABASES = {
     'default': {
         'ENGINE': 'django.db.backends.sqlite3',
         'NAME': BASE_DIR / 'db.sqlite3',
-    }
+        # A file (not the in-memory default) so threaded tests see real SQLite locking
+        'TEST': {'NAME': BASE_DIR / 'test_db.sqlite3'},
+    },
 }
 
+# Read replica of 'default': set DATABASE_REPLICA_NAME to the path of a copy kept
+# up to date by replication. Without it there is no 'replica' alias, so no
+# command opens (and creates) a replica file. backend/test_settings.py adds one
+# for the routing tests.
+DATABASE_REPLICA_NAME = os.environ.get('DATABASE_REPLICA_NAME')
+if DATABASE_REPLICA_NAME:
+    DATABASES['replica'] = {
+        'ENGINE': 'django.db.backends.sqlite3',
+        'NAME': DATABASE_REPLICA_NAME,
+        'TEST': {'NAME': BASE_DIR / 'test_db_replica.sqlite3'},
+    }
+
+# Catalog and order-history reads go to these aliases (backend.routers); writes
+# and requests that must read their own writes stay on 'default'.
+DATABASE_ROUTERS = ['backend.routers.ReplicaRouter']
+DATABASE_REPLICAS = ['replica'] if DATABASE_REPLICA_NAME else []
+REPLICA_PIN_SECONDS = 5
+
 
 # Password validation
 # https://docs.djangoproject.com/en/5.2/ref/settings/#auth-password-validators
@@ -148,6 +172,83 @@ STATIC_URL = 'static/'
 MEDIA_URL = '/media/'
 MEDIA_ROOT = BASE_DIR / 'media'
 
+# Media serving (backend.media). Set SENDFILE to 'x-accel-redirect' behind nginx
+# (with an internal location at ACCEL_REDIRECT_PREFIX aliased to MEDIA_ROOT) or
+# 'x-sendfile' behind Apache/lighttpd to let the front-end server send the bytes.
+MEDIA_SERVING = {
+    'SENDFILE': None,
+    'ACCEL_REDIRECT_PREFIX': '/protected-media/',
+    'MAX_AGE': 3600,
+}
+
+# Product and category images are stored once per distinct content, under its
+# hash (products.storage); other uploads use the default storage.
+STORAGES = {
+    'default': {'BACKEND': 'django.core.files.storage.FileSystemStorage'},
+    'staticfiles': {'BACKEND': 'django.contrib.staticfiles.storage.StaticFilesStorage'},
+    'images': {'BACKEND': 'products.storage.ContentAddressedStorage'},
+}
+
+# Resized WebP copies of product and category images (products.images), made by
+# WORKERS background threads after each save and served as a srcset map.
+IMAGE_VARIANTS = {
+    'WIDTHS': (150, 300, 600, 1200),
+    'QUALITY': 80,
+    'WORKERS': 2,
+    'ASYNC': True,
+}
+
+# Catalog response cache (products.cache). 'lru' keeps entries in each worker
+# process; use 'django' to share entries and invalidations through CACHES.
+PRODUCTS_CACHE = {
+    'BACKEND': 'lru',
+    'TIMEOUT': 300,
+    'MAX_ENTRIES': 1024,
+}
+
+# Per-user wishlist id sets (accounts.wishlists). ALIAS names a CACHES alias that
+# every worker process shares (Redis, Memcached, database or file based), so a
+# change in one worker invalidates the set for all. Local-memory caches are
+# ignored; without a shared one the ids are read with one indexed query.
+WISHLIST_IDS_CACHE = {
+    'ALIAS': None,
+    'TIMEOUT': 300,
+}
+
+# SQLite tuning (backend.sqlite), applied to every new connection. See that
+# module for what each pragma buys; IMMEDIATE_WRITES makes write_transaction()
+# take the write lock at BEGIN. WAL is switched on by a migration instead.
+SQLITE_TUNING = {
+    'PRAGMAS': {
+        'synchronous': 'NORMAL',
+        'busy_timeout': 5000,
+        'cache_size': -64000,
+        'mmap_size': 268435456,
+        'temp_store': 'MEMORY',
+    },
+    'IMMEDIATE_WRITES': True,
+}
+
+# Per-request SQL counts and timings (backend.sql_instrumentation), reported as
+# a Server-Timing header and a 'backend.sql' log line. A query shape that runs
+# more than REPEAT_THRESHOLD times in one request is logged as a likely N+1,
+# or raised when RAISE is set (the test suites set it).
+SQL_INSTRUMENTATION = {
+    'ENABLED': True,
+    'REPEAT_THRESHOLD': 5,
+    'RAISE': False,
+    'SERVER_TIMING': True,
+}
+
+# Order tracking stream (accounts.tracking). POLL_INTERVAL bounds how late an
+# update saved by another process is delivered; HEARTBEAT keeps SSE alive.
+ORDER_TRACKING_STREAM = {
+    'POLL_INTERVAL': 1.0,
+    'HEARTBEAT': 15,
+    'LONG_POLL_TIMEOUT': 25,
+    'MAX_STREAM_SECONDS': 600,
+}
+
 # Default primary key field type
 # https://docs.djangoproject.com/en/5.2/ref/settings/#default-auto-field
 
@@ -164,6 +265,8 @@ REST_FRAMEWORK = {
     'DEFAULT_RENDERER_CLASSES': [
         'rest_framework.renderers.JSONRenderer',
     ],
+    # 503 + Retry-After when SQLite times out waiting for the write lock
+    'EXCEPTION_HANDLER': 'backend.sqlite.exception_handler',
 }
 
 # JWT Settings
@@ -174,3 +277,12 @@ SIMPLE_JWT = {
     'ROTATE_REFRESH_TOKENS': True,
     'BLACKLIST_AFTER_ROTATION': True,
 }
+
+# Minutes a checkout may hold stock while payment is pending before
+# `manage.py release_expired_reservations` returns it to the shelf.
+STOCK_RESERVATION_MINUTES = 15
+
+# Payment methods whose checkouts only hold stock until the order is marked
+# paid (payment_status='paid') or confirmed. List a method here only once a
+# payment integration confirms its orders; the rest commit stock at checkout.
+STOCK_HOLD_PAYMENT_METHODS = []
@@ -0,0 +1,167 @@
+"""
+Per-request SQL instrumentation.
+
+sql_instrumentation_middleware records every query a request runs, on every
+database alias, and reports:
+
+- a ``Server-Timing: db;dur=<ms>;desc="<n> queries"`` header, so the browser's
+  network panel shows time spent in SQL next to the total;
+- one ``backend.sql`` log line per request, with the counts in ``extra``;
+- SQL shapes (the query with its parameters left out) that ran more than
+  SQL_INSTRUMENTATION['REPEAT_THRESHOLD'] times. That is the signature of an
+  N+1 loop. They are logged as a warning, or raised as RepeatedQueries when
+  RAISE is set, which is what the test suites do.
+
+record() collects the same numbers for code outside a request, e.g. tests.
+"""
+import logging
+import re
+import time
+from collections import Counter
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from asgiref.sync import iscoroutinefunction
+from django.conf import settings
+from django.db.backends.signals import connection_created
+from django.dispatch import receiver
+from django.utils.decorators import sync_and_async_middleware
+
+logger = logging.getLogger('backend.sql')
+
+DEFAULTS = {
+    'ENABLED': True,
+    'REPEAT_THRESHOLD': 5,      # Times one SQL shape may run per request
+    'RAISE': False,             # Raise RepeatedQueries instead of logging a warning
+    'SERVER_TIMING': True,
+}
+
+_IN_LIST = re.compile(r'IN \((?:%s, )*%s\)')
+_SPACE = re.compile(r'\s+')
+
+
+class RepeatedQueries(Exception):
+    """The same SQL shape ran more times in one request than REPEAT_THRESHOLD allows."""
+
+
+def instrumentation_options():
+    return {**DEFAULTS, **getattr(settings, 'SQL_INSTRUMENTATION', {})}
+
+
+def fingerprint(sql):
+    """Return the shape of ``sql``: placeholders stay, and IN lists of any length look alike."""
+    return _SPACE.sub(' ', _IN_LIST.sub('IN (...)', sql)).strip()
+
+
+class QueryLog:
+    def __init__(self, parent=None):
+        self.count = 0
+        self.duration = 0.0
+        self.shapes = Counter()
+        self.parent = parent
+
+    def add(self, sql, duration):
+        self.count += 1
+        self.duration += duration
+        self.shapes[fingerprint(sql)] += 1
+        if self.parent is not None:
+            self.parent.add(sql, duration)
+
+    def repeated(self, threshold):
+        """Return ``{shape: times}`` for each shape that ran more than ``threshold`` times."""
+        return {shape: times for shape, times in self.shapes.items() if times > threshold}
+
+    def check(self, threshold):
+        """Raise RepeatedQueries if any shape ran more than ``threshold`` times."""
+        repeated = self.repeated(threshold)
+        if repeated:
+            shape, times = max(repeated.items(), key=lambda item: item[1])
+            raise RepeatedQueries(f'{times} queries of the same shape (limit {threshold}): {shape}')
+
+
+_current = ContextVar('sql_query_log', default=None)
+
+
+def _record_query(execute, sql, params, many, context):
+    log = _current.get()
+    if log is None:
+        return execute(sql, params, many, context)
+    started = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        log.add(sql, time.perf_counter() - started)
+
+
+@receiver(connection_created)
+def instrument_connection(sender, connection, **kwargs):
+    # The wrapper list outlives reconnects, so add ours once
+    if _record_query not in connection.execute_wrappers:
+        connection.execute_wrappers.append(_record_query)
+
+
+@contextmanager
+def record():
+    """
+    Collect the queries run inside the block into a QueryLog.
+
+    The log follows the context, so queries run through sync_to_async are
+    included too. Blocks nest: an enclosing record() also sees the queries.
+    """
+    log = QueryLog(parent=_current.get())
+    token = _current.set(log)
+    try:
+        yield log
+    finally:
+        _current.reset(token)
+
+
+def _report(request, response, log, options):
+    duration_ms = round(log.duration * 1000, 2)
+    if options['SERVER_TIMING']:
+        timing = f'db;dur={duration_ms};desc="{log.count} queries"'
+        existing = response.headers.get('Server-Timing')
+        response.headers['Server-Timing'] = f'{existing}, {timing}' if existing else timing
+
+    repeated = log.repeated(options['REPEAT_THRESHOLD'])
+    logger.info(
+        '%s %s: %d queries in %.2f ms', request.method, request.path, log.count, duration_ms,
+        extra={
+            'method': request.method,
+            'path': request.path,
+            'status': response.status_code,
+            'sql_queries': log.count,
+            'sql_ms': duration_ms,
+            'sql_repeated': repeated,
+        },
+    )
+    if repeated:
+        if options['RAISE']:
+            log.check(options['REPEAT_THRESHOLD'])
+        for shape, times in repeated.items():
+            logger.warning(
+                'Possible N+1 in %s %s: %d queries of the same shape: %s', request.method, request.path, times, shape,
+                extra={'path': request.path, 'sql_shape': shape, 'sql_times': times},
+            )
+    return response
+
+
+@sync_and_async_middleware
+def sql_instrumentation_middleware(get_response):
+    if iscoroutinefunction(get_response):
+        async def middleware(request):
+            options = instrumentation_options()
+            if not options['ENABLED']:
+                return await get_response(request)
+            with record() as log:
+                response = await get_response(request)
+            return _report(request, response, log, options)
+    else:
+        def middleware(request):
+            options = instrumentation_options()
+            if not options['ENABLED']:
+                return get_response(request)
+            with record() as log:
+                response = get_response(request)
+            return _report(request, response, log, options)
+    return middleware
@@ -0,0 +1,107 @@
+"""
+SQLite tuning for serving concurrent requests.
+
+Every new SQLite connection gets the pragmas in SQLITE_TUNING['PRAGMAS']:
+busy_timeout makes a blocked writer wait instead of failing with "database is
+locked", and the cache/mmap sizes keep hot pages in memory. WAL, which lets
+readers and the single writer proceed in parallel, is stored in the database
+file, so migration accounts.0009_sqlite_wal switches it on once instead;
+opening a database never rewrites it.
+
+write_transaction() is transaction.atomic() for blocks that will write. It
+opens the transaction with BEGIN IMMEDIATE, taking the write lock up front. A
+deferred transaction that reads first and writes later has to upgrade its lock
+mid-way. When another writer holds it, SQLite fails that upgrade at once
+without honouring busy_timeout, because waiting could deadlock.
+
+A write that still times out waiting for the lock is answered by
+exception_handler (REST_FRAMEWORK['EXCEPTION_HANDLER']) with 503 and
+Retry-After, so clients can tell it from a server error and try again.
+"""
+from contextlib import contextmanager
+
+from django.conf import settings
+from django.db import OperationalError, transaction
+from django.db.backends.signals import connection_created
+from django.dispatch import receiver
+from rest_framework.response import Response
+from rest_framework.views import exception_handler as default_exception_handler, set_rollback
+
+LOCKED_STATUS = 503
+RETRY_AFTER = 1     # Seconds
+
+DEFAULTS = {
+    'PRAGMAS': {
+        'synchronous': 'NORMAL',     # Durable in WAL mode except on power loss
+        'busy_timeout': 5000,        # Milliseconds
+        'cache_size': -64000,        # Negative means KiB, i.e. 64 MB per connection
+        'mmap_size': 268435456,      # 256 MB
+        'temp_store': 'MEMORY',
+    },
+    'IMMEDIATE_WRITES': True,
+}
+
+
+def tuning_options():
+    return {**DEFAULTS, **getattr(settings, 'SQLITE_TUNING', {})}
+
+
+@receiver(connection_created)
+def configure_connection(sender, connection, **kwargs):
+    if connection.vendor != 'sqlite':
+        return
+    pragmas = tuning_options()['PRAGMAS']
+    if connection.is_in_memory_db():
+        # mmap does not apply to in-memory databases
+        pragmas = {name: value for name, value in pragmas.items() if name != 'mmap_size'}
+    with connection.cursor() as cursor:
+        for name, value in pragmas.items():
+            cursor.execute(f'PRAGMA {name} = {value}')
+
+
+@contextmanager
+def write_transaction(using=None):
+    """
+    ``transaction.atomic()`` that starts with BEGIN IMMEDIATE on SQLite.
+
+    Nested inside another atomic block it is a plain savepoint, and on other
+    databases it is exactly ``transaction.atomic()``.
+    """
+    connection = transaction.get_connection(using)
+    immediate = (
+        connection.vendor == 'sqlite'
+        and not connection.in_atomic_block
+        and tuning_options()['IMMEDIATE_WRITES']
+    )
+    if not immediate:
+        with transaction.atomic(using=using):
+            yield
+        return
+
+    # Connecting resets transaction_mode from OPTIONS, so connect first
+    connection.ensure_connection()
+    previous = connection.transaction_mode
+    connection.transaction_mode = 'IMMEDIATE'
+    try:
+        with transaction.atomic(using=using):
+            connection.transaction_mode = previous
+            yield
+    finally:
+        connection.transaction_mode = previous
+
+
+def is_lock_timeout(exc):
+    """Whether ``exc`` is SQLite giving up on a lock held by another connection."""
+    return isinstance(exc, OperationalError) and 'is locked' in str(exc)
+
+
+def exception_handler(exc, context):
+    """DRF exception handler that answers lock timeouts with 503 and Retry-After."""
+    if is_lock_timeout(exc):
+        set_rollback()
+        return Response(
+            {'error': 'The database is busy, please retry'},
+            status=LOCKED_STATUS,
+            headers={'Retry-After': str(RETRY_AFTER)},
+        )
+    return default_exception_handler(exc, context)
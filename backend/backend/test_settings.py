@@ -0,0 +1,18 @@
+"""
+Settings for the test suite: python manage.py test --settings=backend.test_settings
+
+The project settings plus a 'replica' alias, which the routing tests in
+accounts.tests need; without it they are skipped.
+"""
+from .settings import *  # noqa: F401,F403
+from .settings import BASE_DIR, DATABASES
+
+# A new dict, so importing this module (test discovery does) leaves the project settings alone
+DATABASES = {
+    **DATABASES,
+    'replica': {
+        'ENGINE': 'django.db.backends.sqlite3',
+        'NAME': BASE_DIR / 'test_db_replica.sqlite3',
+        'TEST': {'NAME': BASE_DIR / 'test_db_replica.sqlite3'},
+    },
+}
@@ -6,13 +6,9 @@ class CategoryAdmin(admin.ModelAdmin):
     list_display = ['name', 'description', 'product_count', 'created_at']
     list_filter = ['created_at', 'updated_at']
     search_fields = ['name', 'description']
-    readonly_fields = ['created_at', 'updated_at']
+    readonly_fields = ['product_count', 'created_at', 'updated_at']
     ordering = ['name']
 
-    def product_count(self, obj):
-        return obj.products.count()
-    product_count.short_description = 'Products'
-
 @admin.register(Product)
 class ProductAdmin(admin.ModelAdmin):
     list_display = ['name', 'category', 'price', 'original_price', 'stock', 'rating', 'is_active', 'created_at']
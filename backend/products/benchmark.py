@@ -0,0 +1,86 @@
+import asyncio
+import itertools
+import statistics
+import time
+from urllib.parse import urlencode
+
+
+async def _request(application, path, query, host):
+    """Send one GET through ``application`` in-process and return its status code."""
+    scope = {
+        'type': 'http',
+        'asgi': {'version': '3.0'},
+        'http_version': '1.1',
+        'method': 'GET',
+        'scheme': 'http',
+        'path': path,
+        'raw_path': path.encode(),
+        'query_string': urlencode(query).encode(),
+        'headers': [(b'host', host.encode())],
+        'client': ('127.0.0.1', 0),
+        'server': (host, 80),
+    }
+    sent_body = False
+    status = None
+
+    async def receive():
+        nonlocal sent_body
+        if not sent_body:
+            sent_body = True
+            return {'type': 'http.request', 'body': b'', 'more_body': False}
+        # The client stays connected; Django cancels this wait once it has responded
+        await asyncio.Event().wait()
+
+    async def send(message):
+        nonlocal status
+        if message['type'] == 'http.response.start':
+            status = message['status']
+
+    await application(scope, receive, send)
+    return status
+
+
+def percentile(values, fraction):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+
+
+async def run_load(application, targets, requests, concurrency, host='localhost', bust_cache=False):
+    """
+    Drive ``application`` with ``requests`` GETs spread over ``targets``
+    (``(path, query)`` pairs) from ``concurrency`` concurrent clients.
+
+    Returns requests/sec, latency percentiles in milliseconds and the number
+    of non-2xx/304 responses. With ``bust_cache`` every request gets a unique
+    query parameter so the response cache never answers.
+    """
+    counter = itertools.count()
+    latencies = []
+    errors = 0
+
+    async def client():
+        nonlocal errors
+        while (n := next(counter)) < requests:
+            path, query = targets[n % len(targets)]
+            if bust_cache:
+                query = {**query, '_bench': n}
+            started = time.perf_counter()
+            status = await _request(application, path, query, host)
+            latencies.append(time.perf_counter() - started)
+            if status is None or not (200 <= status < 300 or status == 304):
+                errors += 1
+
+    started = time.perf_counter()
+    await asyncio.gather(*[client() for _ in range(concurrency)])
+    elapsed = time.perf_counter() - started
+
+    return {
+        'requests': requests,
+        'concurrency': concurrency,
+        'seconds': round(elapsed, 3),
+        'rps': round(requests / elapsed, 1),
+        'p50_ms': round(statistics.median(latencies) * 1000, 2),
+        'p99_ms': round(percentile(latencies, 0.99) * 1000, 2),
+        'max_ms': round(max(latencies) * 1000, 2),
+        'errors': errors,
+    }
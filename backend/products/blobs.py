@@ -0,0 +1,80 @@
+"""
+Reference counts for content-addressed images (products.storage).
+
+Each blob has a MediaBlob row that counts the model fields pointing at it.
+update_references() runs from post_save and post_delete, inside the same
+transaction as the change, so a rolled-back save leaves the counts as they
+were. A blob whose count reaches zero is deleted, together with its
+variants, once that transaction commits, unless something took a new
+reference in the meantime.
+
+collect() deletes the file while it holds the MediaBlob row locked, and
+ContentAddressedStorage.save() checks that the file exists under the same
+lock. Product and Category saves run in one write transaction, so the lock
+is held from that check until acquire() has counted the reference: a
+concurrent collect() either finishes first, and the upload is written
+again, or sees the new count and keeps the blob.
+
+An upload whose transaction rolls back leaves a blob with no row. Such
+blobs are deleted by ``manage.py dedupe_media --sweep``.
+"""
+from django.db import IntegrityError, transaction
+from django.db.models import F
+
+from backend.sqlite import write_transaction
+
+from . import images
+from .models import MediaBlob
+from .storage import file_fields, image_storage, stored_files
+
+
+def lock(name):
+    """Lock the MediaBlob row of ``name``, if there is one, until the surrounding transaction ends."""
+    return MediaBlob.objects.select_for_update().filter(name=name).first()
+
+
+def acquire(name):
+    """Count one more reference to blob ``name``."""
+    with write_transaction():
+        blob = lock(name)
+        if not image_storage().exists(name):
+            raise FileNotFoundError(f'Blob {name} does not exist')
+        if blob is not None:
+            MediaBlob.objects.filter(pk=blob.pk).update(references=F('references') + 1)
+            return
+        try:
+            with transaction.atomic():
+                MediaBlob.objects.create(name=name, references=1)
+        except IntegrityError:
+            # Created by a concurrent upload of the same content
+            MediaBlob.objects.filter(name=name).update(references=F('references') + 1)
+
+
+def release(name):
+    """Count one reference to blob ``name`` less, and delete it after commit if none are left."""
+    MediaBlob.objects.filter(name=name, references__gt=0).update(references=F('references') - 1)
+    transaction.on_commit(lambda: collect(name))
+
+
+def collect(name):
+    """Delete blob ``name`` and its variants if no field references it."""
+    with write_transaction():
+        blob = lock(name)
+        if blob is None or blob.references:
+            return
+        MediaBlob.objects.filter(pk=blob.pk).delete()
+        image_storage().delete(name)
+        images.delete_variants(name)
+
+
+def update_references(instance, deleted=False, update_fields=None):
+    """Acquire the blobs ``instance`` now points at and release the ones it dropped."""
+    if update_fields is not None and not any(field.name in update_fields for field in file_fields(type(instance))):
+        return
+    old = getattr(instance, '_stored_files', set())
+    new = set() if deleted else stored_files(instance)
+    for name in new - old:
+        acquire(name)
+    for name in old - new:
+        release(name)
+    instance._stored_files = new
@@ -0,0 +1,291 @@
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+from functools import wraps
+from inspect import iscoroutinefunction
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import transaction
+from django.http import HttpResponse
+from django.utils.cache import get_conditional_response
+from django.utils.http import parse_http_date_safe
+
+DEFAULTS = {
+    'BACKEND': 'lru',       # 'lru' (per process) or 'django' (shared, via CACHES)
+    'ALIAS': 'default',     # CACHES alias used by the 'django' backend
+    'TIMEOUT': 300,
+    'MAX_ENTRIES': 1024,
+}
+
+# Tags used by the catalog views. Entries are stored under a key that embeds the
+# current version of each of their tags; bumping a tag's version makes every
+# entry carrying it unreachable, so invalidation never has to enumerate keys.
+PRODUCTS_TAG = 'products'
+CATEGORIES_TAG = 'categories'
+
+
+def product_tag(product_id):
+    return f'product:{product_id}'
+
+
+class LRUCacheBackend:
+    """Thread-safe in-process LRU cache with a per-entry TTL."""
+
+    def __init__(self, max_entries, timeout):
+        self.max_entries = max_entries
+        self.timeout = timeout
+        self._entries = OrderedDict()
+        self._versions = {}
+        self._bumped = {}
+        self._started = time.time()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            expires_at, value = entry
+            if expires_at < time.monotonic():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return value
+
+    def set(self, key, value):
+        with self._lock:
+            self._entries[key] = (time.monotonic() + self.timeout, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def get_versions(self, tags):
+        with self._lock:
+            return [self._versions.get(tag, 0) for tag in tags]
+
+    def get_validators(self, tags):
+        # Other processes' invalidations never reach this one, so validators also
+        # move on every TIMEOUT window: a worker that missed a change stops
+        # answering 304 no later than its cached bodies expire
+        now = time.time()
+        window_start = now - now % self.timeout
+        with self._lock:
+            versions = [self._versions.get(tag, 0) for tag in tags]
+            bumped = [self._bumped.get(tag, self._started) for tag in tags]
+        return (versions, bumped, window_start), max(*bumped, window_start)
+
+    # Entries live in process memory and the lock is only held for dict
+    # operations, so the async API can run straight on the event loop
+    async def aget(self, key):
+        return self.get(key)
+
+    async def aset(self, key, value):
+        self.set(key, value)
+
+    async def aget_versions(self, tags):
+        return self.get_versions(tags)
+
+    def bump(self, tags):
+        now = time.time()
+        with self._lock:
+            for tag in tags:
+                self._versions[tag] = self._versions.get(tag, 0) + 1
+                self._bumped[tag] = now
+
+    def clear(self):
+        # Versions stay, so validators handed out before the clear cannot match again
+        with self._lock:
+            self._entries.clear()
+
+
+class DjangoCacheBackend:
+    """Stores entries and tag versions in a Django cache so all workers share them."""
+
+    prefix = 'products-cache'
+
+    def __init__(self, alias, timeout):
+        self.cache = caches[alias]
+        self.timeout = timeout
+
+    def _tag_key(self, tag):
+        return f'{self.prefix}:tag:{tag}'
+
+    def _bumped_key(self, tag):
+        return f'{self.prefix}:bumped:{tag}'
+
+    def get(self, key):
+        return self.cache.get(f'{self.prefix}:{key}')
+
+    def set(self, key, value):
+        self.cache.set(f'{self.prefix}:{key}', value, self.timeout)
+
+    def get_versions(self, tags):
+        keys = [self._tag_key(tag) for tag in tags]
+        found = self.cache.get_many(keys)
+        return [found.get(key, 0) for key in keys]
+
+    def get_validators(self, tags):
+        keys = [self._tag_key(tag) for tag in tags]
+        bumped_keys = [self._bumped_key(tag) for tag in tags]
+        found = self.cache.get_many(keys + bumped_keys)
+        for key in bumped_keys:
+            if key not in found:
+                # Never bumped, or evicted: from now on that is when it last changed
+                self.cache.add(key, time.time(), None)
+                found[key] = self.cache.get(key, time.time())
+        bumped = [found[key] for key in bumped_keys]
+        return ([found.get(key, 0) for key in keys], bumped), max(bumped)
+
+    async def aget(self, key):
+        return await self.cache.aget(f'{self.prefix}:{key}')
+
+    async def aset(self, key, value):
+        await self.cache.aset(f'{self.prefix}:{key}', value, self.timeout)
+
+    async def aget_versions(self, tags):
+        keys = [self._tag_key(tag) for tag in tags]
+        found = await self.cache.aget_many(keys)
+        return [found.get(key, 0) for key in keys]
+
+    def bump(self, tags):
+        for tag in tags:
+            key = self._tag_key(tag)
+            # Versions never expire; an evicted version restarts at a fresh value
+            if not self.cache.add(key, 1, None):
+                try:
+                    self.cache.incr(key)
+                except ValueError:
+                    self.cache.set(key, int(time.time()), None)
+            self.cache.set(self._bumped_key(tag), time.time(), None)
+
+    def clear(self):
+        self.cache.clear()
+
+
+_backend = None
+_backend_lock = threading.Lock()
+
+
+def get_backend():
+    global _backend
+    if _backend is None:
+        with _backend_lock:
+            if _backend is None:
+                options = {**DEFAULTS, **getattr(settings, 'PRODUCTS_CACHE', {})}
+                if options['BACKEND'] == 'django':
+                    _backend = DjangoCacheBackend(options['ALIAS'], options['TIMEOUT'])
+                elif options['BACKEND'] == 'lru':
+                    _backend = LRUCacheBackend(options['MAX_ENTRIES'], options['TIMEOUT'])
+                else:
+                    raise ValueError(f"Unknown PRODUCTS_CACHE backend: {options['BACKEND']}")
+    return _backend
+
+
+def reset_backend():
+    """Forget the configured backend (used by tests and settings changes)."""
+    global _backend
+    with _backend_lock:
+        _backend = None
+
+
+def tag_validators(tags):
+    """
+    Return ``(token, last_changed)`` for ``tags``: a value that changes whenever
+    one of them is invalidated, and the Unix time that last happened.
+
+    Nothing is read from the database, so views whose every change goes
+    through invalidate() can answer conditional GETs for free.
+    """
+    return get_backend().get_validators(tags)
+
+
+def invalidate(*tags):
+    """
+    Evict every cached response carrying one of ``tags``.
+
+    The bump happens immediately and again once the surrounding transaction
+    commits, so a request that re-caches old rows in between is evicted too.
+    """
+    get_backend().bump(tags)
+    if not transaction.get_autocommit():
+        transaction.on_commit(lambda: get_backend().bump(tags))
+
+
+def _key_for(request, tags, versions):
+    query = sorted(request.GET.lists())
+    raw = f'{request.scheme}://{request.get_host()}{request.path}?{query}|{list(zip(tags, versions))}'
+    return hashlib.sha256(raw.encode()).hexdigest()
+
+
+def _build_key(request, tags):
+    return _key_for(request, tags, get_backend().get_versions(tags))
+
+
+async def _abuild_key(request, tags):
+    return _key_for(request, tags, await get_backend().aget_versions(tags))
+
+
+def _cached_response(request, entry):
+    content, etag, last_modified = entry
+    response = HttpResponse(content, content_type='application/json')
+    if etag:
+        response.headers['ETag'] = etag
+    if last_modified:
+        response.headers['Last-Modified'] = last_modified
+    return get_conditional_response(
+        request, etag=etag, last_modified=parse_http_date_safe(last_modified), response=response,
+    )
+
+
+def _entry_for(response):
+    return response.content, response.get('ETag'), response.get('Last-Modified')
+
+
+def cache_response(get_tags):
+    """
+    Cache successful JSON responses of a GET view.
+
+    ``get_tags(request, *args, **kwargs)`` returns the tags the response depends
+    on. The key covers scheme, host (absolute image URLs embed it), path and
+    every query parameter. ETag and Last-Modified headers are stored with the
+    body so hits can still answer conditional requests with 304. Async views
+    get an async wrapper that uses the backend's async API.
+    """
+    def decorator(view_func):
+        if iscoroutinefunction(view_func):
+            @wraps(view_func)
+            async def async_wrapper(request, *args, **kwargs):
+                if request.method != 'GET':
+                    return await view_func(request, *args, **kwargs)
+
+                key = await _abuild_key(request, get_tags(request, *args, **kwargs))
+                backend = get_backend()
+                entry = await backend.aget(key)
+                if entry is not None:
+                    return _cached_response(request, entry)
+
+                response = await view_func(request, *args, **kwargs)
+                if response.status_code == 200:
+                    await backend.aset(key, _entry_for(response))
+                return response
+            return async_wrapper
+
+        @wraps(view_func)
+        def wrapper(request, *args, **kwargs):
+            if request.method != 'GET':
+                return view_func(request, *args, **kwargs)
+
+            key = _build_key(request, get_tags(request, *args, **kwargs))
+            backend = get_backend()
+            entry = backend.get(key)
+            if entry is not None:
+                return _cached_response(request, entry)
+
+            response = view_func(request, *args, **kwargs)
+            if response.status_code == 200:
+                backend.set(key, _entry_for(response))
+            return response
+        return wrapper
+    return decorator
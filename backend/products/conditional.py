@@ -0,0 +1,84 @@
+import hashlib
+from datetime import datetime, timezone
+from functools import wraps
+from inspect import iscoroutinefunction
+
+from asgiref.sync import sync_to_async
+from django.views.decorators.http import condition
+
+from .cache import CATEGORIES_TAG, PRODUCTS_TAG, tag_validators
+from .models import Product
+
+
+def conditional_view(get_validators):
+    """
+    Answer conditional GETs with 304 before the view runs.
+
+    ``get_validators(request, *args, **kwargs)`` returns a tuple of values that
+    change whenever the response would, plus the latest modification datetime,
+    as ``(parts, last_modified)``; or None when the resource does not exist.
+    It is evaluated once per request and drives both the strong ETag and the
+    Last-Modified header through Django's ``condition`` decorator.
+    """
+    def validators(request, *args, **kwargs):
+        if not hasattr(request, '_conditional_validators'):
+            request._conditional_validators = get_validators(request, *args, **kwargs)
+        return request._conditional_validators
+
+    def etag_func(request, *args, **kwargs):
+        result = validators(request, *args, **kwargs)
+        if result is None:
+            return None
+        parts, _ = result
+        return hashlib.sha256(repr(parts).encode()).hexdigest()[:32]
+
+    def last_modified_func(request, *args, **kwargs):
+        result = validators(request, *args, **kwargs)
+        return result[1] if result else None
+
+    def decorator(view_func):
+        wrapped = condition(etag_func=etag_func, last_modified_func=last_modified_func)(view_func)
+        if not iscoroutinefunction(view_func):
+            return wrapped
+
+        # ``condition`` calls the validator functions synchronously, so for
+        # async views they are computed in a thread first and memoized
+        @wraps(view_func)
+        async def inner(request, *args, **kwargs):
+            if not hasattr(request, '_conditional_validators'):
+                request._conditional_validators = await sync_to_async(get_validators)(request, *args, **kwargs)
+            return await wrapped(request, *args, **kwargs)
+        return inner
+
+    return decorator
+
+
+def _latest(*timestamps):
+    timestamps = [ts for ts in timestamps if ts is not None]
+    return max(timestamps) if timestamps else None
+
+
+def _catalog_validators(request, resource):
+    # Every change to products and categories invalidates these tags (the response
+    # cache depends on that too), so their versions stand in for the rows. An
+    # aggregate over the table would cost a full scan on every list request.
+    token, last_changed = tag_validators([PRODUCTS_TAG, CATEGORIES_TAG])
+    # Absolute image URLs embed the host, so it is part of the representation
+    parts = (request.get_host(), resource, request.GET.urlencode(), token)
+    return parts, datetime.fromtimestamp(last_changed, tz=timezone.utc)
+
+
+def product_list_validators(request):
+    return _catalog_validators(request, 'products')
+
+
+def product_detail_validators(request, product_id):
+    row = Product.objects.filter(id=product_id, is_active=True).values('updated_at', 'category__updated_at').first()
+    if row is None:
+        return None
+    parts = (request.get_host(), product_id, row['updated_at'], row['category__updated_at'])
+    return parts, _latest(row['updated_at'], row['category__updated_at'])
+
+
+def category_list_validators(request):
+    return _catalog_validators(request, 'categories')
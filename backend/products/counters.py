@@ -0,0 +1,61 @@
+from django.db.models import Count, F, OuterRef, Subquery, Sum
+from django.db.models.functions import Coalesce, Greatest
+
+from .cache import CATEGORIES_TAG, invalidate
+from .models import Category, Product
+
+
+def adjust_product_count(category_id, delta):
+    """Atomically shift a category's active product counter by ``delta``, never below zero."""
+    if category_id is None or delta == 0:
+        return
+    # A counter that missed increments (e.g. bulk_create) would otherwise underflow the unsigned column;
+    # reconcile_product_counts() corrects it
+    Category.objects.filter(id=category_id).update(product_count=Greatest(F('product_count') + delta, 0))
+
+
+def _categories(category_id):
+    return Category.objects.all() if category_id is None else Category.objects.filter(id=category_id)
+
+
+def active_product_count(category_id=None):
+    """Number of active products, overall or in one category, summed from the counters."""
+    return _categories(category_id).aggregate(n=Coalesce(Sum('product_count'), 0))['n']
+
+
+async def aactive_product_count(category_id=None):
+    """Async version of active_product_count."""
+    return (await _categories(category_id).aaggregate(n=Coalesce(Sum('product_count'), 0)))['n']
+
+
+def product_saved(product, created):
+    """Move the product's contribution between categories after a save."""
+    old_category_id, old_active = (None, False) if created else getattr(product, '_counted_state', (None, False))
+    new_category_id, new_active = product.category_id, product.is_active
+
+    if (old_category_id, old_active) != (new_category_id, new_active):
+        if old_active:
+            adjust_product_count(old_category_id, -1)
+        if new_active:
+            adjust_product_count(new_category_id, 1)
+    product._counted_state = (new_category_id, new_active)
+
+
+def product_deleted(product):
+    category_id, active = getattr(product, '_counted_state', (product.category_id, product.is_active))
+    if active:
+        adjust_product_count(category_id, -1)
+
+
+def reconcile_product_counts():
+    """Recompute every category's counter from the product table. Returns the number of rows fixed."""
+    active = (
+        Product.objects.filter(category=OuterRef('pk'), is_active=True)
+        .order_by().values('category').annotate(n=Count('id')).values('n')
+    )
+    actual = Coalesce(Subquery(active), 0)
+    stale = Category.objects.annotate(actual=actual).exclude(product_count=F('actual'))
+    fixed = Category.objects.filter(id__in=stale.values('id')).update(product_count=actual)
+    if fixed:
+        invalidate(CATEGORIES_TAG)
+    return fixed
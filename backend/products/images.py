@@ -0,0 +1,205 @@
+"""
+Responsive image variants.
+
+When a Product or Category is saved with an image that has no variants yet
+(Product.image, a Product.images entry or Category.image), a job is queued
+on a small thread pool once the transaction commits. The job writes a WebP
+copy of the image at each width in IMAGE_VARIANTS['WIDTHS'] that the
+original is wide enough for, under ``variants/`` in the image storage
+(products.storage.image_storage), and records them in the row's
+``image_variants`` map:
+
+    {'products/shoe.jpg': {'150': 'variants/products/shoe.150w.webp', ...}}
+
+srcset() turns one entry of that map into ``{'150w': url, ...}`` for the
+API, so clients can download the smallest file that fills the box they
+render. Until the job has run the map is empty and clients fall back to the
+original image.
+
+Pillow releases the GIL while it decodes, resizes and encodes, so worker
+threads keep this work off the request path without a separate queue.
+"""
+import io
+import logging
+import posixpath
+import re
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.db import connection, transaction
+from django.utils import timezone
+from PIL import ExifTags, Image, ImageOps
+
+from backend.routers import use_primary
+from backend.sqlite import write_transaction
+
+from .cache import invalidate
+from .storage import image_storage
+
+logger = logging.getLogger(__name__)
+
+DEFAULTS = {
+    'WIDTHS': (150, 300, 600, 1200),
+    'QUALITY': 80,
+    'WORKERS': 2,
+    'ASYNC': True,      # False runs each job in the committing thread
+}
+
+VARIANT_DIR = 'variants'
+
+# EXIF orientations that rotate the image by 90 degrees one way or the other
+_TRANSPOSED = {5, 6, 7, 8}
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def variant_options():
+    return {**DEFAULTS, **getattr(settings, 'IMAGE_VARIANTS', {})}
+
+
+def storage_name(entry):
+    """The media storage name of an image reference, or None for URLs and other external references."""
+    if not isinstance(entry, str) or not entry:
+        return None
+    if entry.startswith(settings.MEDIA_URL):
+        return entry[len(settings.MEDIA_URL):]
+    if entry.startswith('/') or '://' in entry:
+        return None
+    return entry
+
+
+def image_sources(instance):
+    """Storage names of ``instance``'s images, the main image first."""
+    names = [instance.image.name] if instance.image else []
+    for entry in getattr(instance, 'images', None) or []:
+        name = storage_name(entry)
+        if name and name not in names:
+            names.append(name)
+    return names
+
+
+def variant_name(name, width):
+    return posixpath.join(VARIANT_DIR, f'{posixpath.splitext(name)[0]}.{width}w.webp')
+
+
+def delete_variants(name):
+    """Delete every stored variant of image ``name``."""
+    directory, stem = posixpath.split(posixpath.join(VARIANT_DIR, posixpath.splitext(name)[0]))
+    storage = image_storage()
+    try:
+        _, files = storage.listdir(directory)
+    except FileNotFoundError:
+        return
+    for filename in files:
+        if re.fullmatch(rf'{re.escape(stem)}\.\d+w\.webp', filename):
+            storage.delete(posixpath.join(directory, filename))
+
+
+def render_variants(name, options=None):
+    """
+    Write the WebP variants of image ``name`` and return ``{width: variant name}``.
+
+    Variants that are already stored are reused. Images narrower than every
+    configured width get a single variant at their own width; nothing is
+    upscaled.
+    """
+    options = options or variant_options()
+    storage = image_storage()
+    with storage.open(name) as f, Image.open(f) as image:
+        width, height = image.size
+        if image.getexif().get(ExifTags.Base.Orientation) in _TRANSPOSED:
+            width, height = height, width
+        widths = sorted({w for w in options['WIDTHS'] if w <= width} or {width}, reverse=True)
+        targets = {w: variant_name(name, w) for w in widths}
+        missing = [w for w in widths if not storage.exists(targets[w])]
+        if missing:
+            # JPEG can decode straight to a reduced size, which is most of the cost for large photos
+            scale = missing[0] / width
+            image.draft('RGB', (round(image.width * scale), round(image.height * scale)))
+            resized = ImageOps.exif_transpose(image)
+            if resized.mode not in ('RGB', 'RGBA'):
+                alpha = 'A' in resized.mode or 'transparency' in resized.info
+                resized = resized.convert('RGBA' if alpha else 'RGB')
+            # Largest first, each from the previous one, so only one resize reads the full image
+            for w in missing:
+                resized = resized.resize((w, max(1, round(resized.height * w / resized.width))), Image.LANCZOS)
+                buffer = io.BytesIO()
+                resized.save(buffer, 'WEBP', quality=options['QUALITY'], method=4)
+                targets[w] = storage.save(targets[w], ContentFile(buffer.getvalue()))
+    return {str(w): targets[w] for w in reversed(widths)}
+
+
+def generate(model, pk, tags=()):
+    """Render the variants row ``pk`` is missing and store its updated map."""
+    with use_primary():
+        instance = model.objects.filter(pk=pk).first()
+    if instance is None:
+        return
+    sources = image_sources(instance)
+    current = instance.image_variants or {}
+    if set(current) == set(sources):
+        return
+    variants = {name: current[name] for name in sources if name in current}
+    options = variant_options()
+    for name in sources:
+        if name in variants:
+            continue
+        try:
+            variants[name] = render_variants(name, options)
+        except (OSError, ValueError, Image.DecompressionBombError) as e:
+            # Recorded as empty so a broken or missing file is not retried on every save
+            logger.warning('Could not render variants of %s: %s', name, e)
+            variants[name] = {}
+
+    with write_transaction():
+        # A save that changed the images while this ran has queued its own job; let that one write.
+        # Other saves (a stock update, say) leave the images alone, so the variants still apply.
+        current = model.objects.filter(pk=pk).first()
+        if current is None or image_sources(current) != sources:
+            return
+        model.objects.filter(pk=pk).update(image_variants=variants, updated_at=timezone.now())
+    invalidate(*tags)
+
+
+def _run(job, *args):
+    try:
+        job(*args)
+    except Exception:
+        logger.exception('Image variant job failed')
+    finally:
+        connection.close()
+
+
+def _submit(job, *args):
+    options = variant_options()
+    if not options['ASYNC']:
+        job(*args)
+        return
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(max_workers=options['WORKERS'], thread_name_prefix='image-variants')
+    _executor.submit(_run, job, *args)
+
+
+def schedule(instance, *tags):
+    """
+    Queue variant generation for ``instance`` if the set of its images changed.
+
+    The job runs after the surrounding transaction commits, then bumps
+    ``tags`` so cached responses pick up the new variants.
+    """
+    if set(image_sources(instance)) == set(instance.image_variants or {}):
+        return
+    model, pk = type(instance), instance.pk
+    transaction.on_commit(lambda: _submit(generate, model, pk, tags), using=instance._state.db)
+
+
+def srcset(request, instance, entry):
+    """``{'<width>w': absolute URL}`` for the variants of image ``entry`` of ``instance``; empty until rendered."""
+    variants = (instance.image_variants or {}).get(storage_name(entry)) or {}
+    storage = image_storage()
+    return {f'{width}w': request.build_absolute_uri(storage.url(name)) for width, name in variants.items()}
@@ -0,0 +1,50 @@
+import asyncio
+import json
+
+from django.core.asgi import get_asgi_application
+from django.core.management.base import BaseCommand, CommandError
+
+from products.benchmark import run_load
+from products.models import Product
+
+
+class Command(BaseCommand):
+    help = 'Compare throughput and tail latency of the sync and async catalog views under ASGI'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--requests', type=int, default=2000, help='Requests per run (default 2000)')
+        parser.add_argument('--concurrency', type=int, default=100, help='Concurrent clients (default 100)')
+        parser.add_argument('--mode', choices=['sync', 'async', 'both'], default='both')
+        parser.add_argument('--bust-cache', action='store_true', help='Bypass the response cache on every request')
+        parser.add_argument('--host', default='localhost', help='Host header; must be in ALLOWED_HOSTS')
+        parser.add_argument('--json', action='store_true', help='Print results as JSON')
+
+    def handle(self, *args, **options):
+        product_id = Product.objects.filter(is_active=True).values_list('id', flat=True).first()
+        if product_id is None:
+            raise CommandError('No active products to benchmark; load some data first.')
+
+        application = get_asgi_application()
+        modes = ['sync', 'async'] if options['mode'] == 'both' else [options['mode']]
+        results = {}
+        for mode in modes:
+            prefix = '/api/products/' if mode == 'sync' else '/api/products/async/'
+            targets = [
+                (f'{prefix}products/', {}),
+                (f'{prefix}products/', {'limit': 20, 'offset': 20}),
+                (f'{prefix}products/{product_id}/', {}),
+                (f'{prefix}categories/', {}),
+            ]
+            results[mode] = asyncio.run(run_load(
+                application, targets, options['requests'], options['concurrency'],
+                host=options['host'], bust_cache=options['bust_cache'],
+            ))
+
+        if options['json']:
+            self.stdout.write(json.dumps(results, indent=2))
+            return
+        for mode, result in results.items():
+            self.stdout.write(
+                f"{mode:>5}: {result['rps']:>8} req/s  p50 {result['p50_ms']:>8} ms  "
+                f"p99 {result['p99_ms']:>8} ms  errors {result['errors']}"
+            )
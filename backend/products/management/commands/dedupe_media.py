@@ -0,0 +1,90 @@
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from backend.sqlite import write_transaction
+from products import images
+from products.blobs import collect
+from products.models import Category, MediaBlob, Product
+from products.storage import BLOB_DIR, image_storage, is_blob_name
+
+
+class Command(BaseCommand):
+    help = (
+        'Move product and category images into content-addressed storage, so identical files are stored '
+        'once, and count the references to each'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--delete-originals', action='store_true',
+                            help='Delete each moved file once no image field or Product.images entry uses it')
+        parser.add_argument('--sweep', action='store_true',
+                            help='Delete blobs that nothing references, e.g. from uploads that were rolled back')
+
+    def handle(self, *args, **options):
+        storage = image_storage()
+        moved = {}
+        rows = 0
+        for model in (Category, Product):
+            for instance in model.objects.exclude(image='').exclude(image__isnull=True).iterator(chunk_size=500):
+                name = instance.image.name
+                if is_blob_name(name):
+                    continue
+                # The blob is stored and counted in one transaction, as on upload (see products.blobs)
+                with write_transaction():
+                    if name not in moved:
+                        if storage.exists(name):
+                            with storage.open(name) as f:
+                                moved[name] = storage.save(name, f)
+                        else:
+                            self.stderr.write(f'{model.__name__} {instance.pk}: {name} does not exist')
+                            moved[name] = None
+                    if moved[name]:
+                        # The save signals count the reference and queue variants for the new name
+                        instance.image = moved[name]
+                        instance.save(update_fields=['image', 'updated_at'])
+                        rows += 1
+        blobs = {blob for blob in moved.values() if blob}
+        self.stdout.write(f'Moved {rows} images from {len(moved)} files into {len(blobs)} blobs')
+
+        if options['delete_originals']:
+            self.delete_originals(storage, [name for name, blob in moved.items() if blob])
+        if options['sweep']:
+            self.sweep(storage)
+
+    def delete_originals(self, storage, names):
+        in_use = {
+            images.storage_name(entry)
+            for entries in Product.objects.exclude(images=[]).values_list('images', flat=True).iterator()
+            for entry in entries or []
+        }
+        deleted = 0
+        for name in names:
+            if name not in in_use:
+                storage.delete(name)
+                images.delete_variants(name)
+                deleted += 1
+        self.stdout.write(f'Deleted {deleted} original files')
+
+    def sweep(self, storage):
+        # Anything newer may belong to an upload whose transaction is still open
+        cutoff = timezone.now() - timedelta(hours=1)
+        known = set(MediaBlob.objects.values_list('name', flat=True))
+        deleted = 0
+        try:
+            directories, _ = storage.listdir(BLOB_DIR)
+        except FileNotFoundError:
+            directories = []
+        for directory in directories:
+            for filename in storage.listdir(f'{BLOB_DIR}/{directory}')[1]:
+                name = f'{BLOB_DIR}/{directory}/{filename}'
+                if name not in known and storage.get_modified_time(name) < cutoff:
+                    storage.delete(name)
+                    images.delete_variants(name)
+                    deleted += 1
+        # Blobs whose last reference went away in a process that died before collecting them
+        for name in MediaBlob.objects.filter(references=0).values_list('name', flat=True):
+            collect(name)
+            deleted += 1
+        self.stdout.write(f'Swept {deleted} unreferenced blobs')
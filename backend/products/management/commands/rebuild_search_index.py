@@ -0,0 +1,17 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from products import search
+
+
+class Command(BaseCommand):
+    help = 'Rebuild the product full-text search index from the catalog'
+
+    def handle(self, *args, **options):
+        if not search.is_enabled():
+            self.stdout.write(self.style.WARNING('Full-text search is only available on SQLite; nothing to do.'))
+            return
+
+        with transaction.atomic():
+            search.rebuild_index()
+        self.stdout.write(self.style.SUCCESS('Search index rebuilt.'))
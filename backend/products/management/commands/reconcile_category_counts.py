@@ -0,0 +1,13 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from products.counters import reconcile_product_counts
+
+
+class Command(BaseCommand):
+    help = 'Recompute Category.product_count from the product table'
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            fixed = reconcile_product_counts()
+        self.stdout.write(self.style.SUCCESS(f'Reconciled product counts ({fixed} categories corrected).'))
@@ -0,0 +1,53 @@
+from django.db import migrations
+
+CREATE_SQL = [
+    """
+    CREATE VIRTUAL TABLE IF NOT EXISTS products_product_fts USING fts5(
+        name, description, category_name,
+        tokenize = 'unicode61 remove_diacritics 2',
+        prefix = '2 3'
+    )
+    """,
+    """
+    CREATE VIRTUAL TABLE IF NOT EXISTS products_product_trigram USING fts5(
+        name, category_name,
+        tokenize = 'trigram'
+    )
+    """,
+    """
+    INSERT INTO products_product_fts (rowid, name, description, category_name)
+    SELECT p.id, p.name, p.description, c.name
+    FROM products_product p JOIN products_category c ON c.id = p.category_id
+    """,
+    """
+    INSERT INTO products_product_trigram (rowid, name, category_name)
+    SELECT p.id, p.name, c.name
+    FROM products_product p JOIN products_category c ON c.id = p.category_id
+    """,
+]
+
+DROP_SQL = [
+    'DROP TABLE IF EXISTS products_product_fts',
+    'DROP TABLE IF EXISTS products_product_trigram',
+]
+
+
+def run_sql(statements):
+    def apply(apps, schema_editor):
+        # The full-text index relies on SQLite FTS5; other backends fall back to icontains
+        if schema_editor.connection.vendor != 'sqlite':
+            return
+        for statement in statements:
+            schema_editor.execute(statement)
+    return apply
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('products', '0002_alter_category_image_alter_product_image_and_more'),
+    ]
+
+    operations = [
+        migrations.RunPython(run_sql(CREATE_SQL), run_sql(DROP_SQL)),
+    ]
@@ -0,0 +1,31 @@
+# Generated by Django 5.2.18 on 2026-10-16 22:40
+
+from django.db import migrations, models
+from django.db.models import Count, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+
+def backfill_product_counts(apps, schema_editor):
+    Category = apps.get_model('products', 'Category')
+    Product = apps.get_model('products', 'Product')
+    active = (
+        Product.objects.filter(category=OuterRef('pk'), is_active=True)
+        .order_by().values('category').annotate(n=Count('id')).values('n')
+    )
+    Category.objects.update(product_count=Coalesce(Subquery(active), 0))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('products', '0003_product_search_index'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='category',
+            name='product_count',
+            field=models.PositiveIntegerField(default=0, editable=False, verbose_name='products'),
+        ),
+        migrations.RunPython(backfill_product_counts, migrations.RunPython.noop),
+    ]
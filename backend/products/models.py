@@ -1,9 +1,15 @@
 from django.db import models
 
+from backend.sqlite import write_transaction
+
+from .storage import image_storage, stored_files
+
 class Category(models.Model):
     name = models.CharField(max_length=100)
     description = models.TextField(blank=True)
-    image = models.ImageField(upload_to='categories/', blank=True, null=True)
+    image = models.ImageField(upload_to='categories/', storage=image_storage, blank=True, null=True)
+    image_variants = models.JSONField(default=dict, blank=True, editable=False)  # Resized WebP copies, see products.images
+    product_count = models.PositiveIntegerField('products', default=0, editable=False)  # Active products, kept in sync by signals
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
@@ -14,14 +20,34 @@ class Category(models.Model):
     def __str__(self):
         return self.name
 
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # The blobs this row references, so a save can release the ones it drops
+        instance._stored_files = stored_files(instance)
+        return instance
+
+    def save(self, *args, **kwargs):
+        # product_count is only ever changed with F() updates, and image_variants by the variant
+        # jobs; never write back a stale copy
+        if not self._state.adding and kwargs.get('update_fields') is None:
+            kwargs['update_fields'] = [
+                f.name for f in self._meta.concrete_fields
+                if not f.primary_key and f.name not in ('product_count', 'image_variants')
+            ]
+        # Storing an upload and counting its reference share one transaction (see products.blobs)
+        with write_transaction(using=kwargs.get('using')):
+            super().save(*args, **kwargs)
+
 class Product(models.Model):
     name = models.CharField(max_length=200)
     description = models.TextField()
     price = models.DecimalField(max_digits=10, decimal_places=2)
     original_price = models.DecimalField(max_digits=10, decimal_places=2, null=True, blank=True)
     category = models.ForeignKey(Category, on_delete=models.CASCADE, related_name='products')
-    image = models.ImageField(upload_to='products/', blank=True, null=True)
+    image = models.ImageField(upload_to='products/', storage=image_storage, blank=True, null=True)
     images = models.JSONField(default=list, blank=True, null=True)  # Array of additional image URLs or file paths
+    image_variants = models.JSONField(default=dict, blank=True, editable=False)  # Resized WebP copies, see products.images
     stock = models.PositiveIntegerField(default=0)
     is_active = models.BooleanField(default=True)
     rating = models.DecimalField(max_digits=3, decimal_places=2, default=0.0)
@@ -31,12 +57,49 @@ class Product(models.Model):
 
     class Meta:
         ordering = ['-created_at']
+        indexes = [
+            # The storefront only lists active products, newest first (ties broken by id
+            # for keyset pagination); partial indexes leave inactive rows out entirely
+            models.Index(
+                fields=['-created_at', '-id'], condition=models.Q(is_active=True), name='product_active_recent_idx',
+            ),
+            models.Index(
+                fields=['category', '-created_at', '-id'], condition=models.Q(is_active=True),
+                name='product_active_category_idx',
+            ),
+        ]
 
     def __str__(self):
         return self.name
 
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # Remember what Category.product_count currently reflects for this row
+        if 'category_id' in instance.__dict__ and 'is_active' in instance.__dict__:
+            instance._counted_state = (instance.category_id, instance.is_active)
+        # Lets carts holding this product refresh their totals only when the price changes
+        if 'price' in instance.__dict__:
+            instance._loaded_price = instance.price
+        instance._stored_files = stored_files(instance)
+        return instance
+
+    def save(self, *args, **kwargs):
+        # Storing an upload and counting its reference share one transaction (see products.blobs)
+        with write_transaction(using=kwargs.get('using')):
+            super().save(*args, **kwargs)
+
     @property
     def discount_percentage(self):
         if self.original_price and self.original_price > self.price:
             return round(((self.original_price - self.price) / self.original_price) * 100)
         return 0
+
+class MediaBlob(models.Model):
+    """A file in content-addressed storage, and how many image fields point at it (see products.blobs)."""
+    name = models.CharField(max_length=100, unique=True)
+    references = models.PositiveIntegerField(default=0)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return self.name
@@ -0,0 +1,94 @@
+import base64
+from datetime import datetime
+
+from django.db.models import Q
+
+DEFAULT_LIMIT = 20
+MAX_LIMIT = 100
+
+
+def parse_limit(value, clamp=False):
+    """
+    Return the ``limit`` query value, DEFAULT_LIMIT if absent. Raises ValueError unless it is 1 to MAX_LIMIT.
+
+    With ``clamp`` a limit above MAX_LIMIT is lowered to it instead, for
+    older clients of offset pagination, which accepted any limit.
+    """
+    if value in (None, ''):
+        return DEFAULT_LIMIT
+    try:
+        limit = int(value)
+    except ValueError:
+        limit = 0
+    if clamp:
+        limit = min(limit, MAX_LIMIT)
+    if not 1 <= limit <= MAX_LIMIT:
+        raise ValueError(f'limit must be an integer from 1 to {MAX_LIMIT}')
+    return limit
+
+
+def parse_offset(value):
+    """Return the ``offset`` query value, 0 if absent. Raises ValueError unless it is a non-negative integer."""
+    if value in (None, ''):
+        return 0
+    try:
+        offset = int(value)
+    except ValueError:
+        offset = -1
+    if offset < 0:
+        raise ValueError('offset must be a non-negative integer')
+    return offset
+
+
+def encode_cursor(created_at, pk):
+    """Encode the (created_at, id) position of the last row on a page into an opaque token."""
+    raw = f"{created_at.isoformat()}|{pk}".encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip('=')
+
+
+def decode_cursor(cursor):
+    """Decode a cursor token back into (created_at, id). Raises ValueError if malformed."""
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        created_at, pk = base64.urlsafe_b64decode(padded.encode()).decode().split('|')
+        return datetime.fromisoformat(created_at), int(pk)
+    except (TypeError, UnicodeDecodeError, ValueError) as e:
+        raise ValueError('Invalid cursor') from e
+
+
+def _cursor_queryset(queryset, cursor, field):
+    queryset = queryset.order_by(f'-{field}', '-id')
+    if cursor:
+        value, pk = decode_cursor(cursor)
+        queryset = queryset.filter(
+            Q(**{f'{field}__lt': value}) | Q(**{field: value, 'id__lt': pk})
+        )
+    return queryset
+
+
+def _cursor_page(rows, limit, field):
+    if limit < 1:
+        raise ValueError('limit must be positive')
+    if len(rows) <= limit:
+        return rows, None
+
+    rows = rows[:limit]
+    last = rows[-1]
+    return rows, encode_cursor(getattr(last, field), last.pk)
+
+
+def paginate_by_cursor(queryset, cursor, limit, field='created_at'):
+    """
+    Keyset pagination over (-field, -id).
+
+    Returns (rows, next_cursor); next_cursor is None on the last page. Every page
+    is a single indexed range query, so cost does not grow with paging depth.
+    """
+    queryset = _cursor_queryset(queryset, cursor, field)
+    return _cursor_page(list(queryset[:limit + 1]), limit, field)
+
+
+async def apaginate_by_cursor(queryset, cursor, limit, field='created_at'):
+    """Async version of paginate_by_cursor."""
+    queryset = _cursor_queryset(queryset, cursor, field)
+    return _cursor_page([row async for row in queryset[:limit + 1].aiterator()], limit, field)
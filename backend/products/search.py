@@ -0,0 +1,183 @@
+import re
+
+from django.db import connection
+from django.db.models import Case, IntegerField, Q, When
+from django.db.models.expressions import RawSQL
+
+# Both tables are keyed by rowid = products_product.id so a single product can be
+# replaced or removed without scanning the index.
+FTS_TABLE = 'products_product_fts'
+TRIGRAM_TABLE = 'products_product_trigram'
+
+MAX_RESULTS = 500
+FUZZY_CANDIDATES = 200
+FUZZY_MIN_SIMILARITY = 0.3
+
+# bm25() weights for (name, description, category_name)
+COLUMN_WEIGHTS = (10.0, 1.0, 3.0)
+
+WORD_RE = re.compile(r'\w+', re.UNICODE)
+
+
+def is_enabled():
+    return connection.vendor == 'sqlite'
+
+
+def _words(text):
+    return WORD_RE.findall(text.lower())
+
+
+def _trigrams(text):
+    grams = set()
+    for word in _words(text):
+        word = f' {word} '
+        grams.update(word[i:i + 3] for i in range(len(word) - 2))
+    return grams
+
+
+def _similarity(a, b):
+    if not a or not b:
+        return 0.0
+    return len(a & b) / len(a | b)
+
+
+def index_product(product):
+    """Insert or replace the index rows for a single product."""
+    if not is_enabled():
+        return
+    category_name = product.category.name if product.category_id else ''
+    with connection.cursor() as cursor:
+        cursor.execute(f'DELETE FROM {FTS_TABLE} WHERE rowid = %s', [product.id])
+        cursor.execute(f'DELETE FROM {TRIGRAM_TABLE} WHERE rowid = %s', [product.id])
+        cursor.execute(
+            f'INSERT INTO {FTS_TABLE} (rowid, name, description, category_name) VALUES (%s, %s, %s, %s)',
+            [product.id, product.name, product.description, category_name],
+        )
+        cursor.execute(
+            f'INSERT INTO {TRIGRAM_TABLE} (rowid, name, category_name) VALUES (%s, %s, %s)',
+            [product.id, product.name, category_name],
+        )
+
+
+def unindex_product(product_id):
+    if not is_enabled():
+        return
+    with connection.cursor() as cursor:
+        cursor.execute(f'DELETE FROM {FTS_TABLE} WHERE rowid = %s', [product_id])
+        cursor.execute(f'DELETE FROM {TRIGRAM_TABLE} WHERE rowid = %s', [product_id])
+
+
+def reindex_category(category):
+    """Propagate a category rename to every product filed under it."""
+    if not is_enabled():
+        return
+    for table in (FTS_TABLE, TRIGRAM_TABLE):
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f'UPDATE {table} SET category_name = %s '
+                f'WHERE rowid IN (SELECT id FROM products_product WHERE category_id = %s)',
+                [category.name, category.id],
+            )
+
+
+def rebuild_index():
+    """Drop and repopulate both index tables from the catalog."""
+    if not is_enabled():
+        return
+    with connection.cursor() as cursor:
+        cursor.execute(f'DELETE FROM {FTS_TABLE}')
+        cursor.execute(f'DELETE FROM {TRIGRAM_TABLE}')
+        cursor.execute(
+            f'INSERT INTO {FTS_TABLE} (rowid, name, description, category_name) '
+            f'SELECT p.id, p.name, p.description, c.name FROM products_product p '
+            f'JOIN products_category c ON c.id = p.category_id'
+        )
+        cursor.execute(
+            f'INSERT INTO {TRIGRAM_TABLE} (rowid, name, category_name) '
+            f'SELECT p.id, p.name, c.name FROM products_product p '
+            f'JOIN products_category c ON c.id = p.category_id'
+        )
+        cursor.execute(f"INSERT INTO {FTS_TABLE}({FTS_TABLE}) VALUES ('optimize')")
+        cursor.execute(f"INSERT INTO {TRIGRAM_TABLE}({TRIGRAM_TABLE}) VALUES ('optimize')")
+
+
+def _restriction(queryset, table):
+    """SQL and params keeping the rows of ``table`` whose product is in ``queryset``: one key lookup per match."""
+    rows = queryset.order_by().filter(id=RawSQL(f'{table}.rowid', ())).values('id')
+    sql, params = rows.query.sql_with_params()
+    return f'EXISTS ({sql})', list(params)
+
+
+def _ranked_ids(query, queryset):
+    """Up to MAX_RESULTS ids of ``queryset`` matching ``query``, best match first."""
+    words = _words(query)
+    if not words:
+        return []
+    # Every word must match; each one is a prefix so partially typed queries work
+    match = ' AND '.join(f'"{word}"*' for word in words)
+    # Filtering inside the MATCH query keeps the cap from cutting off rows the filters would keep
+    restriction, params = _restriction(queryset, FTS_TABLE)
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f'SELECT rowid FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH %s AND {restriction} '
+            f'ORDER BY bm25({FTS_TABLE}, %s, %s, %s) LIMIT %s',
+            [match, *params, *COLUMN_WEIGHTS, MAX_RESULTS],
+        )
+        return [row[0] for row in cursor.fetchall()]
+
+
+def _fuzzy_ids(query, queryset):
+    query_grams = _trigrams(query)
+    # The trigram tokenizer only indexes the inside of words, so drop padded grams
+    match_grams = sorted(g for g in query_grams if ' ' not in g)
+    if not match_grams:
+        return []
+    match = ' OR '.join(f'"{gram}"' for gram in match_grams)
+    restriction, params = _restriction(queryset, TRIGRAM_TABLE)
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f'SELECT rowid, name, category_name FROM {TRIGRAM_TABLE} WHERE {TRIGRAM_TABLE} MATCH %s '
+            f'AND {restriction} ORDER BY rank LIMIT %s',
+            [match, *params, FUZZY_CANDIDATES],
+        )
+        candidates = cursor.fetchall()
+
+    scored = []
+    for product_id, name, category_name in candidates:
+        score = max(_similarity(query_grams, _trigrams(name)),
+                    _similarity(query_grams, _trigrams(category_name)))
+        if score >= FUZZY_MIN_SIMILARITY:
+            scored.append((score, product_id))
+    scored.sort(key=lambda pair: -pair[0])
+    return [product_id for _, product_id in scored[:MAX_RESULTS]]
+
+
+def search_ids(query, queryset):
+    """
+    Return up to MAX_RESULTS ids of ``queryset`` products matching ``query``, best match first.
+
+    Tries a ranked prefix search over name, description and category first and
+    falls back to trigram similarity on names when nothing matches (typos).
+    """
+    return _ranked_ids(query, queryset) or _fuzzy_ids(query, queryset)
+
+
+def search_products(queryset, query):
+    """
+    Restrict ``queryset`` to products matching ``query``, ordered by relevance.
+
+    Returns ``(queryset, total)``; the queryset holds at most MAX_RESULTS
+    products, and ``total`` is how many it holds, so paging by it ends where
+    the results do.
+    """
+    if not is_enabled():
+        queryset = queryset.filter(
+            Q(name__icontains=query) | Q(description__icontains=query) | Q(category__name__icontains=query)
+        )
+        return queryset, queryset.count()
+
+    ids = search_ids(query, queryset)
+    if not ids:
+        return queryset.none(), 0
+    ordering = Case(*[When(id=pk, then=pos) for pos, pk in enumerate(ids)], output_field=IntegerField())
+    return queryset.filter(id__in=ids).order_by(ordering), len(ids)
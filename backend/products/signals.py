@@ -0,0 +1,38 @@
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from . import blobs, counters, images, search
+from .cache import CATEGORIES_TAG, PRODUCTS_TAG, invalidate, product_tag
+from .models import Category, Product
+
+
+@receiver(post_save, sender=Product)
+def product_saved(sender, instance, created, update_fields, **kwargs):
+    counters.product_saved(instance, created)
+    blobs.update_references(instance, update_fields=update_fields)
+    search.index_product(instance)
+    invalidate(PRODUCTS_TAG, product_tag(instance.id))
+    images.schedule(instance, PRODUCTS_TAG, product_tag(instance.id))
+
+
+@receiver(post_delete, sender=Product)
+def product_deleted(sender, instance, **kwargs):
+    counters.product_deleted(instance)
+    blobs.update_references(instance, deleted=True)
+    search.unindex_product(instance.id)
+    invalidate(PRODUCTS_TAG, product_tag(instance.id))
+
+
+@receiver(post_save, sender=Category)
+def category_saved(sender, instance, created, update_fields, **kwargs):
+    blobs.update_references(instance, update_fields=update_fields)
+    if not created:
+        search.reindex_category(instance)
+    invalidate(CATEGORIES_TAG)
+    images.schedule(instance, CATEGORIES_TAG)
+
+
+@receiver(post_delete, sender=Category)
+def category_deleted(sender, instance, **kwargs):
+    blobs.update_references(instance, deleted=True)
+    invalidate(CATEGORIES_TAG)
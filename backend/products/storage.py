@@ -0,0 +1,116 @@
+"""
+Content-addressed storage for uploaded images.
+
+ContentAddressedStorage names each file it saves after the SHA-256 of its
+content: ``blobs/<first 2 hex digits>/<64 hex digits><extension>``.
+Identical uploads end up as one file whatever they were called, and a name
+never points at different bytes, so URLs of these files can be cached
+forever (see is_immutable). Upload filenames and ``upload_to`` are ignored,
+except for the resized variants that products.images stores next to them.
+
+Deleting a blob is left to products.blobs, which counts the model fields
+that point at each one; save() checks for an existing file under the same
+row lock that deletion takes.
+"""
+import hashlib
+import os
+import re
+import tempfile
+from functools import lru_cache
+
+from django.apps import apps
+from django.core.exceptions import SuspiciousFileOperation
+from django.core.files import File
+from django.core.files.storage import FileSystemStorage, storages
+from django.db.models import FileField
+
+from backend.sqlite import write_transaction
+
+BLOB_DIR = 'blobs'
+
+_BLOB_NAME = re.compile(rf'^{BLOB_DIR}/([0-9a-f]{{2}})/\1[0-9a-f]{{62}}(?:\.[a-z0-9]+)?$')
+# products.images.variant_name() drops the source's extension
+_VARIANT_NAME = re.compile(r'^variants/(.+)\.\d+w\.webp$')
+
+
+def image_storage():
+    """Storage of the model ImageFields; the 'images' alias in STORAGES."""
+    return storages['images']
+
+
+def is_blob_name(name):
+    """Whether ``name`` is a content-addressed name, whose content can never change."""
+    return bool(name) and _BLOB_NAME.match(name) is not None
+
+
+def is_immutable(name):
+    """Whether the file at ``name`` can be cached forever: a blob, or a variant of one (see products.images)."""
+    variant = _VARIANT_NAME.match(name)
+    return is_blob_name(variant.group(1) if variant else name)
+
+
+def stored_files(instance):
+    """Blob names held by the loaded file fields of ``instance``."""
+    names = set()
+    for field in file_fields(type(instance)):
+        if field.attname in instance.__dict__:
+            name = getattr(instance, field.attname).name
+            if is_blob_name(name):
+                names.add(name)
+    return names
+
+
+@lru_cache
+def file_fields(model):
+    """The file fields of ``model``."""
+    return [field for field in model._meta.concrete_fields if isinstance(field, FileField)]
+
+
+def blob_name(digest, filename):
+    extension = os.path.splitext(filename)[1].lower()
+    if not re.fullmatch(r'\.[a-z0-9]+', extension):
+        extension = ''
+    return f'{BLOB_DIR}/{digest[:2]}/{digest}{extension}'
+
+
+class ContentAddressedStorage(FileSystemStorage):
+    """A FileSystemStorage that stores each distinct file once, under the hash of its content."""
+
+    def save(self, name, content, max_length=None):
+        if name is None:
+            name = content.name
+        if not hasattr(content, 'chunks'):
+            content = File(content, name)
+        if _VARIANT_NAME.match(name):
+            # Variants (products.images) are named after their source image, so they keep the name given
+            self._write(name, content)
+            return name
+        digest = hashlib.sha256()
+        for chunk in content.chunks():
+            digest.update(chunk)
+        name = blob_name(digest.hexdigest(), name)
+        if max_length is not None and len(name) > max_length:
+            raise SuspiciousFileOperation(f'Storage can not fit "{name}" in {max_length} characters.')
+        # Under the blob's row lock, so products.blobs.collect() can not delete the file once it is found
+        with write_transaction():
+            apps.get_model('products', 'MediaBlob').objects.select_for_update().filter(name=name).first()
+            if not self.exists(name):
+                self._write(name, content)
+        return name
+
+    def _write(self, name, content):
+        path = self.path(name)
+        directory = os.path.dirname(path)
+        os.makedirs(directory, exist_ok=True)
+        fd, temp_path = tempfile.mkstemp(dir=directory, prefix='.upload-')
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                for chunk in content.chunks():
+                    f.write(chunk)
+            os.chmod(temp_path, self.file_permissions_mode or 0o644)
+            # Whoever writes the same blob concurrently writes the same bytes, so either rename may win
+            os.replace(temp_path, path)
+        except BaseException:
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+            raise
@@ -1,3 +1,883 @@
-from django.test import TestCase
+import os
+import tempfile
+import threading
+import time
+from datetime import timedelta
+from io import BytesIO, StringIO
+from unittest import mock
 
-# Create your tests here.
+from asgiref.sync import sync_to_async
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.db import connection
+from django.db.models import F
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from PIL import Image
+
+from backend.query_plans import explain, full_scans
+from backend.sql_instrumentation import fingerprint
+
+from . import blobs, images
+from .cache import PRODUCTS_TAG, get_backend, invalidate, reset_backend
+from .models import Category, MediaBlob, Product
+from .storage import image_storage, is_blob_name, is_immutable
+
+
+# Any request that runs one query shape more than REPEAT_THRESHOLD times fails the test
+@override_settings(SQL_INSTRUMENTATION={'RAISE': True})
+class CatalogTestCase(TestCase):
+    def setUp(self):
+        get_backend().clear()
+
+
+class ProductListCursorTests(CatalogTestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.category = Category.objects.create(name='Phones')
+        now = timezone.now()
+        for i in range(7):
+            product = Product.objects.create(
+                name=f'Phone {i}', description='A phone', price='100.00', category=cls.category,
+            )
+            # Two products share each timestamp so the id tiebreaker is exercised
+            Product.objects.filter(id=product.id).update(created_at=now - timedelta(minutes=i // 2))
+
+    def fetch_all(self, limit):
+        seen = []
+        cursor = ''
+        while True:
+            response = self.client.get('/api/products/products/', {'cursor': cursor, 'limit': limit})
+            self.assertEqual(response.status_code, 200)
+            data = response.json()
+            self.assertNotIn('total_count', data)
+            seen.extend(p['id'] for p in data['products'])
+            if not data['has_more']:
+                self.assertIsNone(data['next_cursor'])
+                return seen
+            cursor = data['next_cursor']
+
+    def test_cursor_pages_cover_catalog_once_in_order(self):
+        expected = list(Product.objects.order_by('-created_at', '-id').values_list('id', flat=True))
+        for limit in (1, 2, 3, 7, 10):
+            self.assertEqual(self.fetch_all(limit), expected)
+
+    def test_cursor_page_uses_constant_queries(self):
+        response = self.client.get('/api/products/products/', {'cursor': '', 'limit': 2})
+        cursor = response.json()['next_cursor']
+        with self.assertNumQueries(1):
+            self.client.get('/api/products/products/', {'cursor': cursor, 'limit': 2})
+
+    def test_invalid_cursor(self):
+        response = self.client.get('/api/products/products/', {'cursor': 'not-a-cursor'})
+        self.assertEqual(response.status_code, 400)
+
+    def test_limit_and_offset_are_bounded(self):
+        for url in ('/api/products/products/', '/api/products/async/products/'):
+            for params in ({'limit': 0}, {'limit': -1}, {'limit': 'x'}, {'offset': -5}):
+                for cursor in ({}, {'cursor': ''}):
+                    response = self.client.get(url, {**params, **cursor})
+                    self.assertEqual(response.status_code, 400, (url, params, cursor))
+            response = self.client.get(url, {'cursor': '', 'limit': 101})
+            self.assertEqual(response.status_code, 400, url)
+            response = self.client.get(url, {'cursor': '', 'limit': 100})
+            self.assertEqual(len(response.json()['products']), 7)
+
+    def test_offset_mode_clamps_large_limits(self):
+        for url in ('/api/products/products/', '/api/products/async/products/'):
+            with mock.patch('products.pagination.MAX_LIMIT', 5):
+                response = self.client.get(url, {'limit': 1000})
+            self.assertEqual(response.status_code, 200, url)
+            data = response.json()
+            self.assertEqual(len(data['products']), 5)
+            self.assertTrue(data['has_more'])
+
+    def test_offset_mode_unchanged(self):
+        response = self.client.get('/api/products/products/', {'limit': 5, 'offset': 5})
+        data = response.json()
+        self.assertEqual(data['total_count'], 7)
+        self.assertEqual(len(data['products']), 2)
+        self.assertFalse(data['has_more'])
+
+
+class ProductSearchTests(CatalogTestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.phones = Category.objects.create(name='Phones')
+        cls.shoes = Category.objects.create(name='Shoes')
+        cls.galaxy = Product.objects.create(
+            name='Samsung Galaxy S24', description='Flagship android phone', price='799.00', category=cls.phones,
+        )
+        cls.iphone = Product.objects.create(
+            name='iPhone 15 Pro', description='Titanium body, compared to the Galaxy', price='999.00',
+            category=cls.phones,
+        )
+        cls.nike = Product.objects.create(
+            name='Nike Air Max', description='Running shoes', price='120.00', category=cls.shoes,
+        )
+
+    def search(self, query):
+        response = self.client.get('/api/products/products/', {'search': query})
+        self.assertEqual(response.status_code, 200)
+        return [p['id'] for p in response.json()['products']]
+
+    def test_name_match_ranks_above_description_match(self):
+        self.assertEqual(self.search('galaxy'), [self.galaxy.id, self.iphone.id])
+
+    def test_prefix_match(self):
+        self.assertEqual(self.search('sams'), [self.galaxy.id])
+
+    def test_matches_category_name(self):
+        self.assertEqual(self.search('shoes'), [self.nike.id])
+
+    def test_fuzzy_fallback_for_typos(self):
+        self.assertEqual(self.search('samsng galxy'), [self.galaxy.id])
+
+    def test_index_follows_saves_and_deletes(self):
+        self.nike.name = 'Adidas Ultraboost'
+        self.nike.save()
+        self.assertEqual(self.search('nike'), [])
+        self.assertEqual(self.search('ultraboost'), [self.nike.id])
+
+        self.shoes.name = 'Footwear'
+        self.shoes.save()
+        self.assertEqual(self.search('footwear'), [self.nike.id])
+
+        self.nike.delete()
+        self.assertEqual(self.search('ultraboost'), [])
+
+    def test_inactive_products_are_excluded(self):
+        Product.objects.filter(id=self.galaxy.id).update(is_active=False)
+        self.assertEqual(self.search('samsung'), [])
+
+    def test_filters_apply_before_the_result_cap(self):
+        Product.objects.filter(id=self.galaxy.id).update(is_active=False)
+        with mock.patch('products.search.MAX_RESULTS', 1):
+            self.assertEqual(self.search('galaxy'), [self.iphone.id])
+
+    def test_last_page_within_the_cap_ends_the_listing(self):
+        with mock.patch('products.search.MAX_RESULTS', 1):
+            data = self.client.get('/api/products/products/', {'search': 'galaxy', 'limit': 1}).json()
+        self.assertEqual([p['id'] for p in data['products']], [self.galaxy.id])
+        self.assertEqual(data['total_count'], 1)
+        self.assertFalse(data['has_more'])
+
+    def test_cursor_with_search_is_rejected(self):
+        for url in ('/api/products/products/', '/api/products/async/products/'):
+            response = self.client.get(url, {'search': 'galaxy', 'cursor': ''})
+            self.assertEqual(response.status_code, 400)
+
+
+class CatalogCacheTests(CatalogTestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.category = Category.objects.create(name='Phones')
+        cls.phone = Product.objects.create(name='Pixel 8', description='Phone', price='599.00', category=cls.category)
+        cls.other = Product.objects.create(name='Pixel 7', description='Phone', price='399.00', category=cls.category)
+
+    def test_repeat_reads_skip_the_database(self):
+        for url in ('/api/products/products/', f'/api/products/products/{self.phone.id}/', '/api/products/categories/'):
+            first = self.client.get(url)
+            with self.assertNumQueries(0):
+                second = self.client.get(url)
+            self.assertEqual(first.json(), second.json())
+
+    def test_key_covers_query_parameters(self):
+        self.client.get('/api/products/products/', {'limit': 1})
+        response = self.client.get('/api/products/products/', {'limit': 2})
+        self.assertEqual(len(response.json()['products']), 2)
+
+    def test_product_save_evicts_only_dependent_entries(self):
+        self.client.get('/api/products/products/')
+        self.client.get(f'/api/products/products/{self.other.id}/')
+
+        self.phone.price = '499.00'
+        self.phone.save()
+
+        response = self.client.get('/api/products/products/')
+        prices = {p['id']: p['price'] for p in response.json()['products']}
+        self.assertEqual(prices[self.phone.id], 499.0)
+        with self.assertNumQueries(0):
+            self.client.get(f'/api/products/products/{self.other.id}/')
+
+    def test_category_save_evicts_details(self):
+        self.client.get(f'/api/products/products/{self.phone.id}/')
+        self.category.name = 'Smartphones'
+        self.category.save()
+        response = self.client.get(f'/api/products/products/{self.phone.id}/')
+        self.assertEqual(response.json()['product']['category']['name'], 'Smartphones')
+
+    def test_delete_evicts(self):
+        url = f'/api/products/products/{self.phone.id}/'
+        self.client.get(url)
+        self.phone.delete()
+        self.assertEqual(self.client.get(url).status_code, 404)
+
+    @override_settings(PRODUCTS_CACHE={'BACKEND': 'django'})
+    def test_django_cache_backend(self):
+        reset_backend()
+        self.addCleanup(reset_backend)
+        get_backend().clear()
+
+        url = f'/api/products/products/{self.phone.id}/'
+        self.client.get(url)
+        with self.assertNumQueries(0):
+            self.client.get(url)
+        self.phone.name = 'Pixel 8a'
+        self.phone.save()
+        self.assertEqual(self.client.get(url).json()['product']['name'], 'Pixel 8a')
+
+
+class ConditionalGetTests(CatalogTestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.category = Category.objects.create(name='Phones')
+        cls.phone = Product.objects.create(name='Pixel 8', description='Phone', price='599.00', category=cls.category)
+
+    def assertRevalidates(self, url):
+        first = self.client.get(url)
+        self.assertEqual(first.status_code, 200)
+        self.assertTrue(first['ETag'].startswith('"'))
+        self.assertIn('Last-Modified', first)
+
+        # Both with a cold and a warm response cache
+        for clear in (True, False):
+            if clear:
+                get_backend().clear()
+            response = self.client.get(url, HTTP_IF_NONE_MATCH=first['ETag'])
+            self.assertEqual(response.status_code, 304)
+            self.assertEqual(response.content, b'')
+        return first['ETag']
+
+    def test_catalog_endpoints_answer_304(self):
+        for url in ('/api/products/products/', f'/api/products/products/{self.phone.id}/', '/api/products/categories/'):
+            self.assertRevalidates(url)
+
+    def test_etag_changes_with_product(self):
+        url = f'/api/products/products/{self.phone.id}/'
+        etag = self.assertRevalidates(url)
+        self.phone.price = '549.00'
+        self.phone.save()
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], etag)
+
+    def test_etag_changes_when_product_deactivated(self):
+        etag = self.assertRevalidates('/api/products/categories/')
+        self.phone.is_active = False
+        self.phone.save()
+        response = self.client.get('/api/products/categories/', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+
+    def test_not_modified_skips_serialization(self):
+        url = '/api/products/products/'
+        etag = self.client.get(url)['ETag']
+        get_backend().clear()
+        with self.assertNumQueries(0):
+            self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+
+    def test_list_validators_expire_with_the_lru_window(self):
+        # Another worker's invalidation never reaches this one's versions
+        url = '/api/products/categories/'
+        etag = self.client.get(url)['ETag']
+        get_backend().clear()
+        with mock.patch('products.cache.time.time', return_value=time.time() + 300):
+            response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+
+    @override_settings(PRODUCTS_CACHE={'BACKEND': 'django'})
+    def test_list_validators_with_shared_backend(self):
+        reset_backend()
+        self.addCleanup(reset_backend)
+        url = '/api/products/products/'
+        etag = self.client.get(url)['ETag']
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 304)
+        self.phone.name = 'Pixel 8a'
+        self.phone.save()
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 200)
+
+
+class CategoryProductCountTests(CatalogTestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.phones = Category.objects.create(name='Phones')
+        cls.shoes = Category.objects.create(name='Shoes')
+
+    def counts(self):
+        return dict(Category.objects.values_list('name', 'product_count'))
+
+    def make_product(self, category, **kwargs):
+        return Product.objects.create(name='Item', description='Item', price='10.00', category=category, **kwargs)
+
+    def test_counter_follows_product_lifecycle(self):
+        product = self.make_product(self.phones)
+        self.make_product(self.phones, is_active=False)
+        self.assertEqual(self.counts(), {'Phones': 1, 'Shoes': 0})
+
+        product.category = self.shoes
+        product.save()
+        self.assertEqual(self.counts(), {'Phones': 0, 'Shoes': 1})
+
+        product.is_active = False
+        product.save()
+        self.assertEqual(self.counts(), {'Phones': 0, 'Shoes': 0})
+
+        product = Product.objects.get(id=product.id)
+        product.is_active = True
+        product.save()
+        self.assertEqual(self.counts(), {'Phones': 0, 'Shoes': 1})
+
+        product.delete()
+        self.assertEqual(self.counts(), {'Phones': 0, 'Shoes': 0})
+
+    def test_stale_category_save_keeps_counter(self):
+        category = Category.objects.get(id=self.phones.id)
+        self.make_product(self.phones)
+        category.name = 'Smartphones'
+        category.save()
+        self.assertEqual(Category.objects.get(id=self.phones.id).product_count, 1)
+
+    def test_category_list_is_one_query(self):
+        for _ in range(3):
+            self.make_product(self.phones)
+        Category.objects.create(name='Books')
+        with self.assertNumQueries(1):
+            response = self.client.get('/api/products/categories/')
+        counts = {c['name']: c['product_count'] for c in response.json()['categories']}
+        self.assertEqual(counts, {'Phones': 3, 'Shoes': 0, 'Books': 0})
+
+    def test_counter_does_not_go_below_zero(self):
+        # bulk_create skips signals, so the counter never saw this product
+        product, = Product.objects.bulk_create([
+            Product(name='Bulk', description='Bulk', price='1.00', category=self.phones),
+        ])
+        Product.objects.get(id=product.id).delete()
+        self.assertEqual(self.counts(), {'Phones': 0, 'Shoes': 0})
+
+    def test_reconcile_command(self):
+        self.make_product(self.phones)
+        # bulk_create skips signals, so these are not counted until reconciled
+        Product.objects.bulk_create([
+            Product(name='Bulk', description='Bulk', price='1.00', category=self.shoes) for _ in range(2)
+        ])
+        Category.objects.filter(id=self.phones.id).update(product_count=7)
+
+        out = StringIO()
+        call_command('reconcile_category_counts', stdout=out)
+        self.assertIn('2 categories corrected', out.getvalue())
+        self.assertEqual(self.counts(), {'Phones': 1, 'Shoes': 2})
+
+
+class AsyncCatalogViewTests(CatalogTestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.category = Category.objects.create(name='Phones')
+        cls.products = [
+            Product.objects.create(name=f'Phone {i}', description='A phone', price='100.00', category=cls.category)
+            for i in range(5)
+        ]
+
+    async def fetch(self, path, params=None, **headers):
+        sync = await sync_to_async(self.client.get)(f'/api/products/{path}', params, headers=headers)
+        get_backend().clear()
+        response = await self.async_client.get(f'/api/products/async/{path}', params, headers=headers)
+        return sync, response
+
+    async def test_responses_match_sync_views(self):
+        cases = [
+            ('products/', {}),
+            ('products/', {'limit': 2, 'offset': 1, 'category': self.category.id}),
+            ('products/', {'cursor': '', 'limit': 2}),
+            ('products/', {'search': 'phone'}),
+            (f'products/{self.products[0].id}/', {}),
+            ('categories/', {}),
+        ]
+        for path, params in cases:
+            with self.subTest(path=path, params=params):
+                get_backend().clear()
+                sync, response = await self.fetch(path, params)
+                self.assertEqual(response.status_code, 200)
+                self.assertEqual(response.json(), sync.json())
+                self.assertEqual(response['ETag'], sync['ETag'])
+
+    async def test_errors_match_sync_views(self):
+        for path, params in [('products/999999/', {}), ('products/', {'cursor': 'bogus'})]:
+            with self.subTest(path=path):
+                sync, response = await self.fetch(path, params)
+                self.assertEqual((response.status_code, response.json()), (sync.status_code, sync.json()))
+
+    async def test_cached_and_conditional(self):
+        first = await self.async_client.get('/api/products/async/products/')
+        # Without an invalidation the cached body is served even though the row changed
+        await Product.objects.filter(id=self.products[0].id).aupdate(name='Renamed')
+        again = await self.async_client.get('/api/products/async/products/')
+        self.assertEqual(again.content, first.content)
+        not_modified = await self.async_client.get(
+            '/api/products/async/products/', headers={'if-none-match': first['ETag']},
+        )
+        self.assertEqual(not_modified.status_code, 304)
+
+        await sync_to_async(invalidate)(PRODUCTS_TAG)
+        fresh = await self.async_client.get('/api/products/async/products/')
+        self.assertIn(b'Renamed', fresh.content)
+
+
+class ProductBatchTests(CatalogTestCase):
+    @classmethod
+    def setUpTestData(cls):
+        category = Category.objects.create(name='Phones')
+        cls.products = [
+            Product.objects.create(name=f'Phone {i}', description='Phone', price='10.00', category=category)
+            for i in range(3)
+        ]
+        cls.hidden = Product.objects.create(
+            name='Hidden', description='Phone', price='10.00', category=category, is_active=False,
+        )
+
+    def test_keeps_requested_order_and_reports_gaps(self):
+        a, b, c = self.products
+        ids = f'{c.id},{a.id},999999,{self.hidden.id},{b.id},{a.id}'
+        with self.assertNumQueries(1):
+            response = self.client.get('/api/products/batch/', {'ids': ids})
+        data = response.json()
+        self.assertEqual([p['id'] for p in data['products']], [c.id, a.id, b.id])
+        self.assertEqual(data['missing'], [999999])
+        self.assertEqual(data['inactive'], [self.hidden.id])
+
+    def test_rejects_bad_input(self):
+        self.assertEqual(self.client.get('/api/products/batch/').status_code, 400)
+        self.assertEqual(self.client.get('/api/products/batch/', {'ids': '1,x'}).status_code, 400)
+        too_many = ','.join(str(i) for i in range(1, 300))
+        self.assertEqual(self.client.get('/api/products/batch/', {'ids': too_many}).status_code, 400)
+
+
+class CatalogQueryPlanTests(CatalogTestCase):
+    """Every query behind the catalog views must use an index, not scan a table."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.categories = [Category.objects.create(name=name) for name in ('Phones', 'Laptops', 'Audio')]
+        products = []
+        for i in range(60):
+            products.append(Product.objects.create(
+                name=f'Gadget {i}', description='A gadget', price='10.00', stock=5,
+                category=cls.categories[i % 3], is_active=i % 5 != 0,
+            ))
+        cls.product = products[1]
+        # Plans depend on table statistics; without them SQLite guesses
+        with connection.cursor() as cursor:
+            cursor.execute('ANALYZE')
+
+    def assertNoFullScans(self, url, data=None, allow=()):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url, data)
+        self.assertEqual(response.status_code, 200, url)
+        self.assertEqual(full_scans(connection, queries.captured_queries, allow=allow), [], url)
+
+    def assertSortedByIndex(self, queryset, index):
+        plan = explain(connection, *queryset.query.sql_with_params())
+        self.assertTrue(any(step.startswith(('SEARCH', 'SCAN')) and index in step for step in plan), plan)
+        self.assertNotIn('USE TEMP B-TREE FOR ORDER BY', plan)
+
+    def test_views(self):
+        category = self.categories[0].id
+        for url, data in (
+            ('/api/products/products/', {}),
+            ('/api/products/products/', {'limit': 10, 'offset': 20}),
+            ('/api/products/products/', {'category': category}),
+            ('/api/products/products/', {'cursor': ''}),
+            ('/api/products/products/', {'cursor': '', 'category': category}),
+            ('/api/products/products/', {'search': 'gadget 7'}),
+            (f'/api/products/products/{self.product.id}/', {}),
+            ('/api/products/batch/', {'ids': f'{self.product.id},999999'}),
+        ):
+            get_backend().clear()
+            # Totals add up the counters of every (few) category
+            self.assertNoFullScans(url, data, allow={'products_category'})
+        # The category list is meant to read the whole (small) table
+        self.assertNoFullScans('/api/products/categories/', allow={'products_category'})
+
+    def test_storefront_lists_are_read_in_index_order(self):
+        active = Product.objects.filter(is_active=True)
+        self.assertSortedByIndex(active, 'product_active_recent_idx')
+        self.assertSortedByIndex(active.order_by('-created_at', '-id'), 'product_active_recent_idx')
+        self.assertSortedByIndex(
+            active.filter(category=self.categories[0]).order_by('-created_at', '-id'), 'product_active_category_idx',
+        )
+
+
+class SQLInstrumentationTests(CatalogTestCase):
+    @classmethod
+    def setUpTestData(cls):
+        for i in range(8):
+            category = Category.objects.create(name=f'Category {i}')
+            Product.objects.create(name=f'Gadget {i}', description='A gadget', price='10.00', category=category)
+
+    def test_catalog_views_report_queries(self):
+        for url in ('/api/products/products/', '/api/products/categories/', '/api/products/async/products/'):
+            with self.assertLogs('backend.sql', 'INFO') as logs:
+                response = self.client.get(url)
+            self.assertEqual(response.status_code, 200, url)
+            record = logs.records[0]
+            self.assertGreater(record.sql_queries, 0)
+            self.assertEqual(record.sql_repeated, {})
+            self.assertEqual(
+                response.headers['Server-Timing'], f'db;dur={record.sql_ms};desc="{record.sql_queries} queries"',
+            )
+
+    def test_fingerprint_ignores_in_list_length(self):
+        self.assertEqual(
+            fingerprint('SELECT * FROM t WHERE id IN (%s, %s)\n  LIMIT 21'),
+            fingerprint('SELECT * FROM t WHERE id IN (%s) LIMIT 21'),
+        )
+
+    @override_settings(SQL_INSTRUMENTATION={'ENABLED': False})
+    def test_disabled(self):
+        self.assertNotIn('Server-Timing', self.client.get('/api/products/categories/').headers)
+
+
+def png(name, width, height, color='red'):
+    buffer = BytesIO()
+    Image.new('RGB', (width, height), color).save(buffer, 'PNG')
+    return SimpleUploadedFile(name, buffer.getvalue(), content_type='image/png')
+
+
+@override_settings(IMAGE_VARIANTS={'WIDTHS': (150, 300), 'ASYNC': False})
+class ImageVariantTests(CatalogTestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.category = Category.objects.create(name='Phones')
+
+    def setUp(self):
+        super().setUp()
+        media_root = self.enterContext(tempfile.TemporaryDirectory())
+        self.enterContext(override_settings(MEDIA_ROOT=media_root))
+
+    def create_product(self, **kwargs):
+        with self.captureOnCommitCallbacks(execute=True):
+            product = Product.objects.create(
+                name='Pixel 8', description='Phone', price='599.00', category=self.category, **kwargs,
+            )
+        product.refresh_from_db()
+        return product
+
+    def test_save_renders_webp_variants(self):
+        product = self.create_product(image=png('pixel.png', 600, 400))
+
+        variants = product.image_variants[product.image.name]
+        self.assertEqual(list(variants), ['150', '300'])
+        for width, name in variants.items():
+            self.assertTrue(name.endswith(f'.{width}w.webp'))
+            with image_storage().open(name) as f, Image.open(f) as image:
+                self.assertEqual(image.format, 'WEBP')
+                self.assertEqual(image.size, (int(width), int(width) * 2 // 3))
+
+    def test_api_returns_srcset_once_rendered(self):
+        url = '/api/products/products/{}/'
+        with self.captureOnCommitCallbacks() as callbacks:
+            product = Product.objects.create(
+                name='Pixel 8', description='Phone', price='599.00', category=self.category,
+                image=png('pixel.png', 600, 400),
+            )
+        self.assertEqual(self.client.get(url.format(product.id)).json()['product']['image_srcset'], {})
+
+        for callback in callbacks:
+            callback()
+        srcset = self.client.get(url.format(product.id)).json()['product']['image_srcset']
+        self.assertEqual(list(srcset), ['150w', '300w'])
+        self.assertEqual(srcset['150w'], f'http://testserver/media/{images.variant_name(product.image.name, 150)}')
+
+    def test_small_images_are_not_upscaled(self):
+        product = self.create_product(image=png('icon.png', 100, 100))
+        self.assertEqual(list(product.image_variants[product.image.name]), ['100'])
+
+    def test_gallery_entries(self):
+        default_storage.save('products/side.png', png('side.png', 400, 400))
+        with self.assertLogs('products.images', 'WARNING'):
+            product = self.create_product(images=['products/side.png', 'https://cdn.example.com/a.jpg', 'products/gone.png'])
+
+        self.assertEqual(set(product.image_variants), {'products/side.png', 'products/gone.png'})
+        self.assertEqual(product.image_variants['products/gone.png'], {})
+        response = self.client.get(f'/api/products/products/{product.id}/')
+        self.assertEqual([list(srcset) for srcset in response.json()['product']['images_srcset']], [['150w', '300w'], [], []])
+
+    def test_unchanged_images_are_not_requeued(self):
+        product = self.create_product(image=png('pixel.png', 600, 400))
+        with mock.patch.object(images, '_submit') as submit, self.captureOnCommitCallbacks(execute=True):
+            product.price = '499.00'
+            product.save()
+        submit.assert_not_called()
+
+    def test_concurrent_stock_update_keeps_variants(self):
+        render = images.render_variants
+
+        def render_while_stock_moves(name, options=None):
+            # Stock changes bump updated_at but leave the images alone
+            Product.objects.filter(id=product.id).update(stock=F('stock') - 1, updated_at=timezone.now())
+            return render(name, options)
+
+        with self.captureOnCommitCallbacks() as callbacks:
+            product = Product.objects.create(
+                name='Pixel 8', description='Phone', price='599.00', category=self.category, stock=5,
+                image=png('pixel.png', 600, 400),
+            )
+        with mock.patch.object(images, 'render_variants', render_while_stock_moves):
+            for callback in callbacks:
+                callback()
+        product.refresh_from_db()
+        self.assertEqual(list(product.image_variants[product.image.name]), ['150', '300'])
+
+    def test_category_image(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            self.category.image = png('phones.png', 800, 800)
+            self.category.save()
+        category = self.client.get('/api/products/categories/').json()['categories'][0]
+        self.assertEqual(list(category['image_srcset']), ['150w', '300w'])
+
+
+@override_settings(IMAGE_VARIANTS={'WIDTHS': (150,), 'ASYNC': False})
+class ContentAddressedStorageTests(CatalogTestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.category = Category.objects.create(name='Phones')
+
+    def setUp(self):
+        super().setUp()
+        media_root = self.enterContext(tempfile.TemporaryDirectory())
+        self.enterContext(override_settings(MEDIA_ROOT=media_root))
+
+    def create_product(self, image):
+        with self.captureOnCommitCallbacks(execute=True):
+            return Product.objects.create(
+                name='Pixel 8', description='Phone', price='599.00', category=self.category, image=image,
+            )
+
+    def references(self, name):
+        return MediaBlob.objects.get(name=name).references
+
+    def test_identical_uploads_share_one_blob(self):
+        first = self.create_product(png('Rohit-Sharma.webp', 200, 200))
+        second = self.create_product(png('Rohit-Sharma_pivECMI.webp', 200, 200))
+        third = self.create_product(png('other.png', 200, 200, color='blue'))
+
+        self.assertTrue(is_blob_name(first.image.name))
+        self.assertEqual(first.image.name, second.image.name)
+        self.assertNotEqual(first.image.name, third.image.name)
+        self.assertEqual(self.references(first.image.name), 2)
+        self.assertEqual(len(image_storage().listdir(first.image.name.rsplit('/', 1)[0])[1]), 1)
+        self.assertTrue(is_immutable(first.image.name))
+        self.assertTrue(is_immutable(images.variant_name(first.image.name, 150)))
+
+    def test_blob_is_deleted_with_its_last_reference(self):
+        first = self.create_product(png('a.png', 200, 200))
+        second = self.create_product(png('b.png', 200, 200))
+        name = first.image.name
+        variant = Product.objects.get(id=first.id).image_variants[name]['150']
+
+        with self.captureOnCommitCallbacks(execute=True):
+            first.delete()
+        self.assertTrue(image_storage().exists(name))
+        self.assertEqual(self.references(name), 1)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            second.image = png('c.png', 300, 300, color='green')
+            second.save()
+        self.assertFalse(image_storage().exists(name))
+        self.assertFalse(image_storage().exists(variant))
+        self.assertFalse(MediaBlob.objects.filter(name=name).exists())
+        self.assertEqual(self.references(second.image.name), 1)
+
+    def test_saves_that_keep_the_image_do_not_count_again(self):
+        product = self.create_product(png('a.png', 200, 200))
+        for update_fields in (None, ['price']):
+            product = Product.objects.get(id=product.id)
+            product.price = '499.00'
+            with self.captureOnCommitCallbacks(execute=True):
+                product.save(update_fields=update_fields)
+        self.assertEqual(self.references(product.image.name), 1)
+
+    def test_category_delete_releases_its_products_images(self):
+        category = Category.objects.create(name='Shoes', image=png('shoes.png', 200, 200, color='blue'))
+        product = Product.objects.create(
+            name='Runner', description='Shoe', price='99.00', category=category, image=png('runner.png', 200, 200),
+        )
+        names = [category.image.name, product.image.name]
+        with self.captureOnCommitCallbacks(execute=True):
+            category.delete()
+        self.assertFalse(MediaBlob.objects.filter(name__in=names).exists())
+        self.assertFalse(any(image_storage().exists(name) for name in names))
+
+    def test_dedupe_media_moves_existing_files(self):
+        storage = image_storage()
+        content = png('x.png', 200, 200).read()
+        for name in ('products/Rohit-Sharma.webp', 'products/Rohit-Sharma_pivECMI.webp'):
+            default_storage.save(name, ContentFile(content))
+        first = self.create_product('products/Rohit-Sharma.webp')
+        second = self.create_product('products/Rohit-Sharma_pivECMI.webp')
+        with self.assertLogs('products.images', 'WARNING'):
+            missing = self.create_product('products/gone.webp')
+
+        out, err = StringIO(), StringIO()
+        with self.captureOnCommitCallbacks(execute=True):
+            call_command('dedupe_media', '--delete-originals', stdout=out, stderr=err)
+
+        first.refresh_from_db()
+        second.refresh_from_db()
+        missing.refresh_from_db()
+        self.assertTrue(is_blob_name(first.image.name))
+        self.assertEqual(first.image.name, second.image.name)
+        self.assertEqual(missing.image.name, 'products/gone.webp')
+        self.assertEqual(self.references(first.image.name), 2)
+        self.assertFalse(storage.exists('products/Rohit-Sharma.webp'))
+        self.assertIn('Moved 2 images from 3 files into 1 blobs', out.getvalue())
+        self.assertIn('gone.webp does not exist', err.getvalue())
+
+    def test_sweep_deletes_unreferenced_blobs(self):
+        storage = image_storage()
+        orphan = storage.save('orphan.png', png('orphan.png', 10, 10))
+        kept = self.create_product(png('kept.png', 10, 10, color='blue')).image.name
+        hour_ago = time.time() - 7200
+        for name in (orphan, kept):
+            os.utime(storage.path(name), (hour_ago, hour_ago))
+
+        call_command('dedupe_media', '--sweep', stdout=StringIO())
+        self.assertFalse(storage.exists(orphan))
+        self.assertTrue(storage.exists(kept))
+
+
+@override_settings(IMAGE_VARIANTS={'WIDTHS': (150,), 'ASYNC': False})
+class BlobCollectionRaceTests(TransactionTestCase):
+    def setUp(self):
+        media_root = self.enterContext(tempfile.TemporaryDirectory())
+        self.enterContext(override_settings(MEDIA_ROOT=media_root))
+
+    def collect(self, name):
+        try:
+            blobs.collect(name)
+        finally:
+            connection.close()
+
+    def test_collect_waits_for_an_upload_of_the_same_blob(self):
+        category = Category.objects.create(name='Phones')
+        storage = image_storage()
+        # The last reference is gone and its collect() is about to run
+        name = storage.save('pixel.png', png('pixel.png', 200, 200))
+        MediaBlob.objects.create(name=name, references=0)
+        collector = threading.Thread(target=self.collect, args=[name])
+        exists = type(storage).exists
+
+        def exists_then_collect(storage, path):
+            found = exists(storage, path)
+            if path == name and collector.ident is None:
+                collector.start()
+                collector.join(0.5)
+            return found
+
+        with mock.patch.object(type(storage), 'exists', exists_then_collect):
+            product = Product.objects.create(
+                name='Pixel 8', description='Phone', price='599.00', category=category,
+                image=png('upload.png', 200, 200),
+            )
+        collector.join()
+        self.assertEqual(product.image.name, name)
+        self.assertTrue(storage.exists(name))
+        self.assertEqual(MediaBlob.objects.get(name=name).references, 1)
+
+    def test_acquiring_a_missing_blob_fails(self):
+        category = Category.objects.create(name='Phones')
+        name = image_storage().save('pixel.png', png('pixel.png', 200, 200))
+        image_storage().delete(name)
+        with self.assertRaises(FileNotFoundError):
+            Product.objects.create(name='Pixel 8', description='Phone', price='599.00', category=category, image=name)
+        self.assertFalse(Product.objects.exists())
+        self.assertFalse(MediaBlob.objects.exists())
+
+
+class MediaServingTests(CatalogTestCase):
+    def setUp(self):
+        super().setUp()
+        media_root = self.enterContext(tempfile.TemporaryDirectory())
+        self.enterContext(override_settings(MEDIA_ROOT=media_root))
+        self.name = default_storage.save('products/notes.txt', ContentFile(b'0123456789'))
+        self.url = f'/media/{self.name}'
+
+    def test_get(self):
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.getvalue(), b'0123456789')
+        self.assertEqual(response.headers['Content-Length'], '10')
+        self.assertEqual(response.headers['Content-Type'], 'text/plain')
+        self.assertEqual(response.headers['Accept-Ranges'], 'bytes')
+        self.assertEqual(response.headers['Cache-Control'], 'public, max-age=3600')
+        self.assertIn('Last-Modified', response.headers)
+
+    def test_blobs_are_immutable(self):
+        name = image_storage().save('pixel.png', png('pixel.png', 10, 10))
+        response = self.client.get(f'/media/{name}')
+        self.assertEqual(response.headers['Cache-Control'], 'public, max-age=31536000, immutable')
+        self.assertEqual(response.headers['ETag'], f'"{name.rsplit("/", 1)[1]}"')
+
+    def test_if_none_match(self):
+        etag = self.client.get(self.url).headers['ETag']
+        response = self.client.get(self.url, headers={'If-None-Match': etag})
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response.content, b'')
+        self.assertEqual(response.headers['ETag'], etag)
+        self.assertEqual(response.headers['Cache-Control'], 'public, max-age=3600')
+
+    def test_ranges(self):
+        for header, status, body, content_range in [
+            ('bytes=2-5', 206, b'2345', 'bytes 2-5/10'),
+            ('bytes=7-', 206, b'789', 'bytes 7-9/10'),
+            ('bytes=-3', 206, b'789', 'bytes 7-9/10'),
+            ('bytes=8-100', 206, b'89', 'bytes 8-9/10'),
+            ('bytes=0-1,4-5', 200, b'0123456789', None),
+            ('bytes=5-2', 200, b'0123456789', None),
+            ('lines=1-2', 200, b'0123456789', None),
+        ]:
+            with self.subTest(header):
+                response = self.client.get(self.url, headers={'Range': header})
+                self.assertEqual(response.status_code, status)
+                self.assertEqual(response.getvalue(), body)
+                self.assertEqual(response.headers['Content-Length'], str(len(body)))
+                self.assertEqual(response.headers.get('Content-Range'), content_range)
+
+    def test_unsatisfiable_range(self):
+        response = self.client.get(self.url, headers={'Range': 'bytes=10-'})
+        self.assertEqual(response.status_code, 416)
+        self.assertEqual(response.headers['Content-Range'], 'bytes */10')
+
+    def test_if_range(self):
+        etag = self.client.get(self.url).headers['ETag']
+        response = self.client.get(self.url, headers={'Range': 'bytes=0-1', 'If-Range': etag})
+        self.assertEqual(response.status_code, 206)
+        response = self.client.get(self.url, headers={'Range': 'bytes=0-1', 'If-Range': '"stale"'})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.getvalue(), b'0123456789')
+
+    def test_head(self):
+        response = self.client.head(self.url)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.content, b'')
+        self.assertEqual(response.headers['Content-Length'], '10')
+
+    def test_sendfile_offload(self):
+        with override_settings(MEDIA_SERVING={'SENDFILE': 'x-accel-redirect'}):
+            response = self.client.get(self.url)
+        self.assertEqual(response.headers['X-Accel-Redirect'], f'/protected-media/{self.name}')
+        self.assertEqual(response.content, b'')
+        self.assertIn('ETag', response.headers)
+
+        with override_settings(MEDIA_SERVING={'SENDFILE': 'x-sendfile'}):
+            response = self.client.get(self.url)
+        self.assertEqual(response.headers['X-Sendfile'], default_storage.path(self.name))
+
+    def test_refuses_paths_outside_media(self):
+        default_storage.save('blobs/ab/.upload-partial', ContentFile(b'x'))
+        for url in ('/media/..%2Fsettings.py', '/media/blobs/ab/.upload-partial', '/media/products', '/media/missing.txt'):
+            with self.subTest(url):
+                self.assertEqual(self.client.get(url).status_code, 404)
+        self.assertEqual(self.client.post(self.url).status_code, 405)
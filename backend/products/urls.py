@@ -4,5 +4,9 @@ from . import views
 urlpatterns = [
     path('products/', views.product_list, name='product_list'),
     path('products/<int:product_id>/', views.product_detail, name='product_detail'),
+    path('batch/', views.product_batch, name='product_batch'),
     path('categories/', views.category_list, name='category_list'),
-]
\ No newline at end of file
+    path('async/products/', views.product_list_async, name='product_list_async'),
+    path('async/products/<int:product_id>/', views.product_detail_async, name='product_detail_async'),
+    path('async/categories/', views.category_list_async, name='category_list_async'),
+]
@@ -1,54 +1,100 @@
+from asgiref.sync import sync_to_async
 from django.http import JsonResponse
 from django.views.decorators.csrf import csrf_exempt
 from django.views.decorators.http import require_http_methods
 import json
 from .models import Product, Category
+from .cache import CATEGORIES_TAG, PRODUCTS_TAG, cache_response, product_tag
+from .conditional import (
+    category_list_validators, conditional_view, product_detail_validators, product_list_validators,
+)
+from .counters import aactive_product_count, active_product_count
+from .images import srcset
+from .pagination import apaginate_by_cursor, paginate_by_cursor, parse_limit, parse_offset
+from .search import search_products
+
+MAX_BATCH_SIZE = 200
+
+
+def serialize_product(request, product):
+    return {
+        'id': product.id,
+        'name': product.name,
+        'description': product.description,
+        'price': float(product.price),
+        'original_price': float(product.original_price) if product.original_price else None,
+        'discount_percentage': product.discount_percentage,
+        'category': {
+            'id': product.category.id,
+            'name': product.category.name,
+        },
+        'image': request.build_absolute_uri(product.image.url) if product.image else None,
+        'image_srcset': srcset(request, product, product.image.name) if product.image else {},
+        'images': product.images,
+        'images_srcset': [srcset(request, product, entry) for entry in product.images or []],
+        'stock': product.stock,
+        'rating': float(product.rating),
+        'review_count': product.review_count,
+    }
 
 @csrf_exempt
 @require_http_methods(["GET"])
+@cache_response(lambda request: [PRODUCTS_TAG, CATEGORIES_TAG])
+@conditional_view(product_list_validators)
 def product_list(request):
-    """List all active products with optional filtering."""
+    """
+    List all active products with optional filtering.
+
+    Pass ``cursor`` (empty for the first page) to use keyset pagination, which
+    returns ``next_cursor`` instead of ``total_count``. Without it the legacy
+    offset mode is used. Search results are ranked by relevance, so they are
+    always paginated by offset; a ``cursor`` with ``search`` is rejected.
+    """
     try:
         # Get query parameters
         category_id = request.GET.get('category')
         search = request.GET.get('search')
-        limit = int(request.GET.get('limit', 20))
-        offset = int(request.GET.get('offset', 0))
+        cursor = request.GET.get('cursor')
+        try:
+            limit = parse_limit(request.GET.get('limit'), clamp=cursor is None)
+            offset = parse_offset(request.GET.get('offset'))
+        except ValueError as e:
+            return JsonResponse({'error': str(e)}, status=400)
+        if search and cursor is not None:
+            return JsonResponse({'error': 'Search results are paginated by offset, not cursor'}, status=400)
 
         # Base queryset
-        products = Product.objects.filter(is_active=True)
+        products = Product.objects.filter(is_active=True).select_related('category')
 
         # Apply filters
         if category_id:
             products = products.filter(category_id=category_id)
 
         if search:
-            products = products.filter(name__icontains=search)
+            products, search_total = search_products(products, search)
 
         # Pagination
-        total_count = products.count()
-        products = products[offset:offset + limit]
+        if cursor is not None:
+            try:
+                products, next_cursor = paginate_by_cursor(products, cursor, limit)
+            except ValueError:
+                return JsonResponse({'error': 'Invalid cursor'}, status=400)
+        else:
+            # Every product has a category, so the counters add up to the total
+            total_count = search_total if search else active_product_count(category_id or None)
+            products = products[offset:offset + limit]
 
         # Serialize products
         product_data = []
         for product in products:
-            product_data.append({
-                'id': product.id,
-                'name': product.name,
-                'description': product.description,
-                'price': float(product.price),
-                'original_price': float(product.original_price) if product.original_price else None,
-                'discount_percentage': product.discount_percentage,
-                'category': {
-                    'id': product.category.id,
-                    'name': product.category.name,
-                },
-                'image': request.build_absolute_uri(product.image.url) if product.image else None,
-                'images': product.images,
-                'stock': product.stock,
-                'rating': float(product.rating),
-                'review_count': product.review_count,
-            })
+            product_data.append(serialize_product(request, product))
+
+        if cursor is not None:
+            return JsonResponse({
+                'products': product_data,
+                'next_cursor': next_cursor,
+                'has_more': next_cursor is not None,
+            }, status=200)
 
         return JsonResponse({
             'products': product_data,
@@ -61,28 +107,16 @@ def product_list(request):
 
 @csrf_exempt
 @require_http_methods(["GET"])
+@cache_response(lambda request, product_id: [product_tag(product_id), CATEGORIES_TAG])
+@conditional_view(product_detail_validators)
 def product_detail(request, product_id):
     """Get detailed information about a specific product."""
     try:
-        product = Product.objects.get(id=product_id, is_active=True)
+        product = Product.objects.select_related('category').get(id=product_id, is_active=True)
 
         return JsonResponse({
             'product': {
-                'id': product.id,
-                'name': product.name,
-                'description': product.description,
-                'price': float(product.price),
-                'original_price': float(product.original_price) if product.original_price else None,
-                'discount_percentage': product.discount_percentage,
-                'category': {
-                    'id': product.category.id,
-                    'name': product.category.name,
-                },
-                'image': request.build_absolute_uri(product.image.url) if product.image else None,
-                'images': product.images,
-                'stock': product.stock,
-                'rating': float(product.rating),
-                'review_count': product.review_count,
+                **serialize_product(request, product),
                 'created_at': product.created_at.isoformat(),
             }
         }, status=200)
@@ -94,6 +128,55 @@ def product_detail(request, product_id):
 
 @csrf_exempt
 @require_http_methods(["GET"])
+@cache_response(lambda request: [PRODUCTS_TAG, CATEGORIES_TAG])
+def product_batch(request):
+    """
+    Fetch several products in one query, e.g. to hydrate the cart or wishlist.
+
+    ``ids`` is a comma-separated list of up to MAX_BATCH_SIZE product ids.
+    Products come back in the requested order; ids that do not exist or are
+    inactive are listed under ``missing`` and ``inactive``.
+    """
+    try:
+        raw_ids = [part for part in request.GET.get('ids', '').split(',') if part.strip()]
+        if not raw_ids:
+            return JsonResponse({'error': 'ids is required'}, status=400)
+
+        try:
+            ids = list(dict.fromkeys(int(part) for part in raw_ids))
+        except ValueError:
+            return JsonResponse({'error': 'ids must be a comma-separated list of integers'}, status=400)
+
+        if len(ids) > MAX_BATCH_SIZE:
+            return JsonResponse({'error': f'At most {MAX_BATCH_SIZE} ids per request'}, status=400)
+
+        products = Product.objects.select_related('category').in_bulk(ids)
+
+        product_data = []
+        missing = []
+        inactive = []
+        for product_id in ids:
+            product = products.get(product_id)
+            if product is None:
+                missing.append(product_id)
+            elif not product.is_active:
+                inactive.append(product_id)
+            else:
+                product_data.append(serialize_product(request, product))
+
+        return JsonResponse({
+            'products': product_data,
+            'missing': missing,
+            'inactive': inactive,
+        }, status=200)
+
+    except Exception as e:
+        return JsonResponse({'error': f'Failed to fetch products: {str(e)}'}, status=500)
+
+@csrf_exempt
+@require_http_methods(["GET"])
+@cache_response(lambda request: [PRODUCTS_TAG, CATEGORIES_TAG])
+@conditional_view(category_list_validators)
 def category_list(request):
     """List all categories."""
     try:
@@ -106,10 +189,113 @@ def category_list(request):
                 'name': category.name,
                 'description': category.description,
                 'image': request.build_absolute_uri(category.image.url) if category.image else None,
-                'product_count': category.products.filter(is_active=True).count(),
+                'image_srcset': srcset(request, category, category.image.name) if category.image else {},
+                'product_count': category.product_count,
             })
 
         return JsonResponse({'categories': category_data}, status=200)
 
     except Exception as e:
         return JsonResponse({'error': f'Failed to fetch categories: {str(e)}'}, status=500)
+
+
+# Async versions of the catalog views. Under ASGI they wait on the database
+# without occupying a worker thread each; responses are identical to the sync
+# views above.
+
+@csrf_exempt
+@require_http_methods(["GET"])
+@cache_response(lambda request: [PRODUCTS_TAG, CATEGORIES_TAG])
+@conditional_view(product_list_validators)
+async def product_list_async(request):
+    """Async version of product_list."""
+    try:
+        category_id = request.GET.get('category')
+        search = request.GET.get('search')
+        cursor = request.GET.get('cursor')
+        try:
+            limit = parse_limit(request.GET.get('limit'), clamp=cursor is None)
+            offset = parse_offset(request.GET.get('offset'))
+        except ValueError as e:
+            return JsonResponse({'error': str(e)}, status=400)
+        if search and cursor is not None:
+            return JsonResponse({'error': 'Search results are paginated by offset, not cursor'}, status=400)
+
+        products = Product.objects.filter(is_active=True).select_related('category')
+
+        if category_id:
+            products = products.filter(category_id=category_id)
+
+        if search:
+            # Ranking runs raw FTS queries, which have no async API
+            products, search_total = await sync_to_async(search_products)(products, search)
+
+        if cursor is not None:
+            try:
+                products, next_cursor = await apaginate_by_cursor(products, cursor, limit)
+            except ValueError:
+                return JsonResponse({'error': 'Invalid cursor'}, status=400)
+            return JsonResponse({
+                'products': [serialize_product(request, product) for product in products],
+                'next_cursor': next_cursor,
+                'has_more': next_cursor is not None,
+            }, status=200)
+
+        total_count = search_total if search else await aactive_product_count(category_id or None)
+        product_data = [
+            serialize_product(request, product)
+            async for product in products[offset:offset + limit].aiterator()
+        ]
+        return JsonResponse({
+            'products': product_data,
+            'total_count': total_count,
+            'has_more': offset + limit < total_count,
+        }, status=200)
+
+    except Exception as e:
+        return JsonResponse({'error': f'Failed to fetch products: {str(e)}'}, status=500)
+
+@csrf_exempt
+@require_http_methods(["GET"])
+@cache_response(lambda request, product_id: [product_tag(product_id), CATEGORIES_TAG])
+@conditional_view(product_detail_validators)
+async def product_detail_async(request, product_id):
+    """Async version of product_detail."""
+    try:
+        product = await Product.objects.select_related('category').aget(id=product_id, is_active=True)
+
+        return JsonResponse({
+            'product': {
+                **serialize_product(request, product),
+                'created_at': product.created_at.isoformat(),
+            }
+        }, status=200)
+
+    except Product.DoesNotExist:
+        return JsonResponse({'error': 'Product not found'}, status=404)
+    except Exception as e:
+        return JsonResponse({'error': f'Failed to fetch product: {str(e)}'}, status=500)
+
+@csrf_exempt
+@require_http_methods(["GET"])
+@cache_response(lambda request: [PRODUCTS_TAG, CATEGORIES_TAG])
+@conditional_view(category_list_validators)
+async def category_list_async(request):
+    """Async version of category_list."""
+    try:
+        category_data = [
+            {
+                'id': category.id,
+                'name': category.name,
+                'description': category.description,
+                'image': request.build_absolute_uri(category.image.url) if category.image else None,
+                'image_srcset': srcset(request, category, category.image.name) if category.image else {},
+                'product_count': category.product_count,
+            }
+            async for category in Category.objects.all().aiterator()
+        ]
+
+        return JsonResponse({'categories': category_data}, status=200)
+
+    except Exception as e:
+        return JsonResponse({'error': f'Failed to fetch categories: {str(e)}'}, status=500)